@@ -0,0 +1,33 @@
+import json
+import sys
+
+# Comparaison de deux fichiers de résultats de benchmarks.suite :
+#   python -m benchmarks.compare avant.json apres.json [seuil en %]
+# Affiche les médianes et l'écart pour chaque mesure présente dans les deux ;
+# code de retour 1 si une mesure ralentit de plus du seuil (défaut 20 %).
+
+def compare(before, after, threshold=20.0):
+    regressions = []
+    for size, data in after['sizes'].items():
+        previous = before['sizes'].get(size)
+        if previous is None:
+            continue
+        print(f"--- {size} lignes ---")
+        for name, result in data['results'].items():
+            old = previous['results'].get(name)
+            if old is None:
+                continue
+            change = (result['median_s'] / old['median_s'] - 1) * 100 if old['median_s'] else 0.0
+            flag = ' <-- plus lent' if change > threshold else ''
+            print(f"  {name:52s} {old['median_s'] * 1000:10.2f} -> {result['median_s'] * 1000:10.2f} ms  {change:+7.1f} %{flag}")
+            if flag:
+                regressions.append((size, name, change))
+    return regressions
+
+if __name__ == '__main__':
+    with open(sys.argv[1], encoding='utf-8') as f:
+        before = json.load(f)
+    with open(sys.argv[2], encoding='utf-8') as f:
+        after = json.load(f)
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 20.0
+    sys.exit(1 if compare(before, after, threshold) else 0)
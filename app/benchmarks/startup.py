@@ -0,0 +1,39 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Mesure du temps de démarrage : chaque scénario est lancé dans un nouvel
+# interpréteur (python -m benchmarks.startup depuis le dossier app) et
+# chronométré de bout en bout.
+#  - interpreter : python seul, pour référence
+#  - login       : import de main.py, tout ce qu'il faut pour l'écran de connexion
+#  - stats       : import de main.py puis chargement de la pile graphique
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'interpreter': 'pass',
+    'login': 'import main',
+    'stats': 'import main; main.load_stats_stack()',
+}
+
+def measure(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', code], cwd=APP_DIR)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def main(runs=7):
+    results = {}
+    for name, code in SCENARIOS.items():
+        timings = measure(code, runs)
+        results[name] = statistics.median(timings)
+        print(f"{name:12s} médiane {results[name] * 1000:8.1f} ms  (min {min(timings) * 1000:.1f} ms, {runs} essais)")
+    return results
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
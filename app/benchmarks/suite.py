@@ -0,0 +1,255 @@
+import argparse
+import cProfile
+import csv
+import json
+import os
+import platform
+import pstats
+import shutil
+import sqlite3
+import statistics as stats_lib
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from src import columnar, export, journal, matrix, statistics
+from src.cache import stats_cache
+from src.connection import close_all, get_connection, set_db_path, transaction
+from src.database import UPSERT_ATTENDANCE, add_attendance
+from src.importer import import_csv
+
+from .synthetic import cached_base, generate_rows
+
+# Mesures des chemins de statistiques, d'export et d'écriture sur des bases
+# synthétiques (voir synthetic.py), depuis le dossier app :
+#
+#   python -m benchmarks.suite                        # 1k et 100k lignes
+#   python -m benchmarks.suite --sizes 1k,100k,10M --profile
+#   python -m benchmarks.suite --sizes 1y,5y,20y       # en années scolaires
+#   python -m benchmarks.compare avant.json apres.json
+#
+# Chaque mesure est répétée (médiane et minimum), le cache des statistiques
+# vidé avant chaque essai. Les écritures se font sur une copie de la base.
+# Résultats dans benchmarks/results/<date>.json ; avec --profile, les
+# fonctions les plus coûteuses (cProfile) y sont ajoutées et les fichiers
+# .prof complets enregistrés à côté.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SIZES = '1k,100k'
+INSERT_ENTRIES = 100     # saisies une par une (add_attendance)
+IMPORT_ROWS = 10000      # lignes du CSV importé / du lot executemany
+PROFILE_TOP = 15
+
+def parse_size(text):
+    # {'count': lignes} ou {'years': années} (suffixe y), pour cached_base
+    units = {'k': 10 ** 3, 'M': 10 ** 6}
+    if text[-1] == 'y':
+        return {'years': int(text[:-1])}
+    if text[-1] in units:
+        return {'count': int(float(text[:-1]) * units[text[-1]])}
+    return {'count': int(text)}
+
+def _last_day(path):
+    jour = get_connection(path).execute('SELECT MAX(jour) FROM attendance').fetchone()[0]
+    return datetime.fromordinal(jour)
+
+def read_benchmarks(ref, path):
+    # (nom, fonction) des lectures ; ref = dernier jour de la base
+    year = ref.year
+    month_mid = (ref.replace(day=1) + timedelta(days=9)).strftime('%Y-%m-%d')
+    ref_str = ref.strftime('%Y-%m-%d')
+    benchmarks = [
+        ('stats_today', lambda: statistics.stats_today(ref)),
+        ('stats_semaine', lambda: statistics.stats_semaine(ref)),
+        ('average_per_hour (toute la base)', lambda: statistics.average_per_hour()),
+        ('average_per_hour (plage)', lambda: statistics.average_per_hour(month_mid, ref_str)),
+        ('peak_hours (toute la base)', lambda: statistics.peak_hours()),
+        ('repartition_par_classe (toute la base)', lambda: statistics.repartition_par_classe()),
+        ('repartition_par_classe (plage)', lambda: statistics.repartition_par_classe(month_mid, ref_str)),
+        ('average_per_hour_week', lambda: statistics.average_per_hour_week(ref)),
+        ('snapshot_day', lambda: statistics.snapshot_day(ref)),
+        ('snapshot_week', lambda: statistics.snapshot_week(ref)),
+        ('snapshot_month', lambda: statistics.snapshot_month(ref)),
+        ('snapshot_year', lambda: statistics.snapshot_year(ref)),
+        ('snapshot (plage)', lambda: statistics.snapshot(month_mid, ref_str)),
+        ('daily_totals (année)', lambda: statistics.daily_totals(f'{year}-01-01', f'{year}-12-31')),
+        ('matrix: construction (année)', lambda: matrix.year_matrix(year)),
+        ('matrix: heatmap + snapshot (année)', lambda: (
+            matrix.heatmap(*matrix.year_bounds(ref)), matrix.snapshot(*matrix.year_bounds(ref)))),
+    ]
+    if columnar.available():
+        benchmarks.append(('columnar: chargement', lambda: columnar.ColumnStore([path])))
+    return benchmarks
+
+def export_benchmarks(ref, workdir):
+    year = ref.year
+    return [
+        ('export_csv (toute la base)', lambda: export.export_csv(os.path.join(workdir, 'export.csv'))),
+        ('export_csv gzip (année)', lambda: export.export_csv(
+            os.path.join(workdir, 'export.csv.gz'), f'{year}-01-01', f'{year}-12-31')),
+        ('export_pdf (année)', lambda: export.export_pdf(
+            os.path.join(workdir, 'rapport.pdf'), f'{year}-01-01', f'{year}-12-31')),
+    ]
+
+def write_benchmarks(ref, workdir):
+    # Chaque essai écrit des jours nouveaux, après ceux des essais précédents
+    state = {'start': ref.date() + timedelta(days=1)}
+
+    def next_rows(count):
+        rows = list(generate_rows(count, start=state['start'], seed=1))
+        state['start'] = date.fromisoformat(rows[-1][6]) + timedelta(days=1)
+        return rows
+
+    def entries():
+        for row in next_rows(INSERT_ENTRIES):
+            add_attendance(*row[:7])
+
+    def executemany():
+        rows = next_rows(IMPORT_ROWS)
+        with transaction() as conn:
+            conn.executemany(UPSERT_ATTENDANCE, rows)
+
+    def import_file():
+        path = os.path.join(workdir, 'import.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['heure', 'sixieme', 'cinquieme', 'quatrieme', 'troisieme', 'total', 'date'])
+            writer.writerows(row[:7] for row in next_rows(IMPORT_ROWS))
+        import_csv(path)
+
+    return [
+        (f'add_attendance x{INSERT_ENTRIES} (journal)', entries),
+        (f'upsert executemany {IMPORT_ROWS}', executemany),
+        (f'import_csv {IMPORT_ROWS}', import_file),
+    ]
+
+def _profile_top(profile, limit=PROFILE_TOP):
+    report = pstats.Stats(profile).sort_stats('cumulative')
+    top = []
+    for func in report.fcn_list[:limit]:
+        primitive, calls, own, cumulative, _ = report.stats[func]
+        filename, line, name = func
+        top.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'tottime_s': round(own, 6),
+            'cumtime_s': round(cumulative, 6),
+        })
+    return top
+
+def run_one(name, func, repeat, profile_dir=None):
+    timings = []
+    for _ in range(repeat):
+        stats_cache.clear()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    result = {
+        'median_s': round(stats_lib.median(timings), 6),
+        'min_s': round(min(timings), 6),
+        'runs': repeat,
+    }
+    if profile_dir:
+        stats_cache.clear()
+        profile = cProfile.Profile()
+        profile.runcall(func)
+        safe = ''.join(c if c.isalnum() else '_' for c in name).strip('_')
+        profile.dump_stats(os.path.join(profile_dir, f'{safe}.prof'))
+        result['profile'] = _profile_top(profile)
+    return result
+
+def run_size(size, repeat, profile_dir, seed=0):
+    path = cached_base(seed=seed, **size)
+    rows = get_connection(path).execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+    label = f"{size['years']}y" if 'years' in size else str(rows)
+    print(f"--- {rows} lignes ---")
+    # Moins d'essais sur les très grosses bases
+    repeat = 1 if rows >= 10 ** 6 else repeat
+    results = {}
+
+    def record(group, benchmarks):
+        for name, func in benchmarks:
+            sub_dir = None
+            if profile_dir:
+                sub_dir = os.path.join(profile_dir, label, group)
+                os.makedirs(sub_dir, exist_ok=True)
+            result = run_one(name, func, repeat, sub_dir)
+            results[f'{group}/{name}'] = result
+            print(f"  {group:8s} {name:42s} {result['median_s'] * 1000:10.2f} ms")
+
+    workdir = tempfile.mkdtemp(prefix='cdi-bench-')
+    journal_dir = journal.JOURNAL_DIR
+    try:
+        set_db_path(path)
+        ref = _last_day(path)
+        record('lecture', read_benchmarks(ref, path))
+        record('export', export_benchmarks(ref, workdir))
+
+        # Écritures sur une copie : la base en cache reste intacte
+        copy = os.path.join(workdir, 'copie.db')
+        shutil.copyfile(path, copy)
+        set_db_path(copy)
+        journal.JOURNAL_DIR = os.path.join(workdir, 'journal')
+        record('ecriture', write_benchmarks(ref, workdir))
+    finally:
+        journal.JOURNAL_DIR = journal_dir
+        close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'base': os.path.basename(path),
+        'rows': rows,
+        'size_bytes': os.path.getsize(path),
+        'results': results,
+    }
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="tailles de base en lignes ou en années, ex. 1k,100k,10M ou 1y,5y")
+    parser.add_argument('--repeat', type=int, default=5, help="essais par mesure (1 au-delà d'un million de lignes)")
+    parser.add_argument('--profile', action='store_true', help="ajoute un profil cProfile de chaque mesure")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+
+    # Pile PDF (matplotlib) chargée avant les mesures, pour ne pas compter
+    # son import dans le premier export
+    from matplotlib.backends.backend_pdf import PdfPages  # noqa: F401
+
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    output = args.output or os.path.join(RESULTS_DIR, f'{stamp}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    profile_dir = os.path.splitext(output)[0] + '-profils' if args.profile else None
+
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'numpy': columnar.available(),
+            'repeat': args.repeat,
+        },
+        'sizes': {},
+    }
+    for size in args.sizes.split(','):
+        size = parse_size(size)
+        key = f"{size['years']}y" if 'years' in size else str(size['count'])
+        report['sizes'][key] = run_size(size, args.repeat, profile_dir, args.seed)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Résultats : {output}")
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import bisect
+import math
+import os
+import random
+import sys
+from datetime import date, timedelta
+from itertools import islice
+
+from src.connection import close_all, get_connection, transaction
+from src.database import UPSERT_ATTENDANCE
+from src.migrations import SCHEMA_VERSION, migrate
+from src.rollups import create_rollups, refresh_rollups
+from src.statistics import HOURS
+
+# Bases de fréquentation synthétiques pour les mesures de performance.
+# Jours de classe du lundi au vendredi hors juillet-août, sans le mercredi
+# après-midi ; créneaux de la saisie (8h-16h sans 12h). Le nombre d'élèves
+# par classe suit une loi de Poisson dont la moyenne dépend de la classe,
+# du créneau (récréation, pause de midi) et du mois. Environ 1 500 lignes
+# par année : 10 millions de lignes couvrent plusieurs milliers d'années à
+# partir de START_YEAR, ce qui reste dans les dates valides (an 9999).
+# La taille se donne en lignes (count) ou en années scolaires (years).
+
+START_YEAR = 2000
+BATCH_SIZE = 50000
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Moyenne d'élèves par créneau pour chaque classe (6e, 5e, 4e, 3e)
+CLASS_MEANS = (3.0, 2.6, 2.2, 1.8)
+HOUR_FACTORS = {
+    '08:00': 0.6, '09:00': 0.8, '10:00': 1.3, '11:00': 0.9,
+    '13:00': 1.6, '14:00': 1.0, '15:00': 1.1, '16:00': 0.7,
+}
+# Septembre à juin ; juillet et août sont des vacances
+MONTH_FACTORS = {9: 0.8, 10: 1.0, 11: 1.1, 12: 0.9, 1: 1.1, 2: 1.0, 3: 1.1, 4: 1.0, 5: 0.9, 6: 0.7}
+MAX_COUNT = 40
+
+def _poisson_cdf(mean):
+    cdf, term, total = [], math.exp(-mean), 0.0
+    for k in range(MAX_COUNT):
+        total += term
+        cdf.append(total)
+        term *= mean / (k + 1)
+    return cdf
+
+# Tables de tirage précalculées : un tirage = un random() et une recherche
+_CDFS = {
+    (month, hour): [_poisson_cdf(mean * HOUR_FACTORS[hour] * factor) for mean in CLASS_MEANS]
+    for month, factor in MONTH_FACTORS.items()
+    for hour in HOURS
+}
+
+def school_days(start):
+    day = start
+    while True:
+        if day.weekday() < 5 and day.month in MONTH_FACTORS:
+            yield day
+        day += timedelta(days=1)
+
+def generate_rows(count=None, start=None, seed=0, years=None):
+    # count lignes, ou years années à partir de start, au format de
+    # UPSERT_ATTENDANCE (heure, 6e, 5e, 4e, 3e, total, date, jour), dans
+    # l'ordre chronologique
+    if count is None and years is None:
+        raise ValueError("count ou years est requis")
+    start = start or date(START_YEAR, 1, 1)
+    end = start.replace(year=start.year + years) if years else None
+    rng = random.Random(seed)
+    draw = rng.random
+    produced = 0
+    for day in school_days(start):
+        if end and day >= end:
+            return
+        date_str, jour = day.isoformat(), day.toordinal()
+        hours = HOURS[:4] if day.weekday() == 2 else HOURS
+        for hour in hours:
+            if produced == count:
+                return
+            counts = [bisect.bisect(cdf, draw()) for cdf in _CDFS[day.month, hour]]
+            yield (hour, *counts, sum(counts), date_str, jour)
+            produced += 1
+
+def build_base(path, count=None, seed=0, years=None):
+    # Base complète (schéma, index, agrégats) ; les triggers d'agrégats sont
+    # retirés pendant le remplissage puis les agrégats recalculés en une fois
+    migrate(path)
+    with transaction(path) as conn:
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_attendance_rollup_{event}')
+    rows = generate_rows(count, seed=seed, years=years)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        with transaction(path) as conn:
+            conn.executemany(UPSERT_ATTENDANCE, batch)
+    with transaction(path) as conn:
+        refresh_rollups(conn)
+        create_rollups(conn)
+    get_connection(path).execute('ANALYZE')
+    return path
+
+def cached_base(count=None, seed=0, data_dir=DATA_DIR, years=None):
+    # Base synthétique gardée sur disque entre deux exécutions
+    os.makedirs(data_dir, exist_ok=True)
+    size = f'{years}y' if years else count
+    path = os.path.join(data_dir, f'synthetic-{size}-s{seed}-v{SCHEMA_VERSION}.db')
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(tmp_path + suffix):
+                os.remove(tmp_path + suffix)
+        build_base(tmp_path, count, seed, years)
+        get_connection(tmp_path).execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        close_all()
+        os.replace(tmp_path, path)
+    return path
+
+if __name__ == '__main__':
+    # python -m benchmarks.synthetic <nb de lignes | années, ex. 5y> <fichier.db> [graine]
+    size, target = sys.argv[1], sys.argv[2]
+    years = int(size[:-1]) if size.endswith('y') else None
+    build_base(target, None if years else int(size), int(sys.argv[3]) if len(sys.argv) > 3 else 0, years)
+    print(f"{target} : {get_connection(target).execute('SELECT COUNT(*) FROM attendance').fetchone()[0]} lignes")
@@ -1,47 +1,29 @@
 
-import configparser
 from datetime import datetime, timedelta
 import calendar
-import os
 import tkinter as tk
 from tkinter import messagebox
 import logging
+import threading
 
-import matplotlib
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-
+from src import config as app_config
+from src.cache import stats_cache
+from src import journal, sync
 from src.database import add_attendance, authenticate, init_db
-from src.statistics import (
-    average_per_hour,
-    average_per_hour_week,
-    peak_hours,
-    repartition_par_classe,
-    stats_semaine,
-    stats_today,
-)
+from src.logs import setup_logging
 from src.utils import round_hour, today_str
+from src.worker import BackgroundRunner
 
 debug = False
 
 # --- Logging setup ---
-log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, 'app.log')
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Écriture des logs dans un thread dédié, rotation selon Logs.log_rotation
+setup_logging()
 logging.info('Application démarrée')
 
-# Lecture du thème depuis settings.cfg
-config = configparser.ConfigParser()
-script_dir = os.path.dirname(os.path.abspath(__file__))
-config_path = os.path.join(script_dir, 'config.cfg')  
-config.read(config_path, encoding='utf-8')
-theme = config.get('UI', 'Theme', fallback='light').lower()
+# Lecture du thème depuis config.cfg
+config = app_config.get_config()
+theme = config.theme
 
 # Couleurs dynamiques
 BG_COLOR = "#222934" if theme == "dark" else "#f5f6fa"
@@ -50,28 +32,61 @@ BTN_COLOR = "#40739e" if theme == "light" else "#444c5e"
 BTN_FG = "#fff"
 FONT = ("Segoe UI", 13)
 TITLE_FONT = ("Segoe UI", 18, "bold")
+POLL_MS = 50  # relève des résultats du thread de fond
+
+# Pile graphique (matplotlib) et modules de statistiques : chargés à la
+# première utilisation, ou en avance dans un thread après la connexion,
+# pour que les écrans de connexion et de saisie s'ouvrent sans les attendre
+matplotlib = charts = stats = federation = matrix = None
+_stats_lock = threading.Lock()
+
+def load_stats_stack():
+    global matplotlib, charts, stats, federation, matrix
+    with _stats_lock:
+        if charts is not None:
+            return
+        import matplotlib.style  # lie aussi le nom global matplotlib
+        from src import federation as _federation, matrix as _matrix, statistics as _stats
+        from src import charts as _charts
+        # Style matplotlib
+        matplotlib.style.use('dark_background' if theme == "dark" else 'default')
+        stats, federation, matrix = _stats, _federation, _matrix
+        charts = _charts  # en dernier : marque la pile comme chargée
 
-# Style matplotlib
-matplotlib.style.use('default')
+def warm_stats_stack():
+    threading.Thread(target=load_stats_stack, name='warmup', daemon=True).start()
 
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
-        Base = config.get('Database', 'Base', fallback='ERREUR')
-        CDI_Name = config.get("General","CDI_Name",fallback='AUCUN NOM')
+        config = app_config.get_config()
+        Base = config.base
+        CDI_Name = config.cdi_name
         self.title(f"[CDIStats] | Base : {Base} | {CDI_Name}")
         self.geometry("800x600")
         self.configure(bg=BG_COLOR)
         self.theme_var = tk.StringVar(value=theme)
         init_db()
+        journal.start_flusher()
+        sync.start_sync()  # seulement si [Sync] server est renseigné
+        self.runner = BackgroundRunner()
+        self.charts = None  # créé au premier affichage des statistiques
+        self.after(POLL_MS, self.poll_background)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.username_var = tk.StringVar()
         self.password_var = tk.StringVar()
         logging.info("Lancement de l'application principale.")
         self.show_login()
 
     def clear_window(self):
+        # Les calculs en cours pour l'écran quitté n'ont plus d'intérêt
+        self.runner.cancel()
+        # Les vues de graphiques sont seulement masquées, pour être réutilisées
+        if self.charts:
+            self.charts.hide_all()
         for widget in self.winfo_children():
-            widget.destroy()
+            if not (self.charts and self.charts.owns(widget)):
+                widget.destroy()
 
     def center_frame(self):
         frame = tk.Frame(self, bg=BG_COLOR)
@@ -103,13 +118,14 @@ class App(tk.Tk):
     def update_theme(self):
         global BG_COLOR, FG_COLOR, BTN_COLOR, theme
         theme = self.theme_var.get()
-        config.set('UI', 'Theme', theme)
-        with open('./config.cfg', 'w', encoding='utf-8') as f:
-            config.write(f)
+        app_config.set_value('theme', theme)
         BG_COLOR = "#222934" if theme == "dark" else "#f5f6fa"
         FG_COLOR = "#f5f6fa" if theme == "dark" else "#273c75"
         BTN_COLOR = "#40739e" if theme == "light" else "#444c5e"
-        matplotlib.style.use('dark_background' if theme == "dark" else 'default')
+        if matplotlib is not None:
+            matplotlib.style.use('dark_background' if theme == "dark" else 'default')
+        if self.charts:
+            self.charts.reset()
         self.configure(bg=BG_COLOR)
         self.show_menu()
 
@@ -134,6 +150,7 @@ class App(tk.Tk):
             logging.info(f"Connexion réussie pour l'utilisateur: {username}")
             self.username_var.set("")
             self.password_var.set("")
+            warm_stats_stack()
             self.show_menu()
         else:
             logging.warning(f"Échec de connexion pour l'utilisateur: {username}")
@@ -326,6 +343,7 @@ class App(tk.Tk):
     def show_statistics(self, mode="semaine", selected_date=None):
         logging.info(f"Affichage des statistiques : mode={mode}")
         self.clear_window()
+        self.ensure_charts()
         frame = tk.Frame(self, bg=BG_COLOR)
         frame.place(relx=0.5, rely=0.1, anchor="n", relwidth=0.95, relheight=0.85)
         
@@ -336,7 +354,7 @@ class App(tk.Tk):
         # Frame pour les boutons de mode
         btn_frame = tk.Frame(frame, bg=BG_COLOR)
         btn_frame.pack(pady=5)
-        for label, m in [("Semaine", "semaine"), ("Jour", "jour"), ("Mois", "mois")]:
+        for label, m in [("Semaine", "semaine"), ("Jour", "jour"), ("Mois", "mois"), ("Année", "annee")]:
             self.styled_button(
                 btn_frame, label,
                 lambda m=m: self.show_statistics(m, self.stats_date),
@@ -355,7 +373,12 @@ class App(tk.Tk):
             elif mode == "mois":
                 year = self.stats_date.year + ((self.stats_date.month + delta - 1) // 12)
                 month = (self.stats_date.month + delta - 1) % 12 + 1
-                self.stats_date = self.stats_date.replace(year=year, month=month)
+                day = min(self.stats_date.day, calendar.monthrange(year, month)[1])
+                self.stats_date = self.stats_date.replace(year=year, month=month, day=day)
+            elif mode == "annee":
+                year = self.stats_date.year + delta
+                day = min(self.stats_date.day, calendar.monthrange(year, self.stats_date.month)[1])
+                self.stats_date = self.stats_date.replace(year=year, day=day)
             self.show_statistics(mode, self.stats_date)
 
         # Boutons de navigation
@@ -372,8 +395,10 @@ class App(tk.Tk):
             start = self.stats_date - timedelta(days=self.stats_date.weekday())
             end = start + timedelta(days=6)
             date_text = f"Semaine du {start.strftime('%d/%m/%Y')} au {end.strftime('%d/%m/%Y')}"
-        else:  # mode == "mois"
+        elif mode == "mois":
             date_text = self.stats_date.strftime("%B %Y")
+        else:  # mode == "annee"
+            date_text = self.stats_date.strftime("%Y")
         
         tk.Label(nav_frame, text=date_text, bg=BG_COLOR, fg=FG_COLOR, font=FONT).pack(side=tk.LEFT, padx=20)
 
@@ -388,102 +413,158 @@ class App(tk.Tk):
         stat_frame = tk.Frame(frame, bg=BG_COLOR)
         stat_frame.pack(fill="both", expand=True)
 
-        if mode == "semaine":
-            self.display_week_stats(stat_frame)
-        elif mode == "jour":
-            self.display_day_stats(stat_frame)
-        elif mode == "mois":
-            self.styled_label(stat_frame, "Statistiques mensuelles (en développement)", FONT).pack()
+        # Calcul (requêtes et figures) dans le thread de fond, affichage au
+        # retour dans la boucle Tk ; un simple texte en attendant
+        self.styled_label(stat_frame, "Chargement des statistiques...").pack(pady=20)
+        loaders = {
+            "semaine": (self.week_stats_data, self.display_week_stats),
+            "jour": (self.day_stats_data, self.display_day_stats),
+            "mois": (self.month_stats_data, self.display_month_stats),
+            "annee": (self.year_stats_data, self.display_year_stats),
+        }
+        load, display = loaders[mode]
+        target_date = self.stats_date
+        self.runner.submit(
+            lambda: load(target_date),
+            lambda data: self.show_stats_result(stat_frame, display, data),
+            lambda error: self.show_stats_error(stat_frame, error),
+        )
 
         self.styled_button(frame, "Retour", self.show_menu).pack(pady=10)
 
-    def display_week_stats(self, parent):
-        total = stats_semaine()
-        logging.info(f"Total de la semaine: {total}")
-        avg_per_hour = average_per_hour_week()
-        logging.info(f"Moyennes par heure: {avg_per_hour}")
-        peak = peak_hours()
-        logging.info(f"Heures de pic: {peak}")
-        repartition = repartition_par_classe()
-        logging.info(f"Répartition par classe: {repartition}")
-
-        # Graphique des moyennes par heure
-        fig1, ax1 = plt.subplots(figsize=(5, 3))
-        # Conversion en listes pour le graphique
-        hours = list(avg_per_hour.keys())
-        values = list(avg_per_hour.values())
-        if debug :
-            print(f"Heures disponibles: {hours}")
-            print(f"Valeurs: {values}")
-        
-        if hours:  # S'il y a des heures disponibles
-            ax1.bar(hours, values, color=BTN_COLOR)
-            ax1.set_xlabel('Heures')
-            ax1.set_ylabel('Nombre moyen d\'élèves')
-            # Rotation des labels pour une meilleure lisibilité
-            plt.xticks(rotation=45)
-            # Ajuster les marges pour éviter que les labels soient coupés
-            plt.tight_layout()
-        else:
-            ax1.text(0.5, 0.5, 'Aucune donnée', 
-                    horizontalalignment='center',
-                    verticalalignment='center',
-                    transform=ax1.transAxes)
-            ax1.axis('off')
-        ax1.set_title("Moyenne d'élèves par heure")
-        canvas1 = FigureCanvasTkAgg(fig1, parent)
-        canvas1.draw()
-        canvas1.get_tk_widget().pack(side=tk.LEFT, padx=10)
-
-        # Graphique de répartition par classe
-        fig2, ax2 = plt.subplots(figsize=(5, 3))
-        classes = ["6ème", "5ème", "4ème", "3ème"]
-        values = [repartition.get('6', 0), repartition.get('5', 0), 
-                 repartition.get('4', 0), repartition.get('3', 0)]
-        
-        # Vérifier si on a des données non nulles
-        if sum(values) > 0:
-            ax2.pie(values, labels=classes, autopct='%1.1f%%')
-        else:
-            ax2.text(0.5, 0.5, 'Aucune donnée', 
-                    horizontalalignment='center',
-                    verticalalignment='center',
-                    transform=ax2.transAxes)
-            ax2.axis('off')  # Cacher les axes si pas de données
-        
-        ax2.set_title("Répartition par classe")
-        canvas2 = FigureCanvasTkAgg(fig2, parent)
-        canvas2.draw()
-        canvas2.get_tk_widget().pack(side=tk.LEFT, padx=10)
+    def poll_background(self):
+        self.runner.poll()
+        self.after(POLL_MS, self.poll_background)
 
-        tk.Label(
-            parent,
-            text=f"Total cette semaine : {total}\n - Heure de pic : {peak}",
-            bg=BG_COLOR,
-            fg=FG_COLOR,
-            font=FONT
-        ).pack(pady=10)
-
-    def display_day_stats(self, parent):
-        total = stats_today()
-        avg_per_hour = average_per_hour()
-        peak = peak_hours()
-        repartition = repartition_par_classe()
-
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.plot(avg_per_hour.keys(), avg_per_hour.values(), marker='o', color=BTN_COLOR)
-        ax.set_title("Évolution des élèves par heure")
-        canvas = FigureCanvasTkAgg(fig, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(pady=10)
-
-        tk.Label(
-            parent,
-            text=f"Total aujourd'hui : {total}\nHeure de pic : {peak}",
-            bg=BG_COLOR,
-            fg=FG_COLOR,
-            font=FONT
-        ).pack(pady=10)
+    def show_stats_result(self, parent, display, data):
+        if not parent.winfo_exists():
+            return
+        for widget in parent.winfo_children():
+            widget.destroy()
+        display(parent, data)
+        logging.debug("Cache statistiques : %s", stats_cache.info())
+
+    def show_stats_error(self, parent, error):
+        logging.error(f"Erreur lors du calcul des statistiques : {error}")
+        if not parent.winfo_exists():
+            return
+        for widget in parent.winfo_children():
+            widget.destroy()
+        self.styled_label(parent, f"Erreur : {error}").pack(pady=20)
+
+    # --- Vues de graphiques, créées une fois puis mises à jour ---
+
+    def ensure_charts(self):
+        if self.charts is None:
+            load_stats_stack()
+            self.charts = charts.ChartManager(self)
+            self.charts.register("semaine", self.build_week_view)
+            self.charts.register("jour", self.build_day_view)
+            self.charts.register("mois", self.build_month_view)
+            self.charts.register("annee", self.build_year_view)
+
+    def build_week_view(self, master):
+        return charts.ChartView(master, BG_COLOR, FG_COLOR, FONT, lambda parent: [
+            charts.BarChart(parent, "Moyenne d'élèves par heure", 'Heures', "Nombre moyen d'élèves", BTN_COLOR),
+            charts.PieChart(parent),
+        ], {'side': tk.LEFT, 'padx': 10})
+
+    def build_day_view(self, master):
+        return charts.ChartView(master, BG_COLOR, FG_COLOR, FONT, lambda parent: [
+            charts.LineChart(parent, stats.HOURS, "Évolution des élèves par heure", BTN_COLOR),
+        ], {'pady': 10})
+
+    def build_month_view(self, master):
+        return charts.ChartView(master, BG_COLOR, FG_COLOR, FONT, lambda parent: [
+            charts.HeatmapChart(parent, "Élèves par jour et par heure", stats.HOURS, figsize=(7, 3)),
+            charts.PieChart(parent, figsize=(4, 3)),
+        ], {'side': tk.LEFT, 'padx': 10})
+
+    def build_year_view(self, master):
+        return charts.ChartView(master, BG_COLOR, FG_COLOR, FONT, lambda parent: [
+            charts.HeatmapChart(parent, "Élèves par jour et par heure", stats.HOURS, figsize=(9, 3)),
+            charts.PieChart(parent, figsize=(4, 3)),
+        ], {'side': tk.LEFT, 'padx': 10})
+
+    # --- Calculs exécutés dans le thread de fond ---
+    # Jour, semaine, mois et année sont des tranches de la matrice de l'année
+    # (src/matrix.py), lue une fois par base puis gardée en cache
+
+    def week_stats_data(self, target_date):
+        snap = matrix.snapshot(*matrix.week_bounds(target_date))
+        logging.debug("Total de la semaine: %s", snap.total)
+        logging.debug("Moyennes par heure: %s", snap.averages)
+        logging.debug("Heures de pic: %s", snap.peaks)
+        logging.debug("Répartition par classe: %s", snap.repartition)
+        # Même semaine l'année précédente, lue dans la base de l'an dernier
+        last_year = federation.last_year_week_total(target_date)
+        if debug :
+            print(f"Moyennes par heure: {snap.averages}")
+        data = {'snap': snap, 'last_year': last_year}
+        if app_config.get_config().sync_server:
+            # Tous les postes de la salle (données synchronisées)
+            data['room'] = stats.room_snapshot_week(target_date).total
+        return data
+
+    def day_stats_data(self, target_date):
+        return {'snap': matrix.snapshot(*matrix.day_bounds(target_date))}
+
+    def month_stats_data(self, target_date):
+        bounds = matrix.month_bounds(target_date)
+        snap = matrix.snapshot(*bounds)
+        logging.debug("Total du mois: %s", snap.total)
+        days, rows = matrix.heatmap(*bounds)
+        # Un repère tous les lundis
+        ticks = [(i, day.strftime('%d/%m')) for i, day in enumerate(days) if day.weekday() == 0]
+        return {'snap': snap, 'rows': rows, 'ticks': ticks}
+
+    def year_stats_data(self, target_date):
+        bounds = matrix.year_bounds(target_date)
+        snap = matrix.snapshot(*bounds)
+        logging.debug("Total de l'année: %s", snap.total)
+        days, rows = matrix.heatmap(*bounds)
+        # Un repère au début de chaque mois
+        ticks = [(i, day.strftime('%b')) for i, day in enumerate(days) if day.day == 1]
+        return {'snap': snap, 'rows': rows, 'ticks': ticks}
+
+    # --- Affichage, dans le thread de l'interface ---
+
+    def display_week_stats(self, parent, data):
+        snap = data['snap']
+        view = self.charts.view("semaine")
+        hours_chart, classes_chart = view.charts
+        hours_chart.update(snap.averages)
+        classes_chart.update([snap.repartition[k] for k in ('6', '5', '4', '3')])
+        text = f"Total cette semaine : {snap.total} (l'an dernier : {data['last_year']})\n - Heure de pic : {snap.peaks}"
+        if 'room' in data:
+            text += f"\n - Salle (tous les postes) : {data['room']}"
+        view.label.config(text=text)
+        view.show(parent)
+
+    def display_day_stats(self, parent, data):
+        snap = data['snap']
+        view = self.charts.view("jour")
+        view.charts[0].update(snap.averages)
+        view.label.config(text=f"Total du jour : {snap.total}\nHeure de pic : {snap.peaks}")
+        view.show(parent)
+
+    def display_month_stats(self, parent, data):
+        snap = data['snap']
+        view = self.charts.view("mois")
+        heatmap_chart, classes_chart = view.charts
+        heatmap_chart.update(data['rows'], data['ticks'])
+        classes_chart.update([snap.repartition[k] for k in ('6', '5', '4', '3')])
+        view.label.config(text=f"Total ce mois : {snap.total}\n - Heure de pic : {snap.peaks}")
+        view.show(parent)
+
+    def display_year_stats(self, parent, data):
+        snap = data['snap']
+        view = self.charts.view("annee")
+        heatmap_chart, classes_chart = view.charts
+        heatmap_chart.update(data['rows'], data['ticks'])
+        classes_chart.update([snap.repartition[k] for k in ('6', '5', '4', '3')])
+        view.label.config(text=f"Total cette année : {snap.total}\n - Heure de pic : {snap.peaks}")
+        view.show(parent)
 
     def show_settings(self):
         self.clear_window()
@@ -515,6 +596,12 @@ class App(tk.Tk):
         logging.info("Déconnexion de l'utilisateur.")
         self.show_login()
 
+    def on_close(self):
+        self.runner.shutdown()
+        journal.stop_flusher()
+        sync.stop_sync()
+        self.destroy()
+
 if __name__ == "__main__":
     app = App()
     app.mainloop()
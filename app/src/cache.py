@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from .connection import db_path
+from .utils import day_number
+
+# Cache LRU des résultats de statistiques, indexé par (base, fonction,
+# période). Chaque entrée retient la plage de jours qu'elle couvre pour
+# être invalidée uniquement quand une écriture touche cette plage.
+# Les valeurs renvoyées sont partagées : ne pas les modifier.
+#
+# Chaque base a un numéro de génération, incrémenté à chaque invalidation :
+# un résultat calculé pendant qu'une écriture invalidait sa base est
+# renvoyé mais pas gardé, il peut ne pas contenir cette écriture.
+
+class StatsCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # clé -> (plage de jours ou None, valeur)
+        self._generations = {}  # base -> numéro de génération
+        self._clears = 0  # clear() invalide toutes les bases
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, days, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation(key[0])
+        value = compute()
+        with self._lock:
+            if self._generation(key[0]) != generation:
+                return value
+            self._entries[key] = (days, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def _generation(self, path):
+        return self._clears, self._generations.get(path, 0)
+
+    def invalidate(self, jour, path=None):
+        # Supprime les entrées dont la période contient ce jour ; les entrées
+        # sans période (toute la base) sont toujours invalidées
+        path = path or db_path()
+        with self._lock:
+            self._generations[path] = self._generations.get(path, 0) + 1
+            stale = [
+                key for key, (days, _) in self._entries.items()
+                if key[0] == path and (days is None or days[0] <= jour <= days[1])
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._clears += 1
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+stats_cache = StatsCache()
+
+def cached(period):
+    # Décorateur : period(*args, **kwargs) renvoie (début, fin) en
+    # 'AAAA-MM-JJ' pour la période lue par la fonction, ou None pour toute la base
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bounds = period(*args, **kwargs)
+            days = (day_number(bounds[0]), day_number(bounds[1])) if bounds else None
+            key = (db_path(), func.__name__, days)
+            return stats_cache.get_or_compute(key, days, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,179 @@
+import math
+import tkinter as tk
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+# Graphiques réutilisables des écrans de statistiques : chaque vue crée ses
+# figures et ses canevas une seule fois, puis la navigation ne fait que
+# mettre à jour les artistes (hauteurs des barres, angles du camembert,
+# données de la courbe) et demander un redessin avec draw_idle().
+# Le nombre de figures reste donc borné quelle que soit la durée d'utilisation.
+
+CLASS_LABELS = ["6ème", "5ème", "4ème", "3ème"]
+
+class _Chart:
+    hide_axes_when_empty = True
+
+    def __init__(self, master, title, figsize):
+        self.fig = Figure(figsize=figsize)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_title(title)
+        self.empty_text = self.ax.text(
+            0.5, 0.5, 'Aucune donnée',
+            horizontalalignment='center',
+            verticalalignment='center',
+            transform=self.ax.transAxes,
+            visible=False,
+        )
+        self.canvas = FigureCanvasTkAgg(self.fig, master)
+        self.widget = self.canvas.get_tk_widget()
+
+    def set_empty(self, empty):
+        self.empty_text.set_visible(empty)
+        if self.hide_axes_when_empty:
+            self.ax.set_axis_off() if empty else self.ax.set_axis_on()
+
+    def set_ymax(self, values):
+        self.ax.set_ylim(0, max(list(values) + [1]) * 1.15)
+
+class BarChart(_Chart):
+    def __init__(self, master, title, xlabel, ylabel, color, rotation=45, figsize=(5, 3)):
+        super().__init__(master, title, figsize)
+        self.color = color
+        self.rotation = rotation
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.bars = None
+        self.labels = None
+
+    def update(self, data):
+        labels, values = list(data.keys()), list(data.values())
+        if labels != self.labels:
+            # Nouvel ensemble de barres seulement si les catégories changent
+            # (ex. nombre de jours du mois) ; sinon on change les hauteurs
+            if self.bars is not None:
+                self.bars.remove()
+            positions = range(len(labels))
+            self.bars = self.ax.bar(positions, values, color=self.color)
+            self.ax.set_xticks(positions, labels, rotation=self.rotation)
+            self.labels = labels
+            self.fig.tight_layout()
+        else:
+            for bar, value in zip(self.bars, values):
+                bar.set_height(value)
+        self.set_ymax(values)
+        self.set_empty(not labels)
+        self.canvas.draw_idle()
+
+class LineChart(_Chart):
+    def __init__(self, master, labels, title, color, figsize=(6, 4)):
+        super().__init__(master, title, figsize)
+        self.labels = list(labels)
+        positions = range(len(self.labels))
+        self.line, = self.ax.plot(positions, [0] * len(self.labels), marker='o', color=color)
+        self.ax.set_xticks(positions, self.labels)
+
+    def update(self, data):
+        values = [data.get(label, 0) for label in self.labels]
+        self.line.set_ydata(values)
+        self.set_ymax(values)
+        self.canvas.draw_idle()
+
+class PieChart(_Chart):
+    hide_axes_when_empty = False
+
+    def __init__(self, master, title="Répartition par classe", labels=CLASS_LABELS, figsize=(5, 3)):
+        super().__init__(master, title, figsize)
+        self.wedges, self.texts, self.autotexts = self.ax.pie(
+            [1] * len(labels), labels=labels, autopct='%1.1f%%'
+        )
+
+    def update(self, values):
+        total = sum(values)
+        if total > 0:
+            # Mêmes positions que ax.pie() : départ à 0°, sens trigonométrique
+            theta1 = 0
+            for wedge, text, autotext, value in zip(self.wedges, self.texts, self.autotexts, values):
+                theta2 = theta1 + 360 * value / total
+                wedge.set_theta1(theta1)
+                wedge.set_theta2(theta2)
+                middle = math.radians((theta1 + theta2) / 2)
+                x, y = math.cos(middle), math.sin(middle)
+                text.set_position((1.1 * x, 1.1 * y))
+                text.set_horizontalalignment('left' if x > 0 else 'right')
+                autotext.set_position((0.6 * x, 0.6 * y))
+                autotext.set_text(f"{100 * value / total:.1f}%")
+                theta1 = theta2
+        for artist in (*self.wedges, *self.texts, *self.autotexts):
+            artist.set_visible(total > 0)
+        self.set_empty(total == 0)
+        self.canvas.draw_idle()
+
+class HeatmapChart(_Chart):
+    # Carte de chaleur jour × créneau : une colonne par jour, une ligne par
+    # créneau. L'image est créée une fois puis ses données remplacées.
+    def __init__(self, master, title, slots, cmap='viridis', figsize=(10, 3)):
+        super().__init__(master, title, figsize)
+        self.slots = list(slots)
+        self.image = self.ax.imshow(
+            [[0]], aspect='auto', cmap=cmap, interpolation='nearest', origin='upper'
+        )
+        self.ax.set_yticks(range(len(self.slots)), self.slots)
+        self.colorbar = self.fig.colorbar(self.image, ax=self.ax)
+        self.fig.tight_layout()
+
+    def update(self, rows, ticks):
+        # rows : une liste de totaux par créneau pour chaque jour ;
+        # ticks : [(indice du jour, libellé)] affichés sous l'axe
+        columns = len(rows)
+        data = [[row[slot] for row in rows] for slot in range(len(self.slots))] if rows else [[0]]
+        self.image.set_data(data)
+        self.image.set_extent((-0.5, max(columns, 1) - 0.5, len(self.slots) - 0.5, -0.5))
+        self.image.set_clim(0, max([max(row) for row in rows if row] + [1]))
+        self.ax.set_xticks([i for i, _ in ticks], [label for _, label in ticks])
+        self.set_empty(not any(any(row) for row in rows))
+        self.canvas.draw_idle()
+
+class ChartView:
+    # Cadre persistant d'une vue : ses graphiques et une ligne de texte
+    def __init__(self, master, bg, fg, font, build_charts, pack_options):
+        self.frame = tk.Frame(master, bg=bg)
+        self.charts = build_charts(self.frame)
+        for chart in self.charts:
+            chart.widget.pack(**pack_options)
+        self.label = tk.Label(self.frame, bg=bg, fg=fg, font=font)
+        self.label.pack(pady=10)
+
+    def show(self, container):
+        # Affiché dans un cadre de l'écran courant, au-dessus de ses voisins
+        self.frame.pack(in_=container, fill="both", expand=True)
+        self.frame.lift()
+
+class ChartManager:
+    def __init__(self, master):
+        self.master = master
+        self.factories = {}
+        self.views = {}
+
+    def register(self, name, factory):
+        # factory(master) -> ChartView, appelée à la première utilisation
+        self.factories[name] = factory
+
+    def view(self, name):
+        if name not in self.views:
+            self.views[name] = self.factories[name](self.master)
+        return self.views[name]
+
+    def owns(self, widget):
+        return any(view.frame is widget for view in self.views.values())
+
+    def hide_all(self):
+        for view in self.views.values():
+            view.frame.pack_forget()
+
+    def reset(self):
+        # Après un changement de thème : les vues seront recréées
+        for view in self.views.values():
+            view.frame.destroy()
+        self.views.clear()
@@ -0,0 +1,393 @@
+import argparse
+import calendar
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+# Ligne de commande sans interface graphique : python -m src <commande>
+# (depuis le dossier app/). N'importe ni tkinter ni pyplot : utilisable sur
+# un serveur ou dans une tâche planifiée. Par défaut, agit sur la base
+# courante de config.cfg ; --base choisit un fichier, --all-bases répète la
+# commande sur chaque Base-YYYY.db du dossier de données.
+#
+# Seules les commandes qui écrivent (import, rebuild, sync, migrate) migrent
+# la base. stats lit les bases en lecture seule, quel que soit leur schéma ;
+# export et check --parity demandent une base à jour (commande migrate).
+#
+#   python -m src stats --period semaine --date 2025-03-10
+#   python -m src stats --start 2025-01-01 --end 2025-06-30 --json
+#   python -m src export csv sortie.csv.gz --start 2025-01-01
+#   python -m src import donnees.csv
+#   python -m src --all-bases check
+#   python -m src --all-bases --data-dir /srv/cdi export pdf rapport.pdf
+#   python -m src rebuild
+#   python -m src --all-bases migrate
+#   python -m src rooms /srv/salles --period semaine --date 2025-03-10
+#   python -m src sync --server http://192.168.1.10:8765
+#   python -m src sync-server --db central.db --port 8765
+
+PERIODS = ('jour', 'semaine', 'mois', 'annee')
+CLASS_ARGS = {'6': 'sixieme', '5': 'cinquieme', '4': 'quatrieme', '3': 'troisieme'}
+
+def _date(value):
+    # Validation des dates passées en argument (AAAA-MM-JJ)
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"date invalide (AAAA-MM-JJ attendu) : {value}")
+    return value
+
+def _bases(args, create=False):
+    from .connection import db_path
+    from .federation import discover_bases
+    if args.all_bases:
+        return discover_bases(args.data_dir or os.path.dirname(db_path()))
+    if args.base and not create and not os.path.exists(args.base):
+        raise ValueError(f"base introuvable : {args.base}")
+    return [os.path.abspath(args.base) if args.base else db_path()]
+
+def _use_base(path):
+    # Base à modifier : migrée au schéma courant
+    from .connection import set_db_path
+    from .migrations import migrate
+    set_db_path(path)
+    migrate()
+
+def _schema_version(path):
+    from .connection import open_readonly
+    conn = open_readonly(path)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+def _read_base(path):
+    # Base lue par les requêtes de statistics ou export : jamais migrée ici
+    from .connection import set_db_path
+    from .migrations import SCHEMA_VERSION
+    version = _schema_version(path)
+    if version < SCHEMA_VERSION:
+        raise ValueError(
+            f"{os.path.basename(path)} : schéma en version {version} (attendu {SCHEMA_VERSION}), "
+            f"lancer d'abord 'python -m src --base {path} migrate'"
+        )
+    set_db_path(path)
+
+def _output_path(filepath, base, several):
+    # Avec plusieurs bases : un fichier par base (rapport.pdf -> rapport-Base-2025.pdf)
+    if not several:
+        return filepath
+    name = os.path.splitext(os.path.basename(base))[0]
+    root, ext = os.path.splitext(filepath)
+    if ext == '.gz':
+        root, inner = os.path.splitext(root)
+        ext = inner + ext
+    return f"{root}-{name}{ext}"
+
+def _period_bounds(args):
+    # (début, fin) de --start/--end, ou de --period autour de --date
+    from .statistics import _week_bounds
+    if args.start or args.end:
+        if not (args.start and args.end):
+            raise SystemExit("--start et --end vont ensemble")
+        return args.start, args.end
+    target = datetime.strptime(args.date, '%Y-%m-%d') if args.date else datetime.now()
+    if args.period == 'jour':
+        return target.strftime('%Y-%m-%d'), target.strftime('%Y-%m-%d')
+    if args.period == 'semaine':
+        return _week_bounds(target)
+    if args.period == 'mois':
+        last_day = calendar.monthrange(target.year, target.month)[1]
+        return target.strftime('%Y-%m-01'), target.replace(day=last_day).strftime('%Y-%m-%d')
+    return f"{target.year}-01-01", f"{target.year}-12-31"
+
+def _period_snapshot(args, base):
+    # En lecture seule, sans migration (voir src/federation.py)
+    from .federation import Federation
+    federation = Federation([base])
+    try:
+        return federation.snapshot(*_period_bounds(args))
+    finally:
+        federation.close()
+
+def _snapshot_result(name, snap):
+    return {
+        'base': name,
+        'start': snap.start,
+        'end': snap.end,
+        'total': snap.total,
+        'peaks': snap.peaks,
+        'averages': snap.averages,
+        'repartition': snap.repartition,
+    }
+
+def cmd_stats(args):
+    results = []
+    for base in _bases(args):
+        results.append(_snapshot_result(os.path.basename(base), _period_snapshot(args, base)))
+    if args.json:
+        json.dump(results if args.all_bases else results[0], sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    for result in results:
+        print(f"{result['base']} : du {result['start']} au {result['end']}")
+        print(f"  Total : {result['total']}")
+        print(f"  Heure(s) de pic : {', '.join(result['peaks']) or '-'}")
+        print("  Moyenne par heure : " + ', '.join(f"{h} {v:.1f}" for h, v in result['averages'].items()))
+        print("  Répartition : " + ', '.join(f"{k}e {v}" for k, v in result['repartition'].items()))
+    return 0
+
+def cmd_rooms(args):
+    from .rooms import aggregate
+    if not os.path.isdir(args.rooms_dir):
+        raise ValueError(f"dossier introuvable : {args.rooms_dir}")
+    start, end = _period_bounds(args)
+    per_room, (overall, _) = aggregate(args.rooms_dir, start, end, cache_dir=args.cache_dir, workers=args.workers)
+    if args.json:
+        json.dump({
+            'rooms': {name: _snapshot_result(name, snap) for name, (snap, _) in per_room.items()},
+            'overall': _snapshot_result('*', overall),
+        }, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    print(f"{len(per_room)} salle(s) : du {start} au {end}")
+    width = max([len(name) for name in per_room] + [len('Ensemble')])
+    for name, (snap, _) in list(per_room.items()) + [('Ensemble', (overall, None))]:
+        classes = ' '.join(f"{k}e {v:>5}" for k, v in snap.repartition.items())
+        print(f"  {name:{width}s} {snap.total:>7}  pic {', '.join(snap.peaks) or '-':13s} {classes}")
+    return 0
+
+def cmd_export(args):
+    from . import export
+    bases = _bases(args)
+    for base in bases:
+        _read_base(base)
+        filepath = _output_path(args.file, base, len(bases) > 1)
+        if args.format == 'csv':
+            classes = None
+            if args.classes:
+                unknown = [c for c in args.classes.split(',') if c not in CLASS_ARGS]
+                if unknown:
+                    raise ValueError(f"classe(s) inconnue(s) : {', '.join(unknown)}")
+                classes = [CLASS_ARGS[c] for c in args.classes.split(',')]
+            count = export.export_csv(filepath, args.start, args.end, classes=classes,
+                                      compress=True if args.gzip else None)
+            print(f"{filepath} : {count} ligne(s)")
+        else:
+            pages = export.export_pdf(filepath, args.start, args.end, title=args.title)
+            print(f"{filepath} : {pages} page(s)")
+    return 0
+
+def cmd_import(args):
+    from .importer import import_csv
+    if args.all_bases:
+        raise SystemExit("import : choisir une seule base (--base)")
+    _use_base(_bases(args, create=True)[0])
+    report = import_csv(args.file, batch_size=args.batch_size)
+    print(f"{report.imported} ligne(s) importée(s) sur {report.lines}, {report.rejected_count} rejetée(s)")
+    for line, reason in report.rejected[:args.show_rejected]:
+        print(f"  ligne {line} : {reason}")
+    return 1 if report.rejected_count and args.strict else 0
+
+def _rollup_mismatches(conn):
+    # Lignes de rollup_jour différentes d'un recalcul depuis attendance
+    fresh = '''
+        SELECT jour, COUNT(*), SUM(total), SUM(sixieme), SUM(cinquieme), SUM(quatrieme), SUM(troisieme)
+        FROM attendance GROUP BY jour
+    '''
+    stored = 'SELECT jour, nb, total, sixieme, cinquieme, quatrieme, troisieme FROM rollup_jour'
+    return conn.execute(f'''
+        SELECT COUNT(*) FROM (
+            SELECT * FROM ({fresh} EXCEPT {stored})
+            UNION ALL
+            SELECT * FROM ({stored} EXCEPT {fresh})
+        )
+    ''').fetchone()[0]
+
+def cmd_check(args):
+    from .connection import open_readonly
+    from .migrations import SCHEMA_VERSION
+    failures = 0
+    for base in _bases(args):
+        problems = []
+        conn = open_readonly(base)
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < SCHEMA_VERSION:
+                problems.append(f"schéma en version {version} (attendu {SCHEMA_VERSION}), lancer 'migrate'")
+            integrity = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+            if integrity != ['ok']:
+                problems.extend(f"intégrité : {message}" for message in integrity)
+            if version >= SCHEMA_VERSION:
+                mismatches = _rollup_mismatches(conn)
+                if mismatches:
+                    problems.append(f"{mismatches} ligne(s) d'agrégats incohérente(s), lancer 'rebuild'")
+        finally:
+            conn.close()
+        if args.parity and not problems:
+            problems.extend(_parity(base))
+        status = 'OK' if not problems else 'ERREUR'
+        print(f"{os.path.basename(base)} : {status}")
+        for problem in problems:
+            print(f"  - {problem}")
+        failures += bool(problems)
+    from . import journal
+    waiting = journal.pending()
+    if waiting:
+        print(f"Journal : {waiting} entrée(s) en attente d'application")
+    aside = journal.set_aside()
+    if aside:
+        print(f"Journal : {aside} entrée(s) mise(s) de côté (base inutilisable), voir {journal.set_aside_path()}")
+    return 1 if failures else 0
+
+def _parity(base):
+    # Moteur colonne (NumPy) contre moteur SQL sur quelques dates de la base
+    from . import columnar
+    from .connection import get_connection
+    if not columnar.available():
+        return []
+    _read_base(base)
+    rows = get_connection(base).execute(
+        'SELECT DISTINCT date FROM attendance ORDER BY random() LIMIT 5'
+    ).fetchall()
+    dates = [datetime.strptime(row[0], '%Y-%m-%d') for row in rows]
+    mismatches = columnar.parity_report(columnar.ColumnStore([base]), dates)
+    return [f"parité NumPy : {name} ({expected} != {actual})" for name, expected, actual in mismatches]
+
+def cmd_rebuild(args):
+    from .rollups import rebuild_rollups
+    for base in _bases(args):
+        _use_base(base)
+        rebuild_rollups(base)
+        print(f"{os.path.basename(base)} : agrégats reconstruits")
+    return 0
+
+def cmd_migrate(args):
+    from .migrations import SCHEMA_VERSION
+    for base in _bases(args):
+        version = _schema_version(base)
+        _use_base(base)
+        if version < SCHEMA_VERSION:
+            print(f"{os.path.basename(base)} : schéma {version} -> {SCHEMA_VERSION}")
+        else:
+            print(f"{os.path.basename(base)} : à jour")
+    return 0
+
+def cmd_sync(args):
+    from . import sync
+    from .config import get_config
+    config = get_config()
+    server = args.server or config.sync_server
+    if not server:
+        raise ValueError("aucun serveur : --server ou [Sync] server dans config.cfg")
+    if args.all_bases:
+        # Un seul numéro de séquence par poste : une base à la fois
+        raise ValueError("sync ne prend qu'une base (--base)")
+    base = _bases(args)[0]
+    _use_base(base)
+    client = sync.SyncClient(server, args.terminal or config.terminal or sync.default_terminal())
+    try:
+        pushed, pulled = sync.sync_once(client, base)
+    finally:
+        client.close()
+    print(f"{os.path.basename(base)} : {pushed} créneau(x) envoyé(s), {pulled} reçu(s)")
+    return 0
+
+def cmd_sync_server(args):
+    from .sync_server import make_server
+    server = make_server(args.db, args.host, args.port)
+    print(f"Serveur de synchronisation sur {args.host}:{args.port} ({args.db})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src', description="CDIStats en ligne de commande")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--base', help="fichier de base à utiliser (par défaut : celle de config.cfg)")
+    target.add_argument('--all-bases', action='store_true', help="toutes les bases Base-YYYY.db du dossier de données")
+    parser.add_argument('--data-dir', help="dossier des bases pour --all-bases (défaut : celui de la base courante)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="affiche les logs sur la sortie d'erreur")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_range(sub):
+        sub.add_argument('--start', type=_date, help="premier jour (AAAA-MM-JJ)")
+        sub.add_argument('--end', type=_date, help="dernier jour (AAAA-MM-JJ)")
+
+    stats = commands.add_parser('stats', help="statistiques d'une période")
+    add_range(stats)
+    stats.add_argument('--period', choices=PERIODS, default='semaine', help="période autour de --date (défaut : semaine)")
+    stats.add_argument('--date', type=_date, help="jour de référence (défaut : aujourd'hui)")
+    stats.add_argument('--json', action='store_true', help="sortie JSON")
+    stats.set_defaults(func=cmd_stats)
+
+    rooms = commands.add_parser('rooms', help="statistiques de plusieurs salles (un dossier de bases par salle)")
+    rooms.add_argument('rooms_dir', help="dossier des salles : un sous-dossier (ou un fichier .db) par salle")
+    add_range(rooms)
+    rooms.add_argument('--period', choices=PERIODS, default='semaine', help="période autour de --date (défaut : semaine)")
+    rooms.add_argument('--date', type=_date, help="jour de référence (défaut : aujourd'hui)")
+    rooms.add_argument('--workers', type=int, help="processus de calcul (défaut : un par cœur)")
+    rooms.add_argument('--cache-dir', help="dossier des résumés (défaut : <dossier>/.cache-salles)")
+    rooms.add_argument('--json', action='store_true', help="sortie JSON")
+    rooms.set_defaults(func=cmd_rooms)
+
+    export = commands.add_parser('export', help="export CSV ou PDF")
+    export.add_argument('format', choices=('csv', 'pdf'))
+    export.add_argument('file', help="fichier de sortie (.csv, .csv.gz ou .pdf)")
+    add_range(export)
+    export.add_argument('--classes', help="classes retenues pour le CSV, ex. 6,5")
+    export.add_argument('--gzip', action='store_true', help="compresse le CSV")
+    export.add_argument('--title', default="Fréquentation du CDI", help="titre du rapport PDF")
+    export.set_defaults(func=cmd_export)
+
+    imp = commands.add_parser('import', help="import d'un fichier CSV")
+    imp.add_argument('file')
+    imp.add_argument('--batch-size', type=int, default=10000)
+    imp.add_argument('--show-rejected', type=int, default=20, metavar='N', help="nombre de rejets affichés")
+    imp.add_argument('--strict', action='store_true', help="code de retour 1 si des lignes sont rejetées")
+    imp.set_defaults(func=cmd_import)
+
+    check = commands.add_parser('check', help="vérifie intégrité, schéma et agrégats")
+    check.add_argument('--parity', action='store_true', help="compare aussi le moteur NumPy au moteur SQL")
+    check.set_defaults(func=cmd_check)
+
+    rebuild = commands.add_parser('rebuild', help="reconstruit les tables d'agrégats")
+    rebuild.set_defaults(func=cmd_rebuild)
+
+    migrate = commands.add_parser('migrate', help="met le schéma des bases à jour")
+    migrate.set_defaults(func=cmd_migrate)
+
+    sync_cmd = commands.add_parser('sync', help="synchronise avec le serveur des autres postes")
+    sync_cmd.add_argument('--server', help="adresse du serveur (défaut : [Sync] server)")
+    sync_cmd.add_argument('--terminal', help="nom de ce poste (défaut : [Sync] terminal ou nom de l'ordinateur)")
+    sync_cmd.set_defaults(func=cmd_sync)
+
+    server = commands.add_parser('sync-server', help="lance le serveur de synchronisation")
+    server.add_argument('--db', default='sync-central.db', help="base du serveur")
+    server.add_argument('--host', default='0.0.0.0')
+    server.add_argument('--port', type=int, default=8765)
+    server.set_defaults(func=cmd_sync_server)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(levelname)s %(message)s',
+    )
+    # Moteur de rendu sans affichage, au cas où un module chargerait pyplot
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Sortie coupée (ex. | head) : pas d'erreur à afficher
+        sys.stdout = open(os.devnull, 'w')
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return 1
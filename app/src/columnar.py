@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+
+from .connection import open_readonly
+from .migrations import DAY_NUMBER_SQL
+from .statistics import HOURS, StatsSnapshot, _week_bounds
+from .utils import day_number
+
+try:
+    import numpy as np
+except ImportError:  # backend optionnel
+    np = None
+
+# Moteur colonne (NumPy) pour les statistiques sur plusieurs années :
+# les colonnes d'attendance d'une ou plusieurs bases sont chargées en
+# tableaux triés par jour, puis chaque statistique se calcule par
+# découpage (searchsorted) et regroupement vectorisé (bincount/reduceat).
+# Les résultats sont identiques à ceux de src/statistics.py.
+#
+# Les bases sont lues en lecture seule, sans migration : une base ancienne
+# (sans colonne jour ni index unique) a son jour calculé depuis date et ses
+# saisies multiples d'un créneau additionnées, comme à la migration.
+
+CLASS_KEYS = ('6', '5', '4', '3')
+LOAD_CHUNK = 100000
+COUNT_COLUMNS = ('sixieme', 'cinquieme', 'quatrieme', 'troisieme', 'total')
+
+def available():
+    return np is not None
+
+def _load_query(conn):
+    # Requête (jour, heure, classes, total) d'une base ; None sans table attendance
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(attendance)')]
+    if not columns:
+        return None
+    if 'jour' in columns:
+        return f'''
+            SELECT jour, heure, {', '.join(f'COALESCE({c}, 0)' for c in COUNT_COLUMNS)}
+            FROM attendance
+        '''
+    return f'''
+        SELECT {DAY_NUMBER_SQL.format(col='date')}, heure,
+               {', '.join(f'COALESCE(SUM({c}), 0)' for c in COUNT_COLUMNS)}
+        FROM attendance GROUP BY date, heure
+    '''
+
+class ColumnStore:
+    def __init__(self, paths):
+        if np is None:
+            raise RuntimeError("NumPy n'est pas installé")
+        self.paths = list(paths)
+        jours, heures, counts = [], [], []
+        for path in self.paths:
+            conn = open_readonly(path)
+            try:
+                query = _load_query(conn)
+                if query is None:
+                    continue
+                cursor = conn.execute(query)
+                while True:
+                    rows = cursor.fetchmany(LOAD_CHUNK)
+                    if not rows:
+                        break
+                    jours.append(np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)))
+                    heures.extend(r[1] for r in rows)
+                    counts.append(np.array([r[2:] for r in rows], dtype=np.int64).reshape(-1, 5))
+            finally:
+                conn.close()
+        jour = np.concatenate(jours) if jours else np.zeros(0, dtype=np.int64)
+        values = np.concatenate(counts) if counts else np.zeros((0, 5), dtype=np.int64)
+
+        # Créneaux codés en petits entiers, dans l'ordre des libellés
+        labels, codes = np.unique(np.array(heures, dtype=str), return_inverse=True)
+        self.hour_labels = [str(h) for h in labels]
+
+        order = np.argsort(jour, kind='stable')
+        self.base_day = int(jour.min()) if len(jour) else 0
+        self.day = (jour[order] - self.base_day).astype(np.int32)  # décalage en jours
+        self.hour = codes.reshape(-1)[order].astype(np.int8)
+        self.classes = values[order, :4]
+        self.total = values[order, 4]
+
+    def __len__(self):
+        return len(self.day)
+
+    def _slice(self, start=None, end=None):
+        if start is None:
+            return slice(0, len(self.day))
+        lo = np.searchsorted(self.day, day_number(start) - self.base_day, side='left')
+        hi = np.searchsorted(self.day, day_number(end) - self.base_day, side='right')
+        return slice(int(lo), int(hi))
+
+    def _by_hour(self, sl, values):
+        return np.bincount(self.hour[sl], weights=values, minlength=len(self.hour_labels))
+
+    def _hour_sums(self, start=None, end=None):
+        sl = self._slice(start, end)
+        counts = np.bincount(self.hour[sl], minlength=len(self.hour_labels))
+        totals = self._by_hour(sl, self.total[sl])
+        return [
+            (self.hour_labels[i], int(totals[i]), int(counts[i]))
+            for i in np.flatnonzero(counts)
+        ]
+
+    def _total(self, start, end):
+        return int(self.total[self._slice(start, end)].sum())
+
+    def stats_today(self, target_date=None):
+        date_str = (target_date or datetime.now()).strftime('%Y-%m-%d')
+        return self._total(date_str, date_str)
+
+    def stats_semaine(self, target_date=None):
+        return self._total(*_week_bounds(target_date or datetime.now()))
+
+    def average_per_hour(self, start=None, end=None):
+        return {h: total / count for h, total, count in self._hour_sums(start, end)}
+
+    def peak_hours(self, start=None, end=None):
+        hours = {h: total for h, total, _ in self._hour_sums(start, end)}
+        if not hours:
+            return []
+        max_val = max(hours.values())
+        return [h for h, v in hours.items() if v == max_val]
+
+    def repartition_par_classe(self, start=None, end=None):
+        sums = self.classes[self._slice(start, end)].sum(axis=0)
+        return {key: int(v) for key, v in zip(CLASS_KEYS, sums)}
+
+    def average_per_hour_week(self, target_date=None):
+        result = {hour: 0 for hour in HOURS}
+        for hour, total, count in self._hour_sums(*_week_bounds(target_date or datetime.now())):
+            if hour in result:
+                result[hour] = total / count
+        return result
+
+    def snapshot(self, start, end):
+        snap = StatsSnapshot(start, end)
+        sl = self._slice(start, end)
+        counts = np.bincount(self.hour[sl], minlength=len(self.hour_labels))
+        totals = self._by_hour(sl, self.total[sl])
+        for i in np.flatnonzero(counts):
+            snap.hourly_totals[self.hour_labels[i]] = int(totals[i])
+            snap.hourly_counts[self.hour_labels[i]] = int(counts[i])
+        snap.total = int(self.total[sl].sum())
+        snap.repartition = self.repartition_par_classe(start, end)
+        return snap
+
+    def daily_totals(self, start, end):
+        # Sommes par jour : reduceat sur les débuts de chaque jour
+        sl = self._slice(start, end)
+        days = self.day[sl]
+        if not len(days):
+            return {}
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        sums = np.add.reduceat(self.total[sl], starts)
+        first = datetime.fromordinal(self.base_day)
+        return {
+            (first + timedelta(days=int(days[i]))).strftime('%Y-%m-%d'): int(s)
+            for i, s in zip(starts, sums)
+        }
+
+def parity_report(store, dates):
+    # Compare le moteur colonne au moteur SQL (src/statistics.py) sur la
+    # base courante ; renvoie la liste des écarts (vide si tout concorde)
+    from . import statistics
+    mismatches = []
+
+    def check(name, expected, actual):
+        if expected != actual:
+            mismatches.append((name, expected, actual))
+
+    check('average_per_hour', statistics.average_per_hour(), store.average_per_hour())
+    check('peak_hours', statistics.peak_hours(), store.peak_hours())
+    check('repartition_par_classe', statistics.repartition_par_classe(), store.repartition_par_classe())
+    for target in dates:
+        label = target.strftime('%Y-%m-%d')
+        start, end = _week_bounds(target)
+        check(f'stats_today {label}', statistics.stats_today(target), store.stats_today(target))
+        check(f'stats_semaine {label}', statistics.stats_semaine(target), store.stats_semaine(target))
+        check(f'average_per_hour_week {label}',
+              statistics.average_per_hour_week(target), store.average_per_hour_week(target))
+        check(f'snapshot {label}', statistics.snapshot(start, end), store.snapshot(start, end))
+        check(f'daily_totals {label}', statistics.daily_totals(start, end), store.daily_totals(start, end))
+    return mismatches
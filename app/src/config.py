@@ -0,0 +1,167 @@
+import configparser
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, fields
+
+# Configuration (config.cfg) lue une seule fois et partagée par tous les
+# modules : get_config() ne relit le fichier que si sa date de modification
+# a changé. Les valeurs sont nettoyées (guillemets, commentaires en fin de
+# ligne), typées et validées ; une valeur invalide est signalée dans les logs
+# et remplacée par sa valeur par défaut.
+
+CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config.cfg'))
+
+THEMES = ('light', 'dark')
+VIEWS = ('dashboard', 'semaine', 'jour', 'mois', 'annee')
+EXPORT_FORMATS = ('csv', 'pdf', 'excel')
+
+@dataclass
+class Config:
+    cdi_name: str = 'AUCUN NOM'
+    debug: bool = False
+    db_path: str = './data/cdi_stats.db'
+    base: str = 'cdi_stats.db'
+    export_format: str = 'csv'
+    export_encoding: str = 'utf-8'
+    log_rotation: int = 7
+    theme: str = 'light'
+    default_view: str = 'dashboard'
+    sync_server: str = ''
+    terminal: str = ''
+
+# (section, clé) de chaque champ, dans l'ordre de Config
+KEYS = {
+    'cdi_name': ('General', 'cdi_name'),
+    'debug': ('General', 'debug'),
+    'db_path': ('Database', 'db_path'),
+    'base': ('Database', 'base'),
+    'export_format': ('Export', 'export_format'),
+    'export_encoding': ('Export', 'export_encoding'),
+    'log_rotation': ('Logs', 'log_rotation'),
+    'theme': ('UI', 'theme'),
+    'default_view': ('UI', 'default_view'),
+    'sync_server': ('Sync', 'server'),
+    'terminal': ('Sync', 'terminal'),
+}
+
+_lock = threading.Lock()
+_config = None
+_mtime = None
+
+def _clean(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        value = value[1:-1]
+    return value
+
+def _check_base(value):
+    # Simple nom de fichier dans data/ : pas de chemin
+    if not value or os.path.basename(value) != value or value in ('.', '..'):
+        raise ValueError(f"nom de base invalide : {value!r}")
+    return value
+
+def _check_rotation(value):
+    value = int(value)
+    if value < 1:
+        raise ValueError(f"doit être au moins 1 : {value}")
+    return value
+
+def _choice(allowed):
+    def check(value):
+        value = value.lower()
+        if value not in allowed:
+            raise ValueError(f"{value!r} n'est pas dans {', '.join(allowed)}")
+        return value
+    return check
+
+def _boolean(value):
+    states = configparser.ConfigParser.BOOLEAN_STATES
+    if value.lower() not in states:
+        raise ValueError(f"booléen attendu : {value!r}")
+    return states[value.lower()]
+
+VALIDATORS = {
+    'debug': _boolean,
+    'base': _check_base,
+    'export_format': _choice(EXPORT_FORMATS),
+    'log_rotation': _check_rotation,
+    'theme': _choice(THEMES),
+    'default_view': _choice(VIEWS),
+}
+
+def parse(path=CONFIG_PATH):
+    parser = configparser.ConfigParser(inline_comment_prefixes=(';', '#'))
+    parser.read(path, encoding='utf-8')
+    config = Config()
+    for field in fields(Config):
+        section, key = KEYS[field.name]
+        if not parser.has_option(section, key):
+            continue
+        raw = _clean(parser.get(section, key))
+        try:
+            value = VALIDATORS.get(field.name, str)(raw)
+        except ValueError as e:
+            logging.warning(f"config.cfg [{section}] {key} : {e}, valeur par défaut utilisée")
+            continue
+        setattr(config, field.name, value)
+    return config
+
+def get_config():
+    # Instance partagée, relue seulement si le fichier a été modifié
+    global _config, _mtime
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    with _lock:
+        if _config is None or mtime != _mtime:
+            _config = parse(CONFIG_PATH)
+            _mtime = mtime
+        return _config
+
+def set_value(name, value):
+    # Modifie une valeur dans config.cfg en gardant le reste du fichier
+    # (commentaires, guillemets) ; écriture atomique via un fichier temporaire
+    global _config, _mtime
+    section, key = KEYS[name]
+    value = str(value).lower() if isinstance(value, bool) else str(value)
+    if name in VALIDATORS:
+        VALIDATORS[name](value)
+    with _lock:
+        lines = []
+        if os.path.exists(CONFIG_PATH):
+            with open(CONFIG_PATH, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        current, section_end, done = None, None, False
+        pattern = re.compile(rf'^(\s*{re.escape(key)}\s*[=:]\s*)("?)([^";]*?)("?)(\s*[;#].*)?$', re.IGNORECASE)
+        for i, line in enumerate(lines):
+            header = re.match(r'^\s*\[([^\]]+)\]', line)
+            if header:
+                current = header.group(1).strip()
+                if current.lower() == section.lower():
+                    section_end = i + 1
+                continue
+            if current is not None and current.lower() == section.lower():
+                if line.strip():
+                    section_end = i + 1
+                match = pattern.match(line)
+                if match:
+                    prefix, quote, _, end_quote, comment = match.groups()
+                    lines[i] = f"{prefix}{quote}{value}{end_quote}{comment or ''}"
+                    done = True
+                    break
+        if not done:
+            if section_end is None:
+                lines += ['', f'[{section}]'] if lines else [f'[{section}]']
+                section_end = len(lines)
+            lines.insert(section_end, f'{key} = {value}')
+        tmp_path = CONFIG_PATH + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, CONFIG_PATH)
+        _config = None
+        _mtime = None
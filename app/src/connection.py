@@ -0,0 +1,148 @@
+import sqlite3
+import os
+import threading
+import atexit
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from .config import get_config
+
+# Connexions SQLite longue durée : une connexion par thread et par base,
+# ouverte à la première utilisation et gardée jusqu'à la fin du processus.
+
+_local = threading.local()
+_lock = threading.Lock()
+_all_connections = []
+_generation = 0
+_db_path = None
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+BUSY_TIMEOUT = 5.0
+
+
+def get_db_path():
+    base_name = get_config().base
+    data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    db_path = os.path.join(data_dir, base_name)
+    # Crée le fichier s'il n'existe pas
+    if not os.path.exists(db_path):
+        # On crée le fichier avec un nom normal : Base-[Année].db
+        annee = datetime.now().year
+        base_name = f"Base-{annee}.db"
+        db_path = os.path.join(data_dir, base_name)
+        open(db_path, 'a').close()
+    return db_path
+
+
+def db_path():
+    # Chemin résolu une seule fois par processus
+    global _db_path
+    if _db_path is None:
+        with _lock:
+            if _db_path is None:
+                _db_path = os.path.abspath(get_db_path())
+    return _db_path
+
+
+def set_db_path(path):
+    # Change la base courante (CLI, outils) ; les connexions existantes
+    # vers l'ancienne base restent ouvertes jusqu'à close_all()
+    global _db_path
+    with _lock:
+        _db_path = os.path.abspath(path) if path else None
+
+
+def _open(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        isolation_level=None,  # transactions gérées explicitement par transaction()
+        check_same_thread=False,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with _lock:
+        _all_connections.append(conn)
+    return conn
+
+
+def open_readonly(path):
+    # Connexion hors du pool, en lecture seule : la base n'est ni migrée ni
+    # passée en WAL (bases des autres années, des autres CDI). À fermer.
+    return sqlite3.connect(Path(path).as_uri() + '?mode=ro', uri=True)
+
+
+def get_connection(path=None):
+    path = os.path.abspath(path) if path else db_path()
+    conns = getattr(_local, 'connections', None)
+    if conns is None or _local.generation != _generation:
+        # Première connexion du thread, ou connexions fermées par close_all()
+        conns = _local.connections = {}
+        _local.generation = _generation
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _open(path)
+    return conn
+
+
+@contextmanager
+def transaction(path=None):
+    # Transaction sur la connexion du thread courant : commit à la sortie,
+    # rollback en cas d'exception. Les appels imbriqués réutilisent la
+    # transaction englobante (profondeur comptée par connexion : une
+    # transaction restée ouverte par erreur n'est jamais prise pour la
+    # transaction englobante). Si le COMMIT échoue (base verrouillée), la
+    # transaction est annulée avant de remonter l'erreur.
+    conn = get_connection(path)
+    depths = _local.__dict__.setdefault('depths', {})
+    key = id(conn)
+    if depths.get(key):
+        depths[key] += 1
+        try:
+            yield conn
+        finally:
+            depths[key] -= 1
+        return
+    if conn.in_transaction:
+        conn.execute('ROLLBACK')  # reste d'un échec précédent
+    depths[key] = 1
+    try:
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        try:
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+    finally:
+        depths[key] = 0
+
+
+def close_all():
+    global _generation
+    with _lock:
+        conns = list(_all_connections)
+        _all_connections.clear()
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+atexit.register(close_all)
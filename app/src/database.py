@@ -1,82 +1,50 @@
-import sqlite3
-import csv
-import os
-import datetime
-import configparser
-from datetime import datetime
+from . import journal, users
+from .connection import get_db_path, transaction
+from .migrations import migrate
+from .utils import day_number
 
-def get_db_path():
-    config = configparser.ConfigParser()
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config.cfg')
-    config.read(config_path, encoding='utf-8')
-    base_name = config.get('Database', 'Base', fallback='cdi_stats.db')
-    data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-    db_path = os.path.join(data_dir, base_name)
-    # Crée le fichier s'il n'existe pas
-    if not os.path.exists(db_path):
-        # On crée le fichier avec un nom normal : Base-[Année].db
-        annee = datetime.now().year
-        base_name = f"Base-{annee}.db"
-        db_path = os.path.join(data_dir, base_name)
-        open(db_path, 'a').close()
-    return db_path
+# Colonnes historiques d'attendance (ordre des tuples renvoyés)
+ATTENDANCE_COLUMNS = 'id, heure, sixieme, cinquieme, quatrieme, troisieme, total, date'
+
+# Insertion d'une ligne ; une seule ligne par date et créneau, une nouvelle
+# saisie d'un créneau déjà saisi s'y ajoute (même règle que la fusion des
+# doublons à la migration)
+UPSERT_ATTENDANCE = '''
+    INSERT INTO attendance (heure, sixieme, cinquieme, quatrieme, troisieme, total, date, jour)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (date, heure) DO UPDATE SET
+        sixieme = COALESCE(sixieme, 0) + COALESCE(excluded.sixieme, 0),
+        cinquieme = COALESCE(cinquieme, 0) + COALESCE(excluded.cinquieme, 0),
+        quatrieme = COALESCE(quatrieme, 0) + COALESCE(excluded.quatrieme, 0),
+        troisieme = COALESCE(troisieme, 0) + COALESCE(excluded.troisieme, 0),
+        total = COALESCE(total, 0) + COALESCE(excluded.total, 0)
+'''
 
 def get_users_csv():
-    data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-    return os.path.join(data_dir, 'users.csv')
+    # Fichier d'import des comptes, importé dans data/users.db puis supprimé (voir src/users.py)
+    return users.users_csv_path()
 
 def init_db():
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS attendance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            heure TEXT NOT NULL,
-            sixieme INTEGER,
-            cinquieme INTEGER,
-            quatrieme INTEGER,
-            troisieme INTEGER,
-            total INTEGER,
-            date TEXT NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    # Crée ou met à jour le schéma de la base courante, puis applique les
+    # saisies restées dans le journal local
+    migrate()
+    journal.replay()
 
 def add_attendance(heure, sixieme, cinquieme, quatrieme, troisieme, total, date):
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO attendance (heure, sixieme, cinquieme, quatrieme, troisieme, total, date)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (heure, sixieme, cinquieme, quatrieme, troisieme, total, date))
-    conn.commit()
-    conn.close()
+    # Écrite d'abord dans le journal local (voir src/journal.py) : la saisie
+    # ne dépend pas de la disponibilité de la base
+    day_number(date)  # date invalide : erreur immédiate plutôt qu'au rejeu
+    journal.append({
+        'heure': heure, 'sixieme': sixieme, 'cinquieme': cinquieme,
+        'quatrieme': quatrieme, 'troisieme': troisieme, 'total': total, 'date': date,
+    })
 
 def get_all_attendance():
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute('SELECT * FROM attendance')
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    with transaction() as conn:
+        return conn.execute(f'SELECT {ATTENDANCE_COLUMNS} FROM attendance').fetchall()
 
 def authenticate(username, password):
-    users_csv = get_users_csv()
-    if not os.path.exists(users_csv):
-        return False
-    with open(users_csv, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row['username'] == username and row['password'] == password:
-                return True
-    return False
+    # Comptes dans data/users.db (voir src/users.py)
+    return users.authenticate(username, password)
 
 # ...autres fonctions de base de données si besoin...
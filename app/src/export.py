@@ -1,15 +1,210 @@
+import calendar
 import csv
-from .database import get_all_attendance
+import gzip
+from datetime import date, datetime
+from .connection import transaction
+from .statistics import HOURS, snapshot
+from .utils import day_number
 
-def export_csv(filepath):
-    data = get_all_attendance()
-    headers = ['id', 'heure', 'sixieme', 'cinquieme', 'quatrieme', 'troisieme', 'total', 'date']
-    with open(filepath, 'w', newline='', encoding='utf-8') as f:
+CLASS_FIELDS = ('sixieme', 'cinquieme', 'quatrieme', 'troisieme')
+CHUNK_SIZE = 5000
+
+def _export_query(start=None, end=None, classes=None):
+    # Colonnes de classes retenues ; le total est recalculé sur ces classes
+    if classes:
+        unknown = [c for c in classes if c not in CLASS_FIELDS]
+        if unknown:
+            raise ValueError(f"classe(s) inconnue(s) : {', '.join(map(str, unknown))}")
+    classes = [c for c in CLASS_FIELDS if c in classes] if classes else list(CLASS_FIELDS)
+    total = 'total' if len(classes) == len(CLASS_FIELDS) else ' + '.join(classes)
+    headers = ['id', 'heure', *classes, 'total', 'date']
+    where, params = '', ()
+    if start or end:
+        where = 'WHERE jour BETWEEN ? AND ?'
+        params = (day_number(start) if start else 0, day_number(end) if end else 10 ** 9)
+    sql = f'''
+        SELECT id, heure, {', '.join(classes)}, {total}, date
+        FROM attendance {where}
+        ORDER BY jour, heure
+    '''
+    return headers, sql, params
+
+def _open_output(filepath, compress, encoding):
+    if compress is None:
+        compress = filepath.endswith('.gz')
+    if compress:
+        return gzip.open(filepath, 'wt', newline='', encoding=encoding)
+    return open(filepath, 'w', newline='', encoding=encoding)
+
+def export_csv(filepath, start=None, end=None, classes=None, compress=None,
+               progress=None, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+    # Export par morceaux depuis un curseur : la mémoire reste constante
+    # quelle que soit la taille de la base. progress(nb de lignes écrites)
+    # est appelé après chaque morceau.
+    headers, sql, params = _export_query(start, end, classes)
+    written = 0
+    with transaction() as conn, _open_output(filepath, compress, encoding) as f:
         writer = csv.writer(f)
         writer.writerow(headers)
-        writer.writerows(data)
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+# --- Rapport PDF ---
+# Généré sans Tk avec le moteur PDF de matplotlib (pypdf ne sait pas
+# dessiner). Une seule figure A4 est construite pour tout le rapport :
+# à chaque page on met à jour les barres, le camembert et le tableau puis
+# on l'enregistre comme nouvelle page.
+
+MONTHS_FR = ['janvier', 'février', 'mars', 'avril', 'mai', 'juin', 'juillet',
+             'août', 'septembre', 'octobre', 'novembre', 'décembre']
+CLASS_LABELS = ["6ème", "5ème", "4ème", "3ème"]
+BAR_COLOR = "#40739e"
+ROWS_PER_PAGE = 31
+
+class _ReportFigure:
+    def __init__(self):
+        from matplotlib.figure import Figure
+        self.fig = Figure(figsize=(8.27, 11.69))  # A4 portrait
+        self.title = self.fig.suptitle('', fontsize=16, fontweight='bold', y=0.97)
+        self.subtitle = self.fig.text(0.5, 0.925, '', ha='center', fontsize=11)
+        grid = self.fig.add_gridspec(2, 2, height_ratios=[1, 1.7], top=0.88, bottom=0.04,
+                                     left=0.08, right=0.95, hspace=0.3, wspace=0.3)
+        self.ax_bar = self.fig.add_subplot(grid[0, 0])
+        self.ax_pie = self.fig.add_subplot(grid[0, 1])
+        self.ax_table = self.fig.add_subplot(grid[1, :])
+        self.bars = self.ax_bar.bar(HOURS, [0] * len(HOURS), color=BAR_COLOR)
+        self.ax_bar.set_title("Moyenne d'élèves par heure")
+        self.ax_bar.set_xlabel('Heures')
+        self.ax_bar.set_ylabel("Nombre moyen d'élèves")
+        self.ax_bar.tick_params(axis='x', labelrotation=45)
+
+    def update(self, title, subtitle, snap, header, rows):
+        self.title.set_text(title)
+        self.subtitle.set_text(subtitle)
+
+        averages = [snap.averages[h] for h in HOURS]
+        for bar, value in zip(self.bars, averages):
+            bar.set_height(value)
+        self.ax_bar.set_ylim(0, max(averages + [1]) * 1.15)
+
+        self.ax_pie.clear()
+        values = [snap.repartition[k] for k in ('6', '5', '4', '3')]
+        if sum(values) > 0:
+            self.ax_pie.pie(values, labels=CLASS_LABELS, autopct='%1.1f%%')
+        else:
+            self.ax_pie.text(0.5, 0.5, 'Aucune donnée', ha='center', va='center',
+                             transform=self.ax_pie.transAxes)
+            self.ax_pie.axis('off')
+        self.ax_pie.set_title("Répartition par classe")
+
+        self.ax_table.clear()
+        self.ax_table.axis('off')
+        if rows:
+            height = min(1.0, (len(rows) + 1) * 0.032)
+            table = self.ax_table.table(cellText=rows, colLabels=header, cellLoc='center',
+                                        bbox=[0, 1 - height, 1, height])
+            table.auto_set_font_size(False)
+            table.set_fontsize(8)
+        else:
+            self.ax_table.text(0.5, 0.9, 'Aucune donnée', ha='center', va='center',
+                               transform=self.ax_table.transAxes)
+
+def _fr_date(date_str):
+    return datetime.strptime(date_str, '%Y-%m-%d').strftime('%d/%m/%Y')
+
+def _month_label(year, month):
+    return f"{MONTHS_FR[month - 1]} {year}"
+
+def _months(start, end):
+    # (année, mois) de chaque mois touché par la période
+    year, month = int(start[:4]), int(start[5:7])
+    while (year, month) <= (int(end[:4]), int(end[5:7])):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+def _base_bounds():
+    with transaction() as conn:
+        first, last = conn.execute('SELECT MIN(jour), MAX(jour) FROM attendance').fetchone()
+    if first is None:
+        today = datetime.now().date().isoformat()
+        return today, today
+    return date.fromordinal(first).isoformat(), date.fromordinal(last).isoformat()
+
+def _rows_with_total(rows):
+    # Ajoute une ligne de total aux lignes (libellé, total, 6e, 5e, 4e, 3e)
+    if not rows:
+        return []
+    sums = [sum(r[i] for r in rows) for i in range(1, 6)]
+    return [[str(v) for v in r] for r in rows] + [['Total'] + [str(v) for v in sums]]
+
+def _month_rows(start, end):
+    # Regroupé depuis rollup_jour pour respecter des bornes en milieu de mois
+    with transaction() as conn:
+        rows = conn.execute('''
+            SELECT strftime('%Y-%m', jour + 1721424.5) AS mois,
+                   SUM(total), SUM(sixieme), SUM(cinquieme), SUM(quatrieme), SUM(troisieme)
+            FROM rollup_jour WHERE jour BETWEEN ? AND ?
+            GROUP BY mois ORDER BY mois
+        ''', (day_number(start), day_number(end))).fetchall()
+    return [(_month_label(int(m[:4]), int(m[5:7])).capitalize(), *r) for m, *r in rows]
+
+def _day_rows(start, end):
+    with transaction() as conn:
+        rows = conn.execute('''
+            SELECT jour, total, sixieme, cinquieme, quatrieme, troisieme
+            FROM rollup_jour WHERE jour BETWEEN ? AND ? ORDER BY jour
+        ''', (day_number(start), day_number(end))).fetchall()
+    return [(date.fromordinal(j).strftime('%d/%m/%Y'), *r) for j, *r in rows]
+
+def _paginate(title, subtitle, snap, header, rows):
+    rows = _rows_with_total(rows)
+    chunks = [rows[i:i + ROWS_PER_PAGE] for i in range(0, len(rows), ROWS_PER_PAGE)] or [[]]
+    for number, chunk in enumerate(chunks):
+        suffix = f" (suite {number + 1})" if number else ""
+        yield title + suffix, subtitle, snap, header, chunk
+
+def export_pdf(filepath, start=None, end=None, title="Fréquentation du CDI", progress=None):
+    # Rapport : une page de synthèse (totaux par mois) puis une page par mois
+    # (totaux par jour). Sans bornes, couvre toute la base.
+    # progress(pages écrites, nb de pages) est appelé après chaque page.
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    if start is None or end is None:
+        first, last = _base_bounds()
+        start, end = start or first, end or last
+
+    class_headers = ['Total', '6ème', '5ème', '4ème', '3ème']
+    summary = snapshot(start, end)
+    pages = list(_paginate(
+        title,
+        f"Du {_fr_date(start)} au {_fr_date(end)} - Total : {summary.total} - Heure(s) de pic : {', '.join(summary.peaks) or '-'}",
+        summary, ['Mois'] + class_headers, _month_rows(start, end),
+    ))
+    for year, month in _months(start, end):
+        month_start = max(start, f"{year}-{month:02d}-01")
+        month_end = min(end, f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}")
+        snap = snapshot(month_start, month_end)
+        if not snap.total:
+            continue
+        pages.extend(_paginate(
+            _month_label(year, month).capitalize(),
+            f"Total : {snap.total} - Heure(s) de pic : {', '.join(snap.peaks) or '-'}",
+            snap, ['Jour'] + class_headers, _day_rows(month_start, month_end),
+        ))
 
-# PDF export can be implemented with reportlab or similar library
-def export_pdf(filepath):
-    # ...PDF export logic...a
-    pass
\ No newline at end of file
+    report = _ReportFigure()
+    with PdfPages(filepath, metadata={'Title': title, 'Creator': 'CDIStats'}) as pdf:
+        for number, page in enumerate(pages, start=1):
+            report.update(*page)
+            pdf.savefig(report.fig)
+            if progress:
+                progress(number, len(pages))
+    return len(pages)
@@ -0,0 +1,178 @@
+import glob
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .cache import stats_cache
+from .connection import db_path, open_readonly
+from .migrations import DAY_NUMBER_SQL
+from .statistics import StatsSnapshot, _week_bounds
+from .utils import day_number
+
+# Requêtes sur toutes les bases Base-YYYY.db du dossier de données :
+# les bases sont attachées en lecture seule à une connexion unique et
+# chaque requête est un UNION ALL limité aux bases dont la plage de jours
+# recoupe la période demandée. Une comparaison d'une année sur l'autre ne
+# lit donc que les deux bases concernées. Les bases ne sont jamais migrées
+# ici : une base ancienne, sans colonne jour, est filtrée sur date.
+
+COLUMNS = 'date, heure, sixieme, cinquieme, quatrieme, troisieme, total'
+SLOT_SUMS = ', '.join(f'SUM({c}) AS {c}' for c in COLUMNS.split(', ')[2:])
+
+BASE_PATTERN = 'Base-*.db'
+
+def discover_bases(data_dir=None):
+    # Bases Base-YYYY.db du dossier, plus la base courante si elle porte un autre nom
+    if data_dir:
+        return sorted(glob.glob(os.path.join(data_dir, BASE_PATTERN)))
+    current = db_path()
+    paths = {os.path.abspath(p) for p in glob.glob(os.path.join(os.path.dirname(current), BASE_PATTERN))}
+    paths.add(current)
+    return sorted(paths)
+
+class Federation:
+    def __init__(self, paths=None):
+        self.paths = [os.path.abspath(p) for p in (paths if paths is not None else discover_bases())]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(':memory:', uri=True, check_same_thread=False)
+        self._bounds = {}
+        # SQLite limite le nombre de bases attachées (10 par défaut) : au-delà,
+        # la requête est découpée en groupes dont on additionne les résultats
+        self._max_attached = self._conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        self._attached = {}
+        for path in self.paths:
+            self._bounds[path] = self._read_bounds(path)
+
+    def _read_bounds(self, path):
+        # (premier jour, dernier jour, colonne jour présente) ; (None, None,
+        # False) pour une base sans table attendance
+        conn = open_readonly(path)
+        try:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(attendance)')]
+            if not columns:
+                return None, None, False
+            if 'jour' in columns:
+                return (*conn.execute('SELECT MIN(jour), MAX(jour) FROM attendance').fetchone(), True)
+            day = DAY_NUMBER_SQL.format(col='date')
+            return (*conn.execute(f'SELECT MIN({day}), MAX({day}) FROM attendance').fetchone(), False)
+        finally:
+            conn.close()
+
+    def _select(self, path, alias):
+        # Créneaux de la période dans une base. Une base ancienne (sans jour
+        # ni index unique) a son jour calculé et ses saisies multiples d'un
+        # créneau additionnées, comme à la migration : un créneau compte une
+        # fois dans hourly_counts, comme dans src/rooms.py.
+        if self._bounds[path][2]:
+            return f'SELECT {COLUMNS}, jour FROM {alias}.attendance WHERE jour BETWEEN :first AND :last'
+        return (
+            f"SELECT date, heure, {SLOT_SUMS}, {DAY_NUMBER_SQL.format(col='date')} AS jour "
+            f"FROM {alias}.attendance WHERE date BETWEEN :start AND :end GROUP BY date, heure"
+        )
+
+    def refresh(self, path=None):
+        # À appeler après une écriture qui élargit la plage de jours d'une base
+        with self._lock:
+            for p in ([os.path.abspath(path)] if path else self.paths):
+                if p in self._bounds:
+                    self._bounds[p] = self._read_bounds(p)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _bases_for(self, first, last):
+        return [
+            p for p in self.paths
+            if self._bounds[p][0] is not None
+            and self._bounds[p][0] <= last and self._bounds[p][1] >= first
+        ]
+
+    def _attach(self, paths):
+        # Garde attachées les bases du groupe, détache les autres si besoin
+        needed = [p for p in paths if p not in self._attached]
+        for path in [p for p in self._attached if p not in paths]:
+            if len(self._attached) + len(needed) <= self._max_attached:
+                break
+            self._conn.execute(f'DETACH DATABASE {self._attached.pop(path)}')
+        for path in paths:
+            if path not in self._attached:
+                alias = f'b{self.paths.index(path)}'
+                self._conn.execute('ATTACH DATABASE ? AS ' + alias, (Path(path).as_uri() + '?mode=ro',))
+                self._attached[path] = alias
+        return [self._attached[p] for p in paths]
+
+    def query(self, select, start, end, group_by=None):
+        # select : colonnes agrégées sur la vue fédérée u ; les lignes de
+        # chaque groupe de bases sont additionnées colonne par colonne
+        # (hors clé de regroupement). Renvoie une liste de tuples.
+        first, last = day_number(start), day_number(end)
+        bases = self._bases_for(first, last)
+        combined = {}
+        with self._lock:
+            for i in range(0, len(bases), self._max_attached):
+                group_paths = bases[i:i + self._max_attached]
+                aliases = self._attach(group_paths)
+                union = ' UNION ALL '.join(
+                    self._select(path, alias) for path, alias in zip(group_paths, aliases)
+                )
+                group = f'GROUP BY {group_by}' if group_by else ''
+                sql = f'SELECT {select} FROM ({union}) AS u {group}'
+                params = {'first': first, 'last': last, 'start': start, 'end': end}
+                for row in self._conn.execute(sql, params):
+                    key, values = (row[0], row[1:]) if group_by else (None, row)
+                    previous = combined.get(key)
+                    combined[key] = values if previous is None else tuple(
+                        (a or 0) + (b or 0) for a, b in zip(previous, values)
+                    )
+        if group_by:
+            return sorted((key, *values) for key, values in combined.items())
+        return [combined.get(None, ())]
+
+    def total(self, start, end):
+        row = self.query('COALESCE(SUM(total), 0)', start, end)[0]
+        return row[0] if row else 0
+
+    def snapshot(self, start, end):
+        rows = self.query('''
+            heure, COALESCE(SUM(total), 0), COUNT(*),
+            COALESCE(SUM(sixieme), 0), COALESCE(SUM(cinquieme), 0),
+            COALESCE(SUM(quatrieme), 0), COALESCE(SUM(troisieme), 0)
+        ''', start, end, group_by='heure')
+        return StatsSnapshot(start, end).add_rows(rows)
+
+    def daily_totals(self, start, end):
+        rows = self.query('date, SUM(total)', start, end, group_by='date')
+        return dict(rows)
+
+_federation = None
+_federation_lock = threading.Lock()
+
+def get_federation():
+    # Fédération partagée, reconstruite quand la liste des bases change
+    global _federation
+    with _federation_lock:
+        paths = [os.path.abspath(p) for p in discover_bases()]
+        if _federation is None or _federation.paths != paths:
+            if _federation is not None:
+                _federation.close()
+            _federation = Federation(paths)
+        return _federation
+
+def last_year_week_total(target_date=None):
+    # Total de la même semaine un an plus tôt (52 semaines avant), gardé dans
+    # le cache des statistiques sous la plage de cette semaine-là : une
+    # saisie dans la base courante qui la touche l'invalide
+    target_date = target_date or datetime.now()
+    start, end = _week_bounds(target_date - timedelta(weeks=52))
+    days = (day_number(start), day_number(end))
+    key = (db_path(), 'last_year_week_total', days)
+
+    def compute():
+        federation = get_federation()
+        federation.refresh(db_path())
+        return federation.total(start, end)
+
+    return stats_cache.get_or_compute(key, days, compute)
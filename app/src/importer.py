@@ -0,0 +1,103 @@
+import csv
+import re
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import islice
+
+from .cache import stats_cache
+from .connection import transaction
+from .database import UPSERT_ATTENDANCE
+
+# Import en masse de l'historique depuis un CSV (le pendant de export_csv).
+# Le fichier est lu ligne à ligne, chaque ligne est validée puis insérée
+# par lots avec executemany, un lot par transaction.
+
+CLASS_FIELDS = ('sixieme', 'cinquieme', 'quatrieme', 'troisieme')
+REQUIRED_FIELDS = ('heure', 'date') + CLASS_FIELDS
+BATCH_SIZE = 10000
+MAX_REJECTED = 1000  # motifs de rejet conservés dans le rapport
+
+_HEURE_RE = re.compile(r'^(\d{1,2})[:hH](\d{2})?$')
+
+@dataclass
+class ImportReport:
+    lines: int = 0
+    imported: int = 0
+    rejected_count: int = 0
+    rejected: list = field(default_factory=list)  # (numéro de ligne, motif)
+
+    def reject(self, line_number, reason):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REJECTED:
+            self.rejected.append((line_number, reason))
+
+def _parse_heure(value):
+    match = _HEURE_RE.match(value.strip())
+    if not match:
+        raise ValueError(f"heure invalide : {value!r}")
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour > 23 or minute > 59:
+        raise ValueError(f"heure invalide : {value!r}")
+    return f"{hour:02d}:{minute:02d}"
+
+def _parse_count(name, value):
+    value = value.strip()
+    if not value:
+        return 0
+    count = int(value)
+    if count < 0:
+        raise ValueError(f"{name} négatif : {count}")
+    return count
+
+def _parse_row(row):
+    # Renvoie le tuple à insérer ; le total est recalculé à partir des classes.
+    # Un champ absent (ligne trop courte : DictReader le met à None) rejette la ligne
+    missing = [name for name in REQUIRED_FIELDS if row.get(name) is None]
+    if missing:
+        raise ValueError(f"champ(s) manquant(s) : {', '.join(missing)}")
+    day = date.fromisoformat(row['date'].strip())
+    counts = [_parse_count(name, row[name]) for name in CLASS_FIELDS]
+    return (_parse_heure(row['heure']), *counts, sum(counts), day.isoformat(), day.toordinal())
+
+def _open_reader(f):
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return csv.DictReader(f, dialect=dialect)
+
+def _validated_rows(reader, report):
+    for row in reader:
+        report.lines += 1
+        try:
+            yield _parse_row(row)
+        except (KeyError, TypeError, ValueError) as e:
+            # line_num : ligne du fichier où finit l'enregistrement (un champ
+            # entre guillemets peut couvrir plusieurs lignes)
+            report.reject(reader.line_num, str(e))
+
+def import_csv(filepath, batch_size=BATCH_SIZE, progress=None, encoding='utf-8-sig'):
+    # progress(rapport) est appelé après chaque lot
+    report = ImportReport()
+    with open(filepath, newline='', encoding=encoding) as f:
+        reader = _open_reader(f)
+        missing = [name for name in REQUIRED_FIELDS if name not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+        rows = _validated_rows(reader, report)
+        try:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                with transaction() as conn:
+                    conn.executemany(UPSERT_ATTENDANCE, batch)
+                report.imported += len(batch)
+                if progress:
+                    progress(report)
+        finally:
+            if report.imported:
+                stats_cache.clear()
+    return report
@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from .cache import stats_cache
+from .connection import db_path, transaction
+from .utils import day_number
+
+# Journal local des saisies : add_attendance() ajoute chaque entrée à un
+# fichier JSON lines (écriture + fsync), ce qui rend la saisie indépendante
+# de la base, qui peut se trouver sur un partage réseau lent ou verrouillé.
+# Un thread applique ensuite les entrées à la base par lots, avec reprise
+# en cas d'échec. Les entrées d'un même (base, date, heure) s'additionnent,
+# comme dans l'upsert.
+#
+# À l'application, le journal est renommé en .flushing : les nouvelles
+# saisies repartent dans un journal neuf et le lot n'est supprimé qu'une fois
+# validé en base. Au démarrage, les deux fichiers restants sont rejoués.
+# Chaque entrée porte un identifiant, noté dans journal_applique dans la
+# transaction qui l'applique : un lot rejoué après un arrêt entre la
+# validation et la suppression du fichier n'est pas compté deux fois.
+#
+# Les entrées d'une base inutilisable (sans schéma, fichier qui n'est pas
+# une base SQLite) sont mises de côté dans attendance.ecartees.jsonl au lieu
+# de bloquer tout le lot ; une base seulement indisponible (verrouillée,
+# partage absent) garde ses entrées pour le prochain essai.
+
+JOURNAL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'journal'))
+FLUSH_INTERVAL = 2.0
+MAX_RETRY_DELAY = 60.0
+FIELDS = ('heure', 'sixieme', 'cinquieme', 'quatrieme', 'troisieme', 'total', 'date')
+COUNT_FIELDS = FIELDS[1:-1]
+APPLIED_RETENTION = 366 * 86400  # identifiants gardés un an
+
+_lock = threading.Lock()      # écritures dans le journal
+_flush_lock = threading.Lock()  # une seule application à la fois
+_flusher = None
+
+def create_journal_table(conn):
+    # Identifiants des entrées déjà appliquées à la base
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS journal_applique (
+            id TEXT PRIMARY KEY,
+            ts REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+def journal_dir():
+    if not os.path.exists(JOURNAL_DIR):
+        os.makedirs(JOURNAL_DIR)
+    return JOURNAL_DIR
+
+def journal_path():
+    return os.path.join(journal_dir(), 'attendance.jsonl')
+
+def _flushing_path():
+    return journal_path() + '.flushing'
+
+def set_aside_path():
+    return os.path.join(journal_dir(), 'attendance.ecartees.jsonl')
+
+def _set_aside(base, entries, error):
+    logging.error(f"Journal : {len(entries)} entrée(s) pour {base} mises de côté ({error}), voir {set_aside_path()}")
+    with _lock:
+        with open(set_aside_path(), 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(dict(entry, erreur=str(error)), ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+def _base_unusable(error):
+    # Erreur qu'un nouvel essai ne corrigera pas ; une OperationalError
+    # (base verrouillée, fichier inaccessible) est passagère, sauf table absente
+    if isinstance(error, sqlite3.OperationalError):
+        return str(error).startswith('no such table')
+    return isinstance(error, sqlite3.DatabaseError)
+
+def append(entry):
+    # entry : dict des colonnes de FIELDS ; la base visée est enregistrée
+    # avec l'entrée pour survivre à un changement de base
+    record = dict(entry, base=entry.get('base') or db_path(), ts=time.time(), id=uuid.uuid4().hex)
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with _lock:
+        with open(journal_path(), 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+    if _flusher is not None and _flusher.is_alive():
+        _flusher.wake()
+    else:
+        # Sans thread d'application (scripts, ligne de commande) : tout de suite
+        flush()
+
+def _read(path):
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Dernière ligne tronquée par un arrêt brutal
+                logging.warning(f"Journal : ligne {number} illisible ignorée ({path})")
+    return entries
+
+def _merge(entries):
+    # Une ligne par (date, heure), somme des entrées du créneau
+    slots = {}
+    for entry in entries:
+        key = (entry['date'], entry['heure'])
+        if key in slots:
+            row = slots[key]
+            for f in COUNT_FIELDS:
+                row[f] = (row[f] or 0) + (entry[f] or 0)
+        else:
+            slots[key] = {f: entry[f] for f in FIELDS}
+    return list(slots.values())
+
+def _new_entries(conn, entries):
+    # Entrées pas encore appliquées à la base, notées comme appliquées ;
+    # les entrées sans identifiant (journal d'une version précédente) passent
+    now = time.time()
+    conn.execute('DELETE FROM journal_applique WHERE ts < ?', (now - APPLIED_RETENTION,))
+    fresh = []
+    for entry in entries:
+        if 'id' in entry:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO journal_applique (id, ts) VALUES (?, ?)', (entry['id'], now)
+            )
+            if not cursor.rowcount:
+                continue
+        fresh.append(entry)
+    return fresh
+
+def _apply(entries):
+    from .database import UPSERT_ATTENDANCE
+    by_base = {}
+    for entry in entries:
+        by_base.setdefault(entry['base'], []).append(entry)
+    for base, base_entries in by_base.items():
+        try:
+            with transaction(base) as conn:
+                rows = _merge(_new_entries(conn, base_entries))
+                conn.executemany(UPSERT_ATTENDANCE, [
+                    (*(row[f] for f in FIELDS), day_number(row['date'])) for row in rows
+                ])
+        except sqlite3.DatabaseError as e:
+            if not _base_unusable(e):
+                raise
+            _set_aside(base, base_entries, e)
+            continue
+        for row in rows:
+            stats_cache.invalidate(day_number(row['date']), base)
+
+def flush():
+    # Applique les entrées en attente ; renvoie le nombre d'entrées appliquées.
+    # En cas d'erreur, le lot reste sur disque pour la prochaine tentative.
+    with _flush_lock:
+        applied = 0
+        flushing = _flushing_path()
+        while True:
+            if not os.path.exists(flushing):
+                with _lock:
+                    if not os.path.exists(journal_path()) or not os.path.getsize(journal_path()):
+                        return applied
+                    os.replace(journal_path(), flushing)
+            entries = _read(flushing)
+            _apply(entries)
+            os.remove(flushing)
+            applied += len(entries)
+
+def pending():
+    return len(_read(_flushing_path())) + len(_read(journal_path()))
+
+def set_aside():
+    return len(_read(set_aside_path()))
+
+class JournalFlusher(threading.Thread):
+    def __init__(self, interval=FLUSH_INTERVAL):
+        super().__init__(name='journal', daemon=True)
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        delay = self.interval
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            try:
+                flush()
+                delay = self.interval
+            except Exception as e:
+                # Base indisponible : nouvel essai avec un délai croissant
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                logging.warning(f"Journal : application reportée ({e}), nouvel essai dans {delay:.0f} s")
+            if self._stopping.is_set():
+                return
+
+    def stop(self, timeout=5.0):
+        # Dernière tentative d'application avant l'arrêt, sans bloquer la
+        # fermeture au-delà de timeout : ce qui reste sera rejoué au
+        # prochain démarrage
+        self._stopping.set()
+        self._wake.set()
+        self.join(timeout)
+        if self.is_alive():
+            logging.warning("Journal : base indisponible à la fermeture, entrées rejouées au prochain démarrage")
+
+def start_flusher(interval=FLUSH_INTERVAL):
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        _flusher = JournalFlusher(interval)
+        _flusher.start()
+    return _flusher
+
+def stop_flusher():
+    global _flusher
+    if _flusher is not None:
+        _flusher.stop()
+        _flusher = None
+
+def replay():
+    # Au démarrage : entrées d'une session précédente non encore appliquées
+    try:
+        applied = flush()
+    except Exception as e:
+        logging.warning(f"Journal : rejeu impossible ({e}), {pending()} entrée(s) en attente")
+        return 0
+    if applied:
+        logging.info(f"Journal : {applied} entrée(s) rejouée(s)")
+    return applied
@@ -0,0 +1,83 @@
+import atexit
+import json
+import logging
+import os
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+from .config import get_config
+
+# Journalisation non bloquante : les appels logging.* ne font que déposer
+# l'enregistrement dans une file ; un thread (QueueListener) écrit ensuite
+# dans logs/app.log (format lisible) et logs/app.jsonl (une ligne JSON par
+# enregistrement). Les deux fichiers tournent chaque nuit et gardent
+# Logs.log_rotation jours d'historique.
+
+LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'logs'))
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def _rotating_handler(path, formatter, backup_count):
+    handler = TimedRotatingFileHandler(
+        path, when='midnight', backupCount=backup_count, encoding='utf-8', delay=True
+    )
+    handler.setFormatter(formatter)
+    return handler
+
+class _QueueHandler(QueueHandler):
+    # Garde exc_info et les arguments : le formatage complet (y compris la
+    # pile d'appels) se fait dans le thread d'écriture, pas dans l'appelant
+    def prepare(self, record):
+        return record
+
+def setup_logging(log_dir=LOG_DIR, level=None):
+    # À appeler une fois au démarrage ; les appels suivants sont sans effet
+    global _listener
+    if _listener is not None:
+        return _listener
+    config = get_config()
+    if level is None:
+        level = logging.DEBUG if config.debug else logging.INFO
+    os.makedirs(log_dir, exist_ok=True)
+    handlers = (
+        _rotating_handler(os.path.join(log_dir, 'app.log'),
+                          logging.Formatter(TEXT_FORMAT, DATE_FORMAT), config.log_rotation),
+        _rotating_handler(os.path.join(log_dir, 'app.jsonl'),
+                          JsonFormatter(), config.log_rotation),
+    )
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging():
+    # Vide la file et ferme les fichiers
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
@@ -0,0 +1,152 @@
+import calendar
+from array import array
+from datetime import date, datetime
+
+from .cache import cached
+from .connection import transaction
+from .statistics import HOURS, StatsSnapshot, _week_bounds
+from .utils import day_number
+
+# Matrice dense jour × créneau × classe d'une année, lue en une requête puis
+# gardée dans le cache des statistiques (invalidée comme les autres entrées
+# quand une saisie touche l'année). Les vues jour, semaine, mois et année
+# en sont des tranches : naviguer ou changer de vue ne relit pas la base.
+#
+# Les comptes sont dans un array('I') à plat, indice
+# ((jour - 1er janvier) * len(HOURS) + créneau) * len(COLUMNS) + colonne ;
+# present marque les créneaux saisis (pour les moyennes par créneau). Les
+# lignes à une heure hors des créneaux de saisie (import CSV) sont gardées
+# à part : comptées dans les totaux, absentes de la carte de chaleur. Une
+# classe NULL compte pour 0, comme dans les requêtes SQL.
+
+COLUMNS = ('sixieme', 'cinquieme', 'quatrieme', 'troisieme', 'total')
+TOTAL = len(COLUMNS) - 1
+SLOT_INDEX = {h: i for i, h in enumerate(HOURS)}
+
+class YearMatrix:
+    __slots__ = ('year', 'first', 'days', 'counts', 'present', 'others')
+
+    def __init__(self, year):
+        self.year = year
+        self.first = date(year, 1, 1).toordinal()
+        self.days = date(year, 12, 31).toordinal() - self.first + 1
+        self.counts = array('I', bytes(4 * self.days * len(HOURS) * len(COLUMNS)))
+        self.present = bytearray(self.days * len(HOURS))
+        self.others = []  # (décalage du jour, heure, comptes)
+
+    def load(self, rows):
+        width = len(COLUMNS)
+        for jour, heure, *values in rows:
+            offset = jour - self.first
+            slot = SLOT_INDEX.get(heure)
+            if slot is None:
+                self.others.append((offset, heure, values))
+                continue
+            cell = offset * len(HOURS) + slot
+            self.present[cell] = 1
+            self.counts[cell * width:(cell + 1) * width] = array('I', values)
+        return self
+
+    def _days(self, start, end):
+        # Plage de décalages de la période, limitée à l'année
+        first = max(day_number(start) - self.first, 0)
+        last = min(day_number(end) - self.first, self.days - 1)
+        return range(first, last + 1)
+
+    def add_to(self, snap, start, end):
+        # Ajoute la période à un StatsSnapshot (résultat de statistics.snapshot)
+        snap.add_rows(self._rows(start, end))
+
+    def _rows(self, start, end):
+        # (heure, total, 1, classes) de chaque créneau saisi de la période
+        width, counts = len(COLUMNS), self.counts
+        days = self._days(start, end)
+        for offset in days:
+            for slot, heure in enumerate(HOURS):
+                cell = offset * len(HOURS) + slot
+                if self.present[cell]:
+                    values = counts[cell * width:(cell + 1) * width]
+                    yield (heure, values[TOTAL], 1, *values[:TOTAL])
+        for offset, heure, values in self.others:
+            if offset in days:
+                yield (heure, values[TOTAL], 1, *values[:TOTAL])
+
+    def day_totals(self, start, end):
+        # {'AAAA-MM-JJ': total} des jours saisis de la période
+        width, counts = len(COLUMNS), self.counts
+        days = self._days(start, end)
+        totals = {}
+        for offset in days:
+            cells = range(offset * len(HOURS), (offset + 1) * len(HOURS))
+            if any(self.present[cell] for cell in cells):
+                totals[offset] = sum(counts[cell * width + TOTAL] for cell in cells)
+        for offset, _, values in self.others:
+            if offset in days:
+                totals[offset] = totals.get(offset, 0) + values[TOTAL]
+        return {date.fromordinal(self.first + offset).isoformat(): totals[offset] for offset in sorted(totals)}
+
+    def slot_totals(self, start, end):
+        # [(date, [total par créneau])] pour chaque jour de la période
+        width, counts = len(COLUMNS), self.counts
+        return [
+            (date.fromordinal(self.first + offset), [
+                counts[(offset * len(HOURS) + slot) * width + TOTAL] for slot in range(len(HOURS))
+            ])
+            for offset in self._days(start, end)
+        ]
+
+def _year_period(year):
+    return f'{year}-01-01', f'{year}-12-31'
+
+@cached(_year_period)
+def year_matrix(year):
+    first, last = date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal()
+    with transaction() as conn:
+        rows = conn.execute(f'''
+            SELECT jour, heure, {', '.join(f'COALESCE({c}, 0)' for c in COLUMNS)}
+            FROM attendance WHERE jour BETWEEN ? AND ?
+        ''', (first, last)).fetchall()
+    return YearMatrix(year).load(rows)
+
+def _years(start, end):
+    return range(int(start[:4]), int(end[:4]) + 1)
+
+# Mêmes résultats que statistics.snapshot et statistics.daily_totals,
+# calculés sur les matrices
+
+def snapshot(start, end):
+    snap = StatsSnapshot(start, end)
+    for year in _years(start, end):
+        year_matrix(year).add_to(snap, start, end)
+    return snap
+
+def daily_totals(start, end):
+    totals = {}
+    for year in _years(start, end):
+        totals.update(year_matrix(year).day_totals(start, end))
+    return totals
+
+def heatmap(start, end):
+    # (jours, lignes) : jours de la période et, pour chacun, le total par
+    # créneau (HOURS) ; un jour sans saisie vaut 0 partout
+    days, rows = [], []
+    for year in _years(start, end):
+        for day, values in year_matrix(year).slot_totals(start, end):
+            days.append(day)
+            rows.append(values)
+    return days, rows
+
+def day_bounds(target_date=None):
+    date_str = (target_date or datetime.now()).strftime('%Y-%m-%d')
+    return date_str, date_str
+
+def week_bounds(target_date=None):
+    return _week_bounds(target_date or datetime.now())
+
+def month_bounds(target_date=None):
+    target_date = target_date or datetime.now()
+    last_day = calendar.monthrange(target_date.year, target_date.month)[1]
+    return target_date.strftime('%Y-%m-01'), target_date.replace(day=last_day).strftime('%Y-%m-%d')
+
+def year_bounds(target_date=None):
+    return _year_period((target_date or datetime.now()).year)
@@ -0,0 +1,131 @@
+import logging
+
+from .connection import get_connection, transaction
+from .journal import create_journal_table
+from .rollups import create_rollups, refresh_rollups, replace_triggers
+from .sync import SYNC_TRIGGERS, create_sync_tables
+
+# Migrations du schéma, versionnées par PRAGMA user_version.
+# Chaque migration est appliquée dans sa propre transaction avec la mise à
+# jour du numéro de version : une base déjà à jour ne coûte qu'une lecture
+# de PRAGMA au démarrage, et une migration interrompue est rejouée en entier.
+
+# Numéro de jour (ordinal grégorien, identique à date.toordinal())
+DAY_NUMBER_SQL = "CAST(julianday({col}) - 1721424.5 AS INTEGER)"
+
+def _v1_attendance(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            heure TEXT NOT NULL,
+            sixieme INTEGER,
+            cinquieme INTEGER,
+            quatrieme INTEGER,
+            troisieme INTEGER,
+            total INTEGER,
+            date TEXT NOT NULL
+        )
+    ''')
+
+def _merge_duplicates(conn):
+    # Une seule ligne par date et créneau : les saisies multiples d'un même
+    # créneau sont additionnées dans la plus récente. Les lignes d'origine
+    # sont copiées dans attendance_doublons avant la fusion.
+    duplicates = conn.execute('''
+        SELECT COUNT(*) FROM attendance
+        WHERE id NOT IN (SELECT MAX(id) FROM attendance GROUP BY date, heure)
+    ''').fetchone()[0]
+    if not duplicates:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_doublons AS
+        SELECT * FROM attendance WHERE 0
+    ''')
+    conn.execute('''
+        INSERT INTO attendance_doublons
+        SELECT * FROM attendance
+        WHERE (date, heure) IN (SELECT date, heure FROM attendance GROUP BY date, heure HAVING COUNT(*) > 1)
+    ''')
+    conn.execute('''
+        UPDATE attendance SET
+            sixieme = s.sixieme, cinquieme = s.cinquieme, quatrieme = s.quatrieme,
+            troisieme = s.troisieme, total = s.total
+        FROM (
+            SELECT MAX(id) AS id, SUM(sixieme) AS sixieme, SUM(cinquieme) AS cinquieme,
+                   SUM(quatrieme) AS quatrieme, SUM(troisieme) AS troisieme, SUM(total) AS total
+            FROM attendance GROUP BY date, heure HAVING COUNT(*) > 1
+        ) AS s
+        WHERE attendance.id = s.id
+    ''')
+    conn.execute('''
+        DELETE FROM attendance
+        WHERE id NOT IN (SELECT MAX(id) FROM attendance GROUP BY date, heure)
+    ''')
+    logging.warning(
+        f"Migration : {duplicates} saisie(s) en double fusionnée(s) par addition "
+        f"(lignes d'origine dans attendance_doublons)"
+    )
+
+def _v2_jour_et_index(conn):
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(attendance)')]
+    if 'jour' not in columns:
+        conn.execute('ALTER TABLE attendance ADD COLUMN jour INTEGER')
+    conn.execute(f"UPDATE attendance SET jour = {DAY_NUMBER_SQL.format(col='date')} WHERE jour IS NULL")
+    _merge_duplicates(conn)
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_date_heure ON attendance (date, heure)')
+    # Index couvrant pour les agrégats par plage de jours
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS ix_attendance_jour
+        ON attendance (jour, heure, total, sixieme, cinquieme, quatrieme, troisieme)
+    ''')
+
+def _v3_rollups(conn):
+    create_rollups(conn)
+    refresh_rollups(conn)
+
+def _v4_sync(conn):
+    # Les lignes existantes sont notées à l'activation (sync.enable)
+    create_sync_tables(conn)
+
+def _v5_journal(conn):
+    create_journal_table(conn)
+
+def _v6_sync_sur_demande(conn):
+    # Triggers de synchronisation actifs seulement une fois la synchronisation
+    # activée. Une base déjà synchronisée la garde active ; sinon les
+    # créneaux notés jusque-là sont oubliés.
+    for name in SYNC_TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_attendance_sync_{name}')
+    create_sync_tables(conn)
+    if conn.execute("SELECT 1 FROM sync_state WHERE key = 'push_seq'").fetchone():
+        conn.execute("INSERT OR IGNORE INTO sync_state (key, value) VALUES ('enabled', 1)")
+    else:
+        conn.execute('DELETE FROM sync_pending')
+
+def _v7_sans_rollup_mois(conn):
+    # rollup_mois n'était lu nulle part (les mois entiers passent par rollup_heure)
+    replace_triggers(conn)
+    conn.execute('DROP TABLE IF EXISTS rollup_mois')
+
+MIGRATIONS = [
+    _v1_attendance,
+    _v2_jour_et_index,
+    _v3_rollups,
+    _v4_sync,
+    _v5_journal,
+    _v6_sync_sur_demande,
+    _v7_sans_rollup_mois,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def schema_version(path=None):
+    return get_connection(path).execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(path=None):
+    version = schema_version(path)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with transaction(path) as conn:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+    return SCHEMA_VERSION
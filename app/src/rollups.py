@@ -0,0 +1,118 @@
+import sys
+
+from .cache import stats_cache
+from .connection import set_db_path, transaction
+
+# Tables d'agrégats pré-calculés, tenues à jour par des triggers dans la
+# même transaction que l'écriture dans attendance.
+# Chaque table : clé de période, nb de lignes, total et somme par classe.
+# Seules les tables lues par src/statistics.py sont tenues : chacune coûte
+# une écriture de plus à chaque saisie. Les mois entiers sont servis par
+# rollup_heure (une ligne par mois et créneau).
+
+CLASS_COLUMNS = ('total', 'sixieme', 'cinquieme', 'quatrieme', 'troisieme')
+
+# nom de table -> (colonnes de clé avec leur type, expressions de clé sur une ligne {r})
+ROLLUPS = {
+    'rollup_jour': (('jour INTEGER',), ('{r}.jour',)),
+    # Semaine ISO identifiée par le numéro de jour de son lundi
+    'rollup_semaine': (('semaine INTEGER',), ('{r}.jour - ({r}.jour - 1) % 7',)),
+    'rollup_heure': (('mois TEXT', 'heure TEXT'), ('substr({r}.date, 1, 7)', '{r}.heure')),
+}
+
+def _key_names(table):
+    return [col.split()[0] for col in ROLLUPS[table][0]]
+
+def _create_table(conn, table):
+    key_cols = ROLLUPS[table][0]
+    sums = ', '.join(f'{col} INTEGER NOT NULL DEFAULT 0' for col in CLASS_COLUMNS)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            {', '.join(key_cols)},
+            nb INTEGER NOT NULL DEFAULT 0,
+            {sums},
+            PRIMARY KEY ({', '.join(_key_names(table))})
+        )
+    ''')
+
+def _apply_row(table, row, sign):
+    # Ajoute (sign = 1) ou retire (sign = -1) une ligne d'attendance à l'agrégat
+    keys = _key_names(table)
+    key_exprs = [expr.format(r=row) for expr in ROLLUPS[table][1]]
+    columns = keys + ['nb'] + list(CLASS_COLUMNS)
+    values = key_exprs + [str(sign)] + [f'{sign} * COALESCE({row}.{col}, 0)' for col in CLASS_COLUMNS]
+    updates = ', '.join(f'{col} = {col} + excluded.{col}' for col in ['nb'] + list(CLASS_COLUMNS))
+    return f'''
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES ({', '.join(values)})
+            ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates};'''
+
+def _drop_empty(table, row):
+    # Supprime la ligne d'agrégat devenue vide après une suppression
+    keys = _key_names(table)
+    key_exprs = [expr.format(r=row) for expr in ROLLUPS[table][1]]
+    match = ' AND '.join(f'{k} = {e}' for k, e in zip(keys, key_exprs))
+    return f'''
+            DELETE FROM {table} WHERE {match} AND nb = 0;'''
+
+TRIGGER_EVENTS = ('insert', 'delete', 'update')
+
+def _create_triggers(conn):
+    bodies = {
+        'insert': [('NEW', 1)],
+        'delete': [('OLD', -1)],
+        'update': [('OLD', -1), ('NEW', 1)],
+    }
+    for event, changes in bodies.items():
+        statements = ''.join(
+            _apply_row(table, row, sign)
+            for row, sign in changes
+            for table in ROLLUPS
+        )
+        if event in ('delete', 'update'):
+            statements += ''.join(_drop_empty(table, 'OLD') for table in ROLLUPS)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_rollup_{event}
+            AFTER {event.upper()} ON attendance
+            BEGIN{statements}
+            END
+        ''')
+
+def create_rollups(conn):
+    for table in ROLLUPS:
+        _create_table(conn, table)
+    _create_triggers(conn)
+
+def replace_triggers(conn):
+    # Après un changement de ROLLUPS : triggers recréés sur les tables actuelles
+    for event in TRIGGER_EVENTS:
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_attendance_rollup_{event}')
+    _create_triggers(conn)
+
+def refresh_rollups(conn):
+    for table in ROLLUPS:
+        keys = _key_names(table)
+        key_exprs = [expr.format(r='attendance') for expr in ROLLUPS[table][1]]
+        sums = ', '.join(f'COALESCE(SUM({col}), 0)' for col in CLASS_COLUMNS)
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(f'''
+            INSERT INTO {table} ({', '.join(keys)}, nb, {', '.join(CLASS_COLUMNS)})
+            SELECT {', '.join(key_exprs)}, COUNT(*), {sums}
+            FROM attendance
+            GROUP BY {', '.join(key_exprs)}
+        ''')
+
+def rebuild_rollups(path=None):
+    # Recalcule entièrement les agrégats à partir d'attendance
+    with transaction(path) as conn:
+        refresh_rollups(conn)
+    stats_cache.clear()
+
+if __name__ == '__main__':
+    # python -m src.rollups [chemin/vers/Base-YYYY.db]
+    from .migrations import migrate
+    if len(sys.argv) > 1:
+        set_db_path(sys.argv[1])
+    migrate()
+    rebuild_rollups()
+    print("Agrégats reconstruits.")
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .connection import open_readonly
+from .statistics import StatsSnapshot, _week_bounds
+from .utils import day_number
+
+# Tableau de bord sur plusieurs salles (plusieurs CDI). Un dossier de salles
+# contient un sous-dossier par salle, avec ses bases (*.db), ou directement
+# un fichier .db par salle :
+#
+#   salles/
+#     college-a/Base-2024.db, college-a/Base-2025.db
+#     college-b/Base-2025.db
+#     lycee-c.db
+#
+# Les statistiques de chaque salle (StatsSnapshot et totaux par jour) sont
+# calculées dans un pool de processus, bases ouvertes en lecture seule,
+# puis gardées sur disque : une salle dont aucune base n'a changé (chemin,
+# taille, date de modification, y compris le fichier -wal) n'est pas
+# relue. Le total « toutes salles » est l'addition des résumés.
+
+CACHE_DIRNAME = '.cache-salles'
+MAX_CACHED_PERIODS = 32  # périodes gardées par salle
+
+def discover_rooms(rooms_dir):
+    # {nom de la salle: [bases]}, trié par nom
+    rooms = {}
+    for entry in sorted(os.scandir(rooms_dir), key=lambda e: e.name):
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir():
+            bases = sorted(
+                os.path.join(entry.path, name) for name in os.listdir(entry.path)
+                if name.endswith('.db')
+            )
+            if bases:
+                rooms[entry.name] = bases
+        elif entry.name.endswith('.db'):
+            rooms[os.path.splitext(entry.name)[0]] = [entry.path]
+    return rooms
+
+def _file_signature(path):
+    # (taille, mtime) du fichier et de son -wal : une écriture pas encore
+    # reportée dans la base ne change que le -wal. Un -wal vide (créé par
+    # une simple lecture) ne compte pas.
+    signature = []
+    for name in (path, path + '-wal'):
+        try:
+            st = os.stat(name)
+        except FileNotFoundError:
+            signature.append(None)
+        else:
+            signature.append([st.st_size, st.st_mtime_ns] if st.st_size else None)
+    return signature
+
+def room_signature(bases):
+    return [[os.path.abspath(p), *_file_signature(p)] for p in bases]
+
+def _summary(snap, daily):
+    return {
+        'total': snap.total,
+        'hourly_totals': snap.hourly_totals,
+        'hourly_counts': snap.hourly_counts,
+        'repartition': snap.repartition,
+        'daily_totals': daily,
+    }
+
+def _snapshot(summary, start, end):
+    snap = StatsSnapshot(start, end)
+    snap.total = summary['total']
+    snap.hourly_totals = dict(summary['hourly_totals'])
+    snap.hourly_counts = dict(summary['hourly_counts'])
+    snap.repartition = dict(summary['repartition'])
+    return snap
+
+def _read_base(path, start, end):
+    # Lecture seule, sans migration : les bases des autres CDI ne sont
+    # jamais modifiées. Requêtes sur attendance seule, valables quel que
+    # soit le schéma (sans jour ni index unique : filtre sur date, et les
+    # saisies multiples d'un créneau additionnées comme à la migration).
+    conn = open_readonly(path)
+    try:
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(attendance)')]
+        if not columns:
+            return StatsSnapshot(start, end), {}
+        if 'jour' in columns:
+            where, params = 'jour BETWEEN ? AND ?', (day_number(start), day_number(end))
+        else:
+            where, params = 'date BETWEEN ? AND ?', (start, end)
+        slots = f'''
+            SELECT date, heure, SUM(total) AS total, SUM(sixieme) AS sixieme,
+                   SUM(cinquieme) AS cinquieme, SUM(quatrieme) AS quatrieme,
+                   SUM(troisieme) AS troisieme
+            FROM attendance WHERE {where}
+            GROUP BY date, heure
+        '''
+        rows = conn.execute(f'''
+            SELECT heure, COALESCE(SUM(total), 0), COUNT(*),
+                   COALESCE(SUM(sixieme), 0), COALESCE(SUM(cinquieme), 0),
+                   COALESCE(SUM(quatrieme), 0), COALESCE(SUM(troisieme), 0)
+            FROM ({slots}) GROUP BY heure ORDER BY heure
+        ''', params).fetchall()
+        snap = StatsSnapshot(start, end).add_rows(rows)
+        daily = dict(conn.execute(f'''
+            SELECT date, COALESCE(SUM(total), 0) FROM attendance WHERE {where}
+            GROUP BY date ORDER BY date
+        ''', params).fetchall())
+        return snap, daily
+    finally:
+        conn.close()
+
+def compute_room(bases, start, end):
+    # Exécuté dans un processus du pool. Renvoie (signature, résumé) ; la
+    # signature est prise avant la lecture : une écriture pendant le calcul
+    # sera vue au prochain appel
+    signature = room_signature(bases)
+    total = StatsSnapshot(start, end)
+    daily = {}
+    for path in bases:
+        snap, days = _read_base(path, start, end)
+        _add(total, snap)
+        for day, value in days.items():
+            daily[day] = daily.get(day, 0) + value
+    return signature, _summary(total, dict(sorted(daily.items())))
+
+def _add(target, snap):
+    target.total += snap.total
+    for h, v in snap.hourly_totals.items():
+        target.hourly_totals[h] = target.hourly_totals.get(h, 0) + v
+    for h, v in snap.hourly_counts.items():
+        target.hourly_counts[h] = target.hourly_counts.get(h, 0) + v
+    for k, v in snap.repartition.items():
+        target.repartition[k] += v
+
+def _cache_path(cache_dir, name, bases):
+    # Un fichier par salle ; le hachage distingue deux dossiers de salles
+    # qui partageraient le même dossier de cache
+    digest = hashlib.sha1(os.path.dirname(os.path.abspath(bases[0])).encode()).hexdigest()[:10]
+    safe = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+    return os.path.join(cache_dir, f'{safe}-{digest}.json')
+
+def _read_cache(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(path, signature, periods):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'signature': signature, 'periods': periods}, f)
+    os.replace(tmp_path, path)
+
+def _pool_size(count):
+    return max(1, min(count, os.cpu_count() or 1))
+
+def aggregate(rooms_dir, start, end, cache_dir=None, workers=None):
+    # Statistiques de chaque salle et de l'ensemble sur la période :
+    # renvoie ({salle: (StatsSnapshot, totaux par jour)}, (StatsSnapshot, totaux par jour))
+    rooms = discover_rooms(rooms_dir)
+    cache_dir = cache_dir or os.path.join(rooms_dir, CACHE_DIRNAME)
+    period = f'{start}:{end}'
+
+    summaries, cached_files, missing = {}, {}, []
+    for name, bases in rooms.items():
+        path = _cache_path(cache_dir, name, bases)
+        cached = _read_cache(path)
+        if cached is None or cached.get('signature') != room_signature(bases):
+            cached = {'signature': None, 'periods': {}}
+        cached_files[name] = (path, cached)
+        if period in cached['periods']:
+            summaries[name] = cached['periods'][period]
+        else:
+            missing.append(name)
+
+    if missing:
+        workers = workers or _pool_size(len(missing))
+        if workers == 1 or len(missing) == 1:
+            results = [compute_room(rooms[name], start, end) for name in missing]
+        else:
+            # spawn : pas de connexions SQLite héritées du processus parent
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                futures = [pool.submit(compute_room, rooms[name], start, end) for name in missing]
+                results = [future.result() for future in futures]
+        for name, (signature, summary) in zip(missing, results):
+            summaries[name] = summary
+            path, cached = cached_files[name]
+            periods = cached['periods'] if cached['signature'] == signature else {}
+            periods.pop(period, None)
+            periods[period] = summary
+            while len(periods) > MAX_CACHED_PERIODS:
+                periods.pop(next(iter(periods)))
+            try:
+                _write_cache(path, signature, periods)
+            except OSError as e:
+                logging.warning(f"Cache des salles non enregistré ({path}) : {e}")
+        logging.info(f"Salles : {len(missing)} calculée(s), {len(rooms) - len(missing)} en cache")
+
+    per_room = {}
+    overall = StatsSnapshot(start, end)
+    overall_daily = {}
+    for name in rooms:
+        summary = summaries[name]
+        snap = _snapshot(summary, start, end)
+        per_room[name] = (snap, summary['daily_totals'])
+        _add(overall, snap)
+        for day, value in summary['daily_totals'].items():
+            overall_daily[day] = overall_daily.get(day, 0) + value
+    return per_room, (overall, dict(sorted(overall_daily.items())))
+
+def aggregate_week(rooms_dir, target_date=None, **kwargs):
+    return aggregate(rooms_dir, *_week_bounds(target_date or datetime.now()), **kwargs)
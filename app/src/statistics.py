@@ -1,108 +1,254 @@
-from .database import get_all_attendance
-from collections import defaultdict
-from datetime import datetime, timedelta
+from .cache import cached
+from .connection import transaction
+from .utils import day_number
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+import calendar
 debug = False
 
+# Créneaux horaires de la saisie (8h-16h, sans 12h)
+HOURS = [f"{h:02d}:00" for h in range(8, 18) if h not in (12, 17)]
+
+def _query(sql, params=()):
+    with transaction() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def _week_bounds(target_date):
+    # Début de la semaine = lundi, fin de la semaine = dimanche
+    start_week = target_date - timedelta(days=target_date.weekday())
+    end_week = start_week + timedelta(days=6)
+    return start_week.strftime('%Y-%m-%d'), end_week.strftime('%Y-%m-%d')
+
+# Périodes lues par chaque fonction, pour le cache (voir src/cache.py)
+def _day_period(target_date=None):
+    date_str = (target_date or datetime.now()).strftime('%Y-%m-%d')
+    return date_str, date_str
+
+def _week_period(target_date=None):
+    return _week_bounds(target_date or datetime.now())
+
+def _range_period(start=None, end=None):
+    return None if start is None else (start, end)
+
+def _whole_months(start, end):
+    # (premier mois, dernier mois) si la plage couvre des mois entiers, sinon None
+    first = datetime.strptime(start, '%Y-%m-%d')
+    last = datetime.strptime(end, '%Y-%m-%d')
+    if first.day != 1 or last.day != calendar.monthrange(last.year, last.month)[1]:
+        return None
+    return start[:7], end[:7]
+
+def _source(start=None, end=None):
+    # Table à interroger pour des agrégats par créneau : les agrégats
+    # mensuels (rollup_heure) quand la période est faite de mois entiers,
+    # sinon attendance filtrée sur le numéro de jour (index ix_attendance_jour).
+    # Renvoie (clause FROM/WHERE, paramètres, expression de comptage).
+    if start is None:
+        return 'rollup_heure', (), 'SUM(nb)'
+    months = _whole_months(start, end)
+    if months:
+        return 'rollup_heure WHERE mois BETWEEN ? AND ?', months, 'SUM(nb)'
+    return 'attendance WHERE jour BETWEEN ? AND ?', (day_number(start), day_number(end)), 'COUNT(*)'
+
+def _total(start, end):
+    rows = _query(
+        'SELECT COALESCE(SUM(total), 0) FROM rollup_jour WHERE jour BETWEEN ? AND ?',
+        (day_number(start), day_number(end))
+    )
+    return rows[0][0]
+
+def _hour_sums(start=None, end=None):
+    source, params, count = _source(start, end)
+    return _query(f'''
+        SELECT heure, COALESCE(SUM(total), 0), {count}
+        FROM {source}
+        GROUP BY heure
+        ORDER BY heure
+    ''', params)
+
+@cached(_day_period)
 def stats_today(target_date=None):
-    data = get_all_attendance()
     if target_date is None:
         target_date = datetime.now()
-    date_str = target_date.strftime('%Y-%m-%d')
-    day_data = [row for row in data if row[7] == date_str]
-    total = sum(row[6] for row in day_data)
-    return total
-
-def average_per_hour():
-    data = get_all_attendance()
-    hours = defaultdict(list)
-    for row in data:
-        hours[row[1]].append(row[6])
-    return {h: sum(vals)/len(vals) for h, vals in hours.items()}
-
-def peak_hours():
-    data = get_all_attendance()
-    hours = defaultdict(int)
-    for row in data:
-        hours[row[1]] += row[6]
+    rows = _query('SELECT total FROM rollup_jour WHERE jour = ?', (target_date.toordinal(),))
+    return rows[0][0] if rows else 0
+
+@cached(_range_period)
+def average_per_hour(start=None, end=None):
+    return {h: total / count for h, total, count in _hour_sums(start, end)}
+
+@cached(_range_period)
+def peak_hours(start=None, end=None):
+    hours = {h: total for h, total, _ in _hour_sums(start, end)}
     if not hours:
         return []
     max_val = max(hours.values())
     return [h for h, v in hours.items() if v == max_val]
 
-def repartition_par_classe():
-    data = get_all_attendance()
-    rep = {'6': 0, '5': 0, '4': 0, '3': 0}
-    for row in data:
-        rep['6'] += row[2]  # sixième
-        rep['5'] += row[3]  # cinquième
-        rep['4'] += row[4]  # quatrième
-        rep['3'] += row[5]  # troisième
-    return rep
+@cached(_range_period)
+def repartition_par_classe(start=None, end=None):
+    source, params, _ = _source(start, end)
+    row = _query(f'''
+        SELECT COALESCE(SUM(sixieme), 0), COALESCE(SUM(cinquieme), 0),
+               COALESCE(SUM(quatrieme), 0), COALESCE(SUM(troisieme), 0)
+        FROM {source}
+    ''', params)[0]
+    return dict(zip(('6', '5', '4', '3'), row))
 
+@cached(_week_period)
 def stats_semaine(target_date=None):
-    data = get_all_attendance()
     if target_date is None:
         target_date = datetime.now()
-    # Début de la semaine = lundi
-    start_week = target_date - timedelta(days=target_date.weekday())
-    start_week_str = start_week.strftime('%Y-%m-%d')
-    # Fin de la semaine = dimanche
-    end_week = start_week + timedelta(days=6)
-    end_week_str = end_week.strftime('%Y-%m-%d')
-    
-    if debug : 
-        print(f"Calcul stats semaine du {start_week_str} au {end_week_str}")
-    week_data = [row for row in data if start_week_str <= row[7] <= end_week_str]
-    total = sum(row[6] for row in week_data)
+    start_week_str, end_week_str = _week_bounds(target_date)
     if debug :
-        print(f"Données de la semaine trouvées: {len(week_data)}")
-    return total
+        print(f"Calcul stats semaine du {start_week_str} au {end_week_str}")
+    rows = _query('SELECT total FROM rollup_semaine WHERE semaine = ?', (day_number(start_week_str),))
+    return rows[0][0] if rows else 0
 
+@cached(_week_period)
 def average_per_hour_week(target_date=None):
-    data = get_all_attendance()
     if target_date is None:
         target_date = datetime.now()
-    # Début de la semaine = lundi
-    start_week = target_date - timedelta(days=target_date.weekday())
-    start_week_str = start_week.strftime('%Y-%m-%d')
-    # Fin de la semaine = dimanche
-    end_week = start_week + timedelta(days=6)
-    end_week_str = end_week.strftime('%Y-%m-%d')
-
+    start_week_str, end_week_str = _week_bounds(target_date)
     if debug :
         print(f"Période: du {start_week_str} au {end_week_str}")
-        print(f"Nombre total d'entrées: {len(data)}")
-    
-    # Créer un dictionnaire avec toutes les heures possibles initialisées à 0
-    all_hours = [f"{h:02d}:00" for h in range(8, 18) if h not in (12, 17)]
-    hours_data = {h: [] for h in all_hours}
-    
-    # Filtrer les données de la semaine
-    week_data = [row for row in data if start_week_str <= row[7] <= end_week_str]
-    if debug :
-        print(f"Nombre d'entrées pour la semaine: {len(week_data)}")
-        print("Premières entrées de la semaine:", week_data[:3] if week_data else "Aucune donnée")
-    
-    # Créer un dictionnaire avec toutes les heures possibles
-    all_hours = [f"{h:02d}:00" for h in range(8, 18) if h not in (12, 17)]
-    hours_data = {h: [] for h in all_hours}
-    
-    # Collecter les données par heure
-    for row in week_data:  # Utiliser week_data au lieu de data
-        if row[1] in hours_data:
-            hours_data[row[1]].append(row[6])
-    
-    # Calculer les moyennes
-    result = {}
-    for hour in all_hours:
-        values = hours_data[hour]
-        if values:  # S'il y a des données pour cette heure
-            result[hour] = sum(values) / len(values)
-        else:
-            result[hour] = 0
-    
+
+    # Toutes les heures possibles, à 0 quand il n'y a pas de données
+    result = {hour: 0 for hour in HOURS}
+    for hour, total, count in _hour_sums(start_week_str, end_week_str):
+        if hour in result:
+            result[hour] = total / count
+
     if debug :
         print("Moyennes calculées:", result)
     return result
 
+@dataclass
+class StatsSnapshot:
+    # Tous les agrégats d'une période, calculés en une seule requête
+    start: str
+    end: str
+    total: int = 0
+    hourly_totals: dict = field(default_factory=dict)
+    hourly_counts: dict = field(default_factory=dict)
+    repartition: dict = field(default_factory=lambda: {'6': 0, '5': 0, '4': 0, '3': 0})
+
+    def add_rows(self, rows):
+        # rows : (heure, total, nombre de saisies, 6e, 5e, 4e, 3e) par créneau
+        for heure, total, count, *classes in rows:
+            self.hourly_totals[heure] = self.hourly_totals.get(heure, 0) + total
+            self.hourly_counts[heure] = self.hourly_counts.get(heure, 0) + count
+            self.total += total
+            for key, value in zip(('6', '5', '4', '3'), classes):
+                self.repartition[key] += value
+        return self
+
+    @property
+    def averages(self):
+        # Moyenne par créneau, à 0 quand il n'y a pas de données
+        return {
+            h: self.hourly_totals[h] / self.hourly_counts[h] if self.hourly_counts.get(h) else 0
+            for h in HOURS
+        }
+
+    @property
+    def peaks(self):
+        if not self.hourly_totals:
+            return []
+        max_val = max(self.hourly_totals.values())
+        return [h for h, v in self.hourly_totals.items() if v == max_val]
+
+@cached(_range_period)
+def snapshot(start, end):
+    snap = StatsSnapshot(start, end)
+    source, params, count = _source(start, end)
+    rows = _query(f'''
+        SELECT heure, COALESCE(SUM(total), 0), {count},
+               COALESCE(SUM(sixieme), 0), COALESCE(SUM(cinquieme), 0),
+               COALESCE(SUM(quatrieme), 0), COALESCE(SUM(troisieme), 0)
+        FROM {source}
+        GROUP BY heure
+        ORDER BY heure
+    ''', params)
+    snap.add_rows(rows)
+    if debug :
+        print(f"Snapshot du {start} au {end}: total={snap.total}")
+    return snap
+
+def snapshot_day(target_date=None):
+    if target_date is None:
+        target_date = datetime.now()
+    date_str = target_date.strftime('%Y-%m-%d')
+    return snapshot(date_str, date_str)
+
+def snapshot_week(target_date=None):
+    if target_date is None:
+        target_date = datetime.now()
+    return snapshot(*_week_bounds(target_date))
+
+def snapshot_month(target_date=None):
+    if target_date is None:
+        target_date = datetime.now()
+    last_day = calendar.monthrange(target_date.year, target_date.month)[1]
+    start = target_date.replace(day=1).strftime('%Y-%m-%d')
+    end = target_date.replace(day=last_day).strftime('%Y-%m-%d')
+    return snapshot(start, end)
+
+def snapshot_year(target_date=None):
+    if target_date is None:
+        target_date = datetime.now()
+    return snapshot(f"{target_date.year}-01-01", f"{target_date.year}-12-31")
+
+@cached(_range_period)
+def daily_totals(start, end):
+    # Total par jour de la période, lu dans rollup_jour ({'AAAA-MM-JJ': total})
+    rows = _query(
+        'SELECT jour, total FROM rollup_jour WHERE jour BETWEEN ? AND ? ORDER BY jour',
+        (day_number(start), day_number(end))
+    )
+    return {date.fromordinal(jour).isoformat(): total for jour, total in rows}
+
+# --- Salle entière (postes synchronisés, voir src/sync.py) ---
+# Lignes de ce poste et sommes des autres postes (sync_remote), additionnées
+# par créneau avant d'être agrégées comme pour un seul poste
+
+def _room_slots(start, end):
+    return '''
+        SELECT jour, heure, SUM(total) AS total, SUM(sixieme) AS sixieme,
+               SUM(cinquieme) AS cinquieme, SUM(quatrieme) AS quatrieme,
+               SUM(troisieme) AS troisieme
+        FROM (
+            SELECT jour, heure, total, sixieme, cinquieme, quatrieme, troisieme
+            FROM attendance WHERE jour BETWEEN :first AND :last
+            UNION ALL
+            SELECT jour, heure, total, sixieme, cinquieme, quatrieme, troisieme
+            FROM sync_remote WHERE jour BETWEEN :first AND :last
+        )
+        GROUP BY jour, heure
+    ''', {'first': day_number(start), 'last': day_number(end)}
+
+@cached(_range_period)
+def room_snapshot(start, end):
+    snap = StatsSnapshot(start, end)
+    slots, params = _room_slots(start, end)
+    rows = _query(f'''
+        SELECT heure, COALESCE(SUM(total), 0), COUNT(*),
+               COALESCE(SUM(sixieme), 0), COALESCE(SUM(cinquieme), 0),
+               COALESCE(SUM(quatrieme), 0), COALESCE(SUM(troisieme), 0)
+        FROM ({slots})
+        GROUP BY heure
+        ORDER BY heure
+    ''', params)
+    snap.add_rows(rows)
+    return snap
+
+def room_snapshot_week(target_date=None):
+    return room_snapshot(*_week_bounds(target_date or datetime.now()))
+
+@cached(_range_period)
+def room_daily_totals(start, end):
+    slots, params = _room_slots(start, end)
+    rows = _query(f'SELECT jour, COALESCE(SUM(total), 0) FROM ({slots}) GROUP BY jour ORDER BY jour', params)
+    return {date.fromordinal(jour).isoformat(): total for jour, total in rows}
+
 # ...other statistics functions...
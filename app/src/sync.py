@@ -0,0 +1,380 @@
+import gzip
+import http.client
+import json
+import logging
+import queue
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlencode, urlsplit
+
+from .cache import stats_cache
+from .connection import transaction
+
+# Synchronisation entre les postes de saisie d'un même CDI.
+#
+# Chaque poste garde sa propre base. Une fois la synchronisation activée
+# (premier push, toutes les lignes existantes sont alors notées), les
+# triggers de sync_pending notent chaque (date, heure) modifié ; sans
+# serveur configuré, rien n'est noté. push() envoie ces créneaux par lots au
+# serveur d'agrégation (src/sync_server.py), avec les valeurs actuelles de
+# la ligne (ou deleted si elle a été supprimée). Un lot porte un numéro de
+# séquence par poste : un lot renvoyé après une coupure est reconnu et
+# ignoré par le serveur, et chaque ligne est identifiée par
+# (date, heure, poste), ce qui rend l'envoi idempotent.
+#
+# La séquence est propre à chaque base (identifiant tiré au hasard à son
+# premier envoi) : une nouvelle base annuelle repart à 1 sans que ses lots
+# soient pris pour des renvois. Un lot dont le seq est en retard sur le
+# serveur (base restaurée) est refusé (409) et renuméroté.
+#
+# pull() rapatrie dans sync_remote les sommes par créneau des AUTRES postes,
+# modifiées depuis la dernière version reçue. Les statistiques « salle »
+# (statistics.room_*) additionnent attendance et sync_remote.
+#
+# Transport : JSON compressé en gzip sur des connexions HTTP/1.1 gardées
+# ouvertes (keep-alive) et réutilisées depuis un petit pool.
+
+CLASS_COLUMNS = ('sixieme', 'cinquieme', 'quatrieme', 'troisieme', 'total')
+BATCH_SIZE = 500
+SYNC_INTERVAL = 30.0
+MAX_RETRY_DELAY = 300.0
+TIMEOUT = 10.0
+COMPRESS_MIN = 1024  # octets ; en dessous, le corps est envoyé tel quel
+SYNC_ENABLED_SQL = "EXISTS (SELECT 1 FROM sync_state WHERE key = 'enabled')"
+SYNC_TRIGGERS = ('insert', 'update', 'delete', 'move')
+
+def create_sync_tables(conn):
+    # Créneaux modifiés localement et pas encore acquittés par le serveur ;
+    # rev change à chaque modification pour ne pas effacer une modification
+    # faite pendant l'envoi
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_pending (
+            date TEXT NOT NULL,
+            heure TEXT NOT NULL,
+            rev INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (date, heure)
+        ) WITHOUT ROWID
+    ''')
+    # Sommes par créneau des autres postes
+    sums = ', '.join(f'{col} INTEGER NOT NULL DEFAULT 0' for col in CLASS_COLUMNS)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS sync_remote (
+            jour INTEGER NOT NULL,
+            heure TEXT NOT NULL,
+            date TEXT NOT NULL,
+            {sums},
+            PRIMARY KEY (jour, heure)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value
+        ) WITHOUT ROWID
+    ''')
+    for event, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_sync_{event}
+            AFTER {event.upper()} ON attendance
+            WHEN {SYNC_ENABLED_SQL}
+            BEGIN
+                INSERT INTO sync_pending (date, heure) VALUES ({row}.date, {row}.heure)
+                ON CONFLICT (date, heure) DO UPDATE SET rev = rev + 1;
+            END
+        ''')
+    # Une mise à jour qui change la date ou le créneau libère aussi l'ancien
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_attendance_sync_move
+        AFTER UPDATE OF date, heure ON attendance
+        WHEN (OLD.date != NEW.date OR OLD.heure != NEW.heure) AND {SYNC_ENABLED_SQL}
+        BEGIN
+            INSERT INTO sync_pending (date, heure) VALUES (OLD.date, OLD.heure)
+            ON CONFLICT (date, heure) DO UPDATE SET rev = rev + 1;
+        END
+    ''')
+
+def enable(conn):
+    # Active le suivi des modifications ; la première fois, toutes les
+    # lignes existantes sont à envoyer
+    if _get_state(conn, 'enabled') is None:
+        _set_state(conn, 'enabled', 1)
+        conn.execute('INSERT OR IGNORE INTO sync_pending (date, heure) SELECT date, heure FROM attendance')
+
+def disable(path=None):
+    # Sans serveur configuré : plus rien n'est noté, les créneaux en attente
+    # sont oubliés (ils seront tous renvoyés si la synchronisation reprend)
+    with transaction(path) as conn:
+        conn.execute("DELETE FROM sync_state WHERE key = 'enabled'")
+        conn.execute('DELETE FROM sync_pending')
+
+def _get_state(conn, key, default=None):
+    row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+def _set_state(conn, key, value):
+    conn.execute('''
+        INSERT INTO sync_state (key, value) VALUES (?, ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+    ''', (key, value))
+
+def encode_body(data, compress=True):
+    # (corps, en-têtes) pour un objet JSON
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if compress and len(body) >= COMPRESS_MIN:
+        body = gzip.compress(body, compresslevel=6)
+        headers['Content-Encoding'] = 'gzip'
+    return body, headers
+
+def decode_body(body, encoding=None):
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    return json.loads(body.decode('utf-8')) if body else None
+
+class SyncError(Exception):
+    def __init__(self, message, status=None, data=None):
+        super().__init__(message)
+        self.status = status
+        self.data = data
+
+class SyncClient:
+    # Client du serveur d'agrégation, sûr entre threads : chaque requête
+    # emprunte une connexion au pool et la rend ensuite pour la suivante
+    def __init__(self, url, terminal, pool_size=2, timeout=TIMEOUT):
+        parts = urlsplit(url if '//' in url else f'http://{url}')
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"adresse de serveur invalide : {url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.terminal = terminal
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        except BaseException:
+            conn.close()  # état inconnu : pas de réutilisation
+            raise
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, path, data=None, params=None):
+        url = self.prefix + path + (f'?{urlencode(params)}' if params else '')
+        body, headers = encode_body(data) if data is not None else (None, {})
+        headers['Accept-Encoding'] = 'gzip'
+        # Une connexion gardée ouverte peut avoir été fermée par le serveur
+        # entre deux requêtes : un seul nouvel essai sur une connexion neuve
+        for attempt in range(2):
+            try:
+                with self._connection() as conn:
+                    conn.request(method, url, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    payload = resp.read()
+                    if resp.will_close:
+                        conn.close()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                if attempt:
+                    raise
+                continue
+            if resp.status != 200:
+                try:
+                    data = decode_body(payload, resp.getheader('Content-Encoding'))
+                except ValueError:
+                    data = None
+                raise SyncError(f"{method} {path} : HTTP {resp.status} {payload[:200]!r}", resp.status, data)
+            return decode_body(payload, resp.getheader('Content-Encoding'))
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+def _pending_rows(conn, limit):
+    # Créneaux à envoyer, avec les valeurs actuelles (NULL : ligne supprimée)
+    return conn.execute(f'''
+        SELECT p.date, p.heure, p.rev, a.id, {', '.join(f'a.{c}' for c in CLASS_COLUMNS)}
+        FROM sync_pending AS p
+        LEFT JOIN attendance AS a ON a.date = p.date AND a.heure = p.heure
+        ORDER BY p.date, p.heure
+        LIMIT ?
+    ''', (limit,)).fetchall()
+
+def _base_id(conn):
+    base_id = _get_state(conn, 'base_id')
+    if base_id is None:
+        base_id = uuid.uuid4().hex
+        _set_state(conn, 'base_id', base_id)
+    return base_id
+
+def _next_batch(conn, terminal, batch_size):
+    # Lot en cours d'envoi s'il y en a un (réponse perdue : il est renvoyé à
+    # l'identique, le serveur le reconnaît à son seq), sinon un nouveau lot
+    # enregistré avant l'envoi. Renvoie (lot, [(date, heure, rev)]) ou None.
+    inflight = _get_state(conn, 'push_inflight')
+    if inflight:
+        saved = json.loads(inflight)
+        return saved['batch'], saved['acks']
+    rows = _pending_rows(conn, batch_size)
+    if not rows:
+        return None
+    changes = []
+    for date, heure, _, row_id, *values in rows:
+        change = {'date': date, 'heure': heure}
+        if row_id is None:
+            change['deleted'] = True
+        else:
+            change.update({col: value or 0 for col, value in zip(CLASS_COLUMNS, values)})
+        changes.append(change)
+    seq = (_get_state(conn, 'push_seq', 0) or 0) + 1
+    batch = {'terminal': terminal, 'base': _base_id(conn), 'seq': seq, 'rows': changes}
+    acks = [(date, heure, rev) for date, heure, rev, *_ in rows]
+    _set_state(conn, 'push_inflight', json.dumps({'batch': batch, 'acks': acks}))
+    _set_state(conn, 'push_seq', seq)
+    return batch, acks
+
+def push(client, path=None, batch_size=BATCH_SIZE):
+    # Envoie les créneaux en attente ; renvoie le nombre de lignes acquittées
+    sent = 0
+    with transaction(path) as conn:
+        enable(conn)
+    while True:
+        with transaction(path) as conn:
+            pending = _next_batch(conn, client.terminal, batch_size)
+        if pending is None:
+            return sent
+        batch, acks = pending
+        try:
+            client.request('POST', '/changesets', batch)
+        except SyncError as e:
+            if e.status != 409:
+                raise
+            # Séquence en retard sur le serveur (base restaurée d'une
+            # sauvegarde) : rien n'a été appliqué, le lot est renuméroté
+            last_seq = int((e.data or {}).get('last_seq', batch['seq']))
+            logging.warning(f"Synchronisation : séquence {batch['seq']} refusée, reprise après {last_seq}")
+            with transaction(path) as conn:
+                conn.execute("DELETE FROM sync_state WHERE key = 'push_inflight'")
+                _set_state(conn, 'push_seq', max(last_seq, batch['seq']))
+            continue
+        # Acquitté : on retire les créneaux non modifiés depuis la lecture
+        with transaction(path) as conn:
+            conn.executemany(
+                'DELETE FROM sync_pending WHERE date = ? AND heure = ? AND rev = ?', acks
+            )
+            conn.execute("DELETE FROM sync_state WHERE key = 'push_inflight'")
+        sent += len(acks)
+
+def pull(client, path=None):
+    # Récupère les sommes des autres postes modifiées depuis la dernière
+    # version reçue ; renvoie le nombre de créneaux mis à jour
+    with transaction(path) as conn:
+        since = _get_state(conn, 'pull_version', 0) or 0
+    data = client.request('GET', '/rollups', params={'since': since, 'exclude': client.terminal})
+    rows = data['rows']
+    with transaction(path) as conn:
+        if data.get('reset'):
+            conn.execute('DELETE FROM sync_remote')
+        for row in rows:
+            if row['terminals']:
+                conn.execute(f'''
+                    INSERT INTO sync_remote (jour, heure, date, {', '.join(CLASS_COLUMNS)})
+                    VALUES (?, ?, ?, {', '.join('?' * len(CLASS_COLUMNS))})
+                    ON CONFLICT (jour, heure) DO UPDATE SET
+                    {', '.join(f'{c} = excluded.{c}' for c in CLASS_COLUMNS)}
+                ''', (row['jour'], row['heure'], row['date'], *(row[c] for c in CLASS_COLUMNS)))
+            else:
+                conn.execute('DELETE FROM sync_remote WHERE jour = ? AND heure = ?',
+                             (row['jour'], row['heure']))
+        _set_state(conn, 'pull_version', data['version'])
+    if data.get('reset'):
+        stats_cache.clear()
+    for row in rows:
+        stats_cache.invalidate(row['jour'], path)
+    return len(rows)
+
+def default_terminal():
+    return socket.gethostname() or 'poste'
+
+def client_from_config():
+    # Client configuré dans [Sync] de config.cfg, ou None si désactivé
+    from .config import get_config
+    config = get_config()
+    if not config.sync_server:
+        return None
+    return SyncClient(config.sync_server, config.terminal or default_terminal())
+
+def sync_once(client, path=None):
+    pushed = push(client, path)
+    pulled = pull(client, path)
+    return pushed, pulled
+
+class SyncThread(threading.Thread):
+    # Synchronisation périodique en arrière-plan, avec délai croissant
+    # quand le serveur est injoignable
+    def __init__(self, client, interval=SYNC_INTERVAL):
+        super().__init__(name='sync', daemon=True)
+        self.client = client
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        delay = self.interval
+        while not self._stopping.is_set():
+            try:
+                sync_once(self.client)
+                delay = self.interval
+            except Exception as e:
+                # Serveur injoignable, base verrouillée... : le thread continue
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                logging.warning(f"Synchronisation reportée ({e}), nouvel essai dans {delay:.0f} s")
+            self._wake.wait(delay)
+            self._wake.clear()
+        self.client.close()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wake.set()
+        self.join(timeout)
+
+_sync_thread = None
+
+def start_sync():
+    # Démarre la synchronisation si un serveur est configuré
+    global _sync_thread
+    if _sync_thread is not None and _sync_thread.is_alive():
+        return _sync_thread
+    client = client_from_config()
+    if client is None:
+        disable()
+        return None
+    _sync_thread = SyncThread(client)
+    _sync_thread.start()
+    return _sync_thread
+
+def stop_sync():
+    global _sync_thread
+    if _sync_thread is not None:
+        _sync_thread.stop()
+        _sync_thread = None
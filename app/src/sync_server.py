@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .sync import CLASS_COLUMNS, decode_body, encode_body
+
+# Serveur d'agrégation de la synchronisation (voir src/sync.py).
+#
+# Il garde, pour chaque (date, heure, poste), la dernière ligne reçue et,
+# pour chaque (date, heure), un numéro de version global incrémenté à chaque
+# changement : un poste demande les créneaux modifiés depuis la dernière
+# version qu'il a vue. Stockage SQLite, une connexion par thread.
+#
+#   python -m src.sync_server --db central.db --port 8765
+#
+# Pour les tests, start_server() lance le serveur dans un thread sur un
+# port libre de 127.0.0.1.
+
+SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS terminal_rows (
+        terminal TEXT NOT NULL,
+        jour INTEGER NOT NULL,
+        heure TEXT NOT NULL,
+        date TEXT NOT NULL,
+        {', '.join(f'{c} INTEGER NOT NULL DEFAULT 0' for c in CLASS_COLUMNS)},
+        PRIMARY KEY (jour, heure, terminal)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS slot_versions (
+        jour INTEGER NOT NULL,
+        heure TEXT NOT NULL,
+        date TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        PRIMARY KEY (jour, heure)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS ix_slot_versions_version ON slot_versions (version);
+    CREATE TABLE IF NOT EXISTS sequences (
+        terminal TEXT NOT NULL,
+        base TEXT NOT NULL,
+        last_seq INTEGER NOT NULL,
+        digest TEXT NOT NULL,
+        PRIMARY KEY (terminal, base)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    ) WITHOUT ROWID;
+'''
+MAX_BODY = 16 * 1024 * 1024
+
+class StaleSequence(Exception):
+    # Seq déjà utilisé par ce poste et cette base pour un autre lot
+    def __init__(self, last_seq):
+        super().__init__(f"séquence en retard (dernière reçue : {last_seq})")
+        self.last_seq = last_seq
+
+class Aggregator:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def version(self):
+        row = self._conn().execute("SELECT value FROM counters WHERE name = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def apply(self, terminal, seq, rows, base=''):
+        # Applique un lot. La séquence est suivie par (poste, base) : le
+        # renvoi du dernier lot (même seq, mêmes lignes) est acquitté sans
+        # être rejoué ; un seq en retard ou réutilisé pour d'autres lignes
+        # lève StaleSequence sans rien appliquer
+        digest = hashlib.sha256(json.dumps(rows, sort_keys=True).encode('utf-8')).hexdigest()
+        conn = self._conn()
+        with self._write_lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                last = conn.execute(
+                    'SELECT last_seq, digest FROM sequences WHERE terminal = ? AND base = ?', (terminal, base)
+                ).fetchone()
+                if last is not None and seq <= last[0]:
+                    conn.execute('ROLLBACK')
+                    if seq == last[0] and digest == last[1]:
+                        return {'applied': 0, 'duplicate': True, 'version': self.version()}
+                    raise StaleSequence(last[0])
+                version = self.version()
+                for row in rows:
+                    jour = date.fromisoformat(row['date']).toordinal()
+                    if row.get('deleted'):
+                        conn.execute(
+                            'DELETE FROM terminal_rows WHERE jour = ? AND heure = ? AND terminal = ?',
+                            (jour, row['heure'], terminal)
+                        )
+                    else:
+                        values = [int(row.get(c) or 0) for c in CLASS_COLUMNS]
+                        conn.execute(f'''
+                            INSERT INTO terminal_rows (terminal, jour, heure, date, {', '.join(CLASS_COLUMNS)})
+                            VALUES (?, ?, ?, ?, {', '.join('?' * len(CLASS_COLUMNS))})
+                            ON CONFLICT (jour, heure, terminal) DO UPDATE SET
+                            {', '.join(f'{c} = excluded.{c}' for c in CLASS_COLUMNS)}
+                        ''', (terminal, jour, row['heure'], row['date'], *values))
+                    version += 1
+                    conn.execute('''
+                        INSERT INTO slot_versions (jour, heure, date, version) VALUES (?, ?, ?, ?)
+                        ON CONFLICT (jour, heure) DO UPDATE SET version = excluded.version
+                    ''', (jour, row['heure'], row['date'], version))
+                conn.execute('''
+                    INSERT INTO counters (name, value) VALUES ('version', ?)
+                    ON CONFLICT (name) DO UPDATE SET value = excluded.value
+                ''', (version,))
+                conn.execute('''
+                    INSERT INTO sequences (terminal, base, last_seq, digest) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (terminal, base) DO UPDATE SET
+                    last_seq = excluded.last_seq, digest = excluded.digest
+                ''', (terminal, base, seq, digest))
+                conn.execute('COMMIT')
+            except StaleSequence:
+                raise
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return {'applied': len(rows), 'duplicate': False, 'version': version}
+
+    def rollups(self, since=0, exclude=None):
+        # Sommes par créneau des postes autres que exclude, pour les créneaux
+        # modifiés après la version since. terminals = nb de postes comptés
+        # (0 : plus rien pour ce créneau). Si le poste a vu une version que le
+        # serveur n'a pas (base du serveur remplacée), tout est renvoyé avec
+        # reset pour qu'il reparte de zéro.
+        conn = self._conn()
+        conn.execute('BEGIN')
+        try:
+            version = self.version()
+            reset = since > version
+            if reset:
+                since = 0
+            rows = conn.execute(f'''
+                SELECT v.jour, v.heure, v.date, COUNT(t.terminal),
+                       {', '.join(f'COALESCE(SUM(t.{c}), 0)' for c in CLASS_COLUMNS)}
+                FROM slot_versions AS v
+                LEFT JOIN terminal_rows AS t
+                    ON t.jour = v.jour AND t.heure = v.heure AND t.terminal IS NOT ?
+                WHERE v.version > ?
+                GROUP BY v.jour, v.heure
+                ORDER BY v.jour, v.heure
+            ''', (exclude, since)).fetchall()
+        finally:
+            conn.execute('COMMIT')
+        keys = ('jour', 'heure', 'date', 'terminals') + CLASS_COLUMNS
+        return {'version': version, 'reset': reset, 'rows': [dict(zip(keys, row)) for row in rows]}
+
+class SyncHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # connexions gardées ouvertes
+    server_version = 'CDIStatsSync/1'
+
+    def log_message(self, format, *args):
+        logging.debug("sync %s - %s", self.address_string(), format % args)
+
+    def _send(self, status, data):
+        accepts_gzip = 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        body, headers = encode_body(data, compress=accepts_gzip)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self.close_connection = True  # corps non lu : connexion inutilisable
+            raise ValueError("corps de requête trop volumineux")
+        return decode_body(self.rfile.read(length), self.headers.get('Content-Encoding'))
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/changesets':
+            return self._send(404, {'error': 'introuvable'})
+        try:
+            data = self._read_json()
+            result = self.server.aggregator.apply(
+                str(data['terminal']), int(data['seq']), data['rows'], str(data.get('base', ''))
+            )
+        except StaleSequence as e:
+            return self._send(409, {'error': str(e), 'last_seq': e.last_seq})
+        except (KeyError, TypeError, ValueError) as e:
+            return self._send(400, {'error': str(e)})
+        self._send(200, result)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path != '/rollups':
+            return self._send(404, {'error': 'introuvable'})
+        query = parse_qs(parts.query)
+        try:
+            since = int(query.get('since', ['0'])[0])
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        exclude = query.get('exclude', [None])[0]
+        self._send(200, self.server.aggregator.rollups(since, exclude))
+
+def make_server(path, host='0.0.0.0', port=8765):
+    server = ThreadingHTTPServer((host, port), SyncHandler)
+    server.daemon_threads = True
+    server.aggregator = Aggregator(path)
+    return server
+
+def start_server(path, host='127.0.0.1', port=0):
+    # Serveur dans un thread (tests, démonstration) ; port 0 = port libre.
+    # Renvoie (serveur, url) ; arrêt avec server.shutdown()
+    server = make_server(path, host, port)
+    threading.Thread(target=server.serve_forever, name='sync-server', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m src.sync_server')
+    parser.add_argument('--db', default='sync-central.db', help="base du serveur")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    server = make_server(args.db, args.host, args.port)
+    logging.info(f"Serveur de synchronisation sur {args.host}:{args.port} ({args.db})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
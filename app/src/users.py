@@ -0,0 +1,93 @@
+import csv
+import os
+import threading
+
+from .connection import get_connection, transaction
+from .utils import hash_password, verify_password
+
+# Comptes utilisateurs dans une base SQLite dédiée (data/users.db), indépendante
+# des bases annuelles : recherche par clé primaire et mots de passe hachés.
+# Un fichier data/users.csv (username,password en clair) déposé dans le
+# dossier est importé à la première ouverture de la base par le processus,
+# puis supprimé : aucun mot de passe en clair ne reste sur le disque.
+
+_lock = threading.Lock()
+_ready = set()
+_dummy_hash = None
+
+def data_dir():
+    path = os.path.join(os.path.dirname(__file__), '..', 'data')
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return os.path.abspath(path)
+
+def users_db_path():
+    return os.path.join(data_dir(), 'users.db')
+
+def users_csv_path():
+    return os.path.join(data_dir(), 'users.csv')
+
+def _init(path):
+    with _lock:
+        if path in _ready:
+            return
+        with transaction(path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    password_hash TEXT NOT NULL
+                ) WITHOUT ROWID
+            ''')
+        if path == users_db_path():
+            _import_csv(users_csv_path(), path)
+            # Copie en clair laissée par les versions précédentes
+            if os.path.exists(users_csv_path() + '.migre'):
+                os.remove(users_csv_path() + '.migre')
+        _ready.add(path)
+
+def migrate_from_csv(csv_path=None, path=None):
+    # Importe les comptes du CSV (mots de passe hachés) puis supprime le fichier
+    path = path or users_db_path()
+    _init(path)
+    return _import_csv(csv_path or users_csv_path(), path)
+
+def _import_csv(csv_path, path):
+    if not os.path.exists(csv_path):
+        return 0
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        users = [
+            (row['username'], hash_password(row['password']))
+            for row in csv.DictReader(csvfile)
+            if row.get('username')
+        ]
+    with transaction(path) as conn:
+        conn.executemany('''
+            INSERT INTO users (username, password_hash) VALUES (?, ?)
+            ON CONFLICT (username) DO UPDATE SET password_hash = excluded.password_hash
+        ''', users)
+    os.remove(csv_path)
+    return len(users)
+
+def set_password(username, password, path=None):
+    path = path or users_db_path()
+    _init(path)
+    with transaction(path) as conn:
+        conn.execute('''
+            INSERT INTO users (username, password_hash) VALUES (?, ?)
+            ON CONFLICT (username) DO UPDATE SET password_hash = excluded.password_hash
+        ''', (username, hash_password(password)))
+
+def authenticate(username, password, path=None):
+    path = path or users_db_path()
+    _init(path)
+    row = get_connection(path).execute(
+        'SELECT password_hash FROM users WHERE username = ?', (username,)
+    ).fetchone()
+    if row is None:
+        # Même coût de calcul que pour un compte existant : le temps de
+        # réponse ne révèle pas quels identifiants existent
+        global _dummy_hash
+        _dummy_hash = _dummy_hash or hash_password('')
+        verify_password(password, _dummy_hash)
+        return False
+    return verify_password(password, row[0])
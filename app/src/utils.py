@@ -1,8 +1,26 @@
 import hashlib
-from datetime import datetime
+import hmac
+import os
+from datetime import date, datetime
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+# PBKDF2-SHA256 salé, volontairement lent ; format stocké :
+# pbkdf2_sha256$<itérations>$<sel hex>$<haché hex>
+PASSWORD_ITERATIONS = 600000
+
+def hash_password(password, salt=None, iterations=PASSWORD_ITERATIONS):
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, stored):
+    try:
+        algorithm, iterations, salt, expected = stored.split('$')
+    except ValueError:
+        return False
+    if algorithm != 'pbkdf2_sha256':
+        return False
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
 
 def round_hour(dt=None):
     if dt is None:
@@ -12,4 +30,8 @@ def round_hour(dt=None):
 def today_str():
     return datetime.now().strftime('%Y-%m-%d')
 
+def day_number(date_str):
+    # Numéro de jour entier stocké dans attendance.jour
+    return date.fromisoformat(date_str).toordinal()
+
 # ...other utility functions...
@@ -0,0 +1,56 @@
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# Exécution des calculs longs hors du thread de l'interface. Les résultats
+# sont déposés dans une file et récupérés par poll(), appelé périodiquement
+# depuis la boucle Tk (after()) : les callbacks s'exécutent donc toujours
+# dans le thread de l'interface. Chaque submit() rend obsolètes les tâches
+# précédentes : celles qui n'ont pas démarré sont annulées et les résultats
+# des autres sont ignorés.
+
+class BackgroundRunner:
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stats')
+        self._results = queue.Queue()
+        self._generation = 0
+        self._futures = []
+
+    def submit(self, func, on_done, on_error=None):
+        self.cancel()
+        generation = self._generation
+
+        def task():
+            try:
+                result = func()
+            except Exception as e:
+                self._results.put((generation, on_error, e))
+            else:
+                self._results.put((generation, on_done, result))
+
+        self._futures.append(self._executor.submit(task))
+
+    def cancel(self):
+        self._generation += 1
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+
+    def poll(self):
+        # À appeler depuis le thread de l'interface
+        while True:
+            try:
+                generation, callback, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+            if generation != self._generation:
+                continue  # résultat d'une navigation dépassée
+            self._futures = [f for f in self._futures if not f.done()]
+            if callback is not None:
+                callback(value)
+            elif isinstance(value, Exception):
+                logging.error(f"Erreur dans une tâche de fond : {value}")
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,27 @@
+import pytest
+
+from src import journal
+from src.cache import stats_cache
+from src.connection import close_all, set_db_path
+from src.migrations import migrate
+
+# Lancer depuis le dossier app : python -m pytest
+
+@pytest.fixture(autouse=True)
+def _isolation(tmp_path, monkeypatch):
+    # Journal et cache propres à chaque test, connexions fermées à la fin
+    monkeypatch.setattr(journal, 'JOURNAL_DIR', str(tmp_path / 'journal'))
+    stats_cache.clear()
+    yield
+    close_all()
+    set_db_path(None)
+    stats_cache.clear()
+
+@pytest.fixture
+def make_base(tmp_path):
+    # make_base('poste-a') -> chemin d'une base neuve au schéma courant
+    def make(name='Base.db'):
+        path = str(tmp_path / name)
+        migrate(path)
+        return path
+    return make
@@ -0,0 +1,28 @@
+from src.cache import StatsCache
+
+# Cache des statistiques (src/cache.py)
+
+def test_result_computed_during_invalidation_is_not_kept():
+    cache = StatsCache()
+    key = ('base.db', 'snapshot', (1, 7))
+
+    def compute():
+        # Une saisie est appliquée pendant le calcul
+        cache.invalidate(3, 'base.db')
+        return 'ancien'
+
+    assert cache.get_or_compute(key, (1, 7), compute) == 'ancien'
+    assert cache.get_or_compute(key, (1, 7), lambda: 'nouveau') == 'nouveau'
+    assert cache.get_or_compute(key, (1, 7), lambda: 'autre') == 'nouveau'
+
+def test_clear_during_compute_is_honoured():
+    cache = StatsCache()
+    key = ('base.db', 'snapshot', None)
+    assert cache.get_or_compute(key, None, lambda: cache.clear() or 'ancien') == 'ancien'
+    assert cache.info()['size'] == 0
+
+def test_other_base_does_not_block_storage():
+    cache = StatsCache()
+    key = ('a.db', 'snapshot', None)
+    cache.get_or_compute(key, None, lambda: cache.invalidate(3, 'b.db') or 'valeur')
+    assert cache.info()['size'] == 1
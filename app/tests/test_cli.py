@@ -0,0 +1,54 @@
+import json
+import sqlite3
+
+from src.cli import main
+from src.connection import transaction
+from src.database import UPSERT_ATTENDANCE
+from src.migrations import SCHEMA_VERSION, _v1_attendance
+
+# Ligne de commande (src/cli.py)
+
+def old_base(tmp_path, name='Base-2023.db'):
+    # Base d'avant les migrations, jamais ouverte par l'application
+    path = str(tmp_path / name)
+    conn = sqlite3.connect(path)
+    _v1_attendance(conn)
+    conn.executemany(
+        'INSERT INTO attendance (heure, sixieme, cinquieme, quatrieme, troisieme, total, date) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [('08:00', 1, 2, 0, 0, 3, '2023-03-06'), ('09:00', 0, 0, 4, 0, 4, '2023-03-07')],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(attendance)')]
+        return conn.execute('PRAGMA user_version').fetchone()[0], 'jour' in columns, \
+            conn.execute('PRAGMA journal_mode').fetchone()[0]
+    finally:
+        conn.close()
+
+def test_stats_on_all_bases_leaves_old_bases_untouched(tmp_path, make_base, capsys):
+    old = old_base(tmp_path)
+    current = make_base('Base-2025.db')
+    with transaction(current) as conn:
+        conn.execute(UPSERT_ATTENDANCE, ('08:00', 5, 0, 0, 0, 5, '2025-03-10', 0))
+    assert main(['--all-bases', '--data-dir', str(tmp_path), 'stats', '--period', 'annee',
+                 '--date', '2023-03-06', '--json']) == 0
+    results = json.loads(capsys.readouterr().out)
+    assert [(r['base'], r['total']) for r in results] == [('Base-2023.db', 7), ('Base-2025.db', 0)]
+    assert schema(old) == (0, False, 'delete')
+
+def test_export_asks_for_migration_then_works(tmp_path, capsys):
+    old = old_base(tmp_path)
+    out = str(tmp_path / 'sortie.csv')
+    assert main(['--base', old, 'export', 'csv', out]) == 1
+    assert 'migrate' in capsys.readouterr().err
+    assert schema(old) == (0, False, 'delete')
+
+    assert main(['--base', old, 'migrate']) == 0
+    assert schema(old)[:2] == (SCHEMA_VERSION, True)
+    assert main(['--base', old, 'export', 'csv', out]) == 0
+    assert '2 ligne(s)' in capsys.readouterr().out
@@ -0,0 +1,112 @@
+import random
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from src import statistics
+from src.connection import set_db_path, transaction
+from src.database import UPSERT_ATTENDANCE
+from src.migrations import _v1_attendance, migrate
+
+np = pytest.importorskip('numpy')
+from src import columnar  # noqa: E402
+
+# Parité du moteur colonne (NumPy) avec le moteur SQL de src/statistics.py
+
+# Créneaux de saisie et heures hors grille (import CSV)
+HEURES = statistics.HOURS + ['08:30', '12:00', '17:15']
+
+def random_rows(seed, start=date(2024, 11, 1), end=date(2025, 2, 28)):
+    rng = random.Random(seed)
+    rows = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5 and rng.random() < 0.9:
+            for heure in rng.sample(HEURES, rng.randint(1, len(HEURES))):
+                counts = [rng.randint(0, 8) for _ in range(4)]
+                rows.append((heure, *counts, sum(counts), day.isoformat(), day.toordinal()))
+        day += timedelta(days=1)
+    return rows
+
+@pytest.fixture(params=[0, 1, 2])
+def store(request, make_base):
+    path = make_base(f'Base-{request.param}.db')
+    with transaction(path) as conn:
+        conn.executemany(UPSERT_ATTENDANCE, random_rows(request.param))
+        # Classe non renseignée (NULL), permise par le schéma
+        conn.execute(
+            "INSERT INTO attendance (heure, sixieme, cinquieme, quatrieme, troisieme, total, date, jour) "
+            "VALUES ('07:45', NULL, 2, 1, 0, 3, '2025-01-07', ?), ('07:45', 1, 0, 0, 0, 1, '2025-01-08', ?)",
+            (date(2025, 1, 7).toordinal(), date(2025, 1, 8).toordinal()),
+        )
+    set_db_path(path)
+    return columnar.ColumnStore([path])
+
+# Plages dans un mois, à cheval sur deux mois et sur le changement d'année,
+# mois entiers (servis par les agrégats côté SQL) et plage sans données
+RANGES = [
+    ('2024-11-04', '2024-11-08'),
+    ('2024-11-25', '2024-12-06'),
+    ('2024-12-23', '2025-01-10'),
+    ('2024-12-01', '2025-01-31'),
+    ('2024-11-01', '2025-02-28'),
+    ('2025-01-01', '2025-01-01'),
+    ('2025-07-01', '2025-07-31'),
+]
+
+def test_whole_base(store):
+    assert store.average_per_hour() == pytest.approx(statistics.average_per_hour())
+    assert store.peak_hours() == statistics.peak_hours()
+    assert store.repartition_par_classe() == statistics.repartition_par_classe()
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_ranges(store, start, end):
+    expected, actual = statistics.snapshot(start, end), store.snapshot(start, end)
+    assert actual.total == expected.total
+    assert actual.hourly_totals == expected.hourly_totals
+    assert actual.hourly_counts == expected.hourly_counts
+    assert actual.repartition == expected.repartition
+    assert store.daily_totals(start, end) == statistics.daily_totals(start, end)
+    assert store.average_per_hour(start, end) == pytest.approx(statistics.average_per_hour(start, end))
+    assert store.peak_hours(start, end) == statistics.peak_hours(start, end)
+    assert store.repartition_par_classe(start, end) == statistics.repartition_par_classe(start, end)
+
+@pytest.mark.parametrize('target', [
+    datetime(2024, 11, 6), datetime(2024, 12, 31), datetime(2025, 1, 1), datetime(2025, 3, 15),
+])
+def test_days_and_weeks(store, target):
+    assert store.stats_today(target) == statistics.stats_today(target)
+    assert store.stats_semaine(target) == statistics.stats_semaine(target)
+    assert store.average_per_hour_week(target) == pytest.approx(statistics.average_per_hour_week(target))
+
+def test_parity_report_is_empty(store):
+    dates = [datetime(2024, 11, 1) + timedelta(days=d) for d in range(0, 120, 9)]
+    assert columnar.parity_report(store, dates) == []
+
+def test_old_schema_base_is_read_without_migration(tmp_path):
+    # Base d'avant la colonne jour et l'index unique, avec un créneau saisi
+    # deux fois : même résultat que la base migrée (doublons additionnés)
+    path = str(tmp_path / 'Base-2024.db')
+    conn = sqlite3.connect(path)
+    _v1_attendance(conn)
+    rows = [row[:7] for row in random_rows(4)]
+    conn.executemany(
+        'INSERT INTO attendance (heure, sixieme, cinquieme, quatrieme, troisieme, total, date) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        rows + [('08:00', 1, 0, 0, 0, 1, '2024-11-04'), ('08:00', 1, 0, 0, 0, 1, '2024-11-04')],
+    )
+    conn.commit()
+    conn.close()
+
+    store = columnar.ColumnStore([path])
+    conn = sqlite3.connect(path)
+    assert 'jour' not in [row[1] for row in conn.execute('PRAGMA table_info(attendance)')]
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    conn.close()
+
+    migrate(path)
+    set_db_path(path)
+    for start, end in RANGES:
+        expected, actual = statistics.snapshot(start, end), store.snapshot(start, end)
+        assert (actual.total, actual.hourly_counts) == (expected.total, expected.hourly_counts)
+        assert actual.repartition == expected.repartition
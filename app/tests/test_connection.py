@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from src.connection import get_connection, transaction
+
+# transaction() : imbrication et échec du COMMIT
+
+def count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+    finally:
+        conn.close()
+
+def insert(conn, heure):
+    conn.execute("INSERT INTO attendance (heure, date, jour, total) VALUES (?, '2025-01-06', 739257, 1)", (heure,))
+
+def test_nested_transactions_commit_once(make_base):
+    path = make_base()
+    with transaction(path) as outer:
+        insert(outer, '08:00')
+        with transaction(path) as inner:
+            insert(inner, '09:00')
+        assert outer.in_transaction  # pas de COMMIT à la sortie du bloc imbriqué
+    assert count(path) == 2
+
+def test_failed_commit_is_rolled_back(make_base):
+    path = make_base()
+    conn = get_connection(path)
+    # Journal classique : un lecteur qui garde son verrou bloque le COMMIT
+    conn.execute('PRAGMA journal_mode=DELETE')
+    conn.execute('PRAGMA busy_timeout=0')
+    reader = sqlite3.connect(path, isolation_level=None)
+    reader.execute('BEGIN')
+    reader.execute('SELECT COUNT(*) FROM attendance').fetchone()
+
+    with pytest.raises(sqlite3.OperationalError):
+        with transaction(path) as tx:
+            insert(tx, '08:00')
+    assert not conn.in_transaction
+
+    reader.execute('COMMIT')
+    reader.close()
+    # La transaction suivante n'est pas prise pour une transaction imbriquée
+    with transaction(path) as tx:
+        insert(tx, '09:00')
+    assert count(path) == 1
@@ -0,0 +1,48 @@
+import shutil
+import sqlite3
+
+from src import rooms, statistics
+from src.connection import set_db_path
+from src.federation import Federation
+from src.migrations import _v1_attendance, migrate
+
+# Requêtes sur plusieurs bases (src/federation.py), sans migration
+
+ROWS = [
+    ('08:00', 1, 2, 0, 0, 3, '2023-03-06'),
+    ('08:00', 0, 1, 0, 0, 1, '2023-03-06'),  # même créneau saisi deux fois
+    ('09:00', 0, 0, 4, None, 4, '2023-03-07'),
+    ('08:00', 2, 0, 0, 0, 2, '2023-03-07'),
+]
+
+def old_base(tmp_path):
+    path = str(tmp_path / 'Base-2023.db')
+    conn = sqlite3.connect(path)
+    _v1_attendance(conn)
+    conn.executemany(
+        'INSERT INTO attendance (heure, sixieme, cinquieme, quatrieme, troisieme, total, date) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ROWS,
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+def test_old_base_counts_slots_like_rooms_and_migration(tmp_path):
+    path = old_base(tmp_path)
+    start, end = '2023-03-06', '2023-03-12'
+    federation = Federation([path])
+    try:
+        snap = federation.snapshot(start, end)
+    finally:
+        federation.close()
+    room, _ = rooms._read_base(path, start, end)
+
+    migrated = str(tmp_path / 'Base-migree.db')
+    shutil.copy(path, migrated)
+    migrate(migrated)
+    set_db_path(migrated)
+    expected = statistics.snapshot(start, end)
+
+    assert snap.hourly_counts == room.hourly_counts == expected.hourly_counts == {'08:00': 2, '09:00': 1}
+    assert snap.hourly_totals == room.hourly_totals == expected.hourly_totals == {'08:00': 6, '09:00': 4}
+    assert snap.repartition == room.repartition == expected.repartition
@@ -0,0 +1,36 @@
+from src.connection import set_db_path, transaction
+from src.importer import import_csv
+
+# Import CSV de l'historique (src/importer.py)
+
+def write_csv(tmp_path, text):
+    path = tmp_path / 'import.csv'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+def test_short_line_is_rejected(tmp_path, make_base):
+    set_db_path(make_base())
+    path = write_csv(tmp_path, (
+        'date,heure,sixieme,cinquieme,quatrieme,troisieme\n'
+        '2025-03-10,08:00,1,2,3,4\n'
+        '2025-03-10,09:00\n'
+        '2025-03-10,10:00,1,,0,0\n'
+    ))
+    report = import_csv(path)
+    assert (report.lines, report.imported, report.rejected_count) == (3, 2, 1)
+    assert report.rejected[0][0] == 3
+    assert 'sixieme' in report.rejected[0][1]
+    with transaction() as conn:
+        assert conn.execute('SELECT heure, total FROM attendance ORDER BY heure').fetchall() == [
+            ('08:00', 10), ('10:00', 1),
+        ]
+
+def test_line_numbers_follow_multiline_fields(tmp_path, make_base):
+    set_db_path(make_base())
+    path = write_csv(tmp_path, (
+        'date,heure,sixieme,cinquieme,quatrieme,troisieme,remarque\n'
+        '2025-03-10,08:00,1,0,0,0,"sur\ndeux lignes"\n'
+        '2025-03-10,25:00,1,0,0,0,\n'
+    ))
+    report = import_csv(path)
+    assert report.rejected == [(4, "heure invalide : '25:00'")]
@@ -0,0 +1,119 @@
+import importlib.util
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+# Téléchargement de l'installateur (installer/main.py) contre un serveur
+# HTTP local : reprise, réutilisation du cache (304) et mode hors ligne
+
+INSTALLER = os.path.join(os.path.dirname(__file__), '..', '..', 'installer', 'main.py')
+
+@pytest.fixture
+def installer(tmp_path, monkeypatch):
+    spec = importlib.util.spec_from_file_location('installer_main', INSTALLER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(module.time, 'sleep', lambda seconds: None)
+    return module
+
+def make_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        z.writestr('cdi-logger-main/app/main.py', 'print("cdi")\n' * 5000)
+        z.writestr('cdi-logger-main/app/random.bin', os.urandom(200000))
+    return buffer.getvalue()
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    # Comportement réglé par les attributs du serveur : cut (octets envoyés
+    # avant de couper la première réponse), always_416
+    def do_GET(self):
+        srv = self.server
+        srv.requests.append(dict(self.headers))
+        body, etag = srv.body, '"v1"'
+        if srv.always_416:
+            self.send_response(416)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get('Range') and self.headers.get('If-Range') == etag:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        if srv.cut:
+            self.wfile.write(body[start:start + srv.cut])
+            srv.cut_at, srv.cut = srv.cut, None
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), ArchiveHandler)
+    srv.body, srv.requests, srv.cut, srv.always_416 = make_zip(), [], None, False
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv, f'http://127.0.0.1:{srv.server_address[1]}/main.zip'
+    srv.shutdown()
+    srv.server_close()
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_interrupted_download_resumes_at_offset(installer, server):
+    srv, url = server
+    srv.cut = 2 * installer.CHUNK_SIZE
+    archive = installer.download_archive(url)
+    assert read(archive) == srv.body
+    assert 'Range' not in srv.requests[0]
+    assert srv.requests[1]['Range'] == f'bytes={srv.cut_at}-'
+    assert srv.requests[1]['If-Range'] == '"v1"'
+
+def test_current_cached_archive_is_reused(installer, server):
+    srv, url = server
+    first = installer.download_archive(url)
+    progress = []
+    assert installer.download_archive(url, progress=lambda done, total: progress.append((done, total))) == first
+    assert srv.requests[1]['If-None-Match'] == '"v1"'
+    assert progress == [(len(srv.body), len(srv.body))]
+
+def test_offline_falls_back_to_cached_archive(installer, server):
+    srv, url = server
+    archive = installer.download_archive(url)
+    srv.shutdown()
+    srv.server_close()
+    assert installer.download_archive(url) == archive
+    assert read(archive) == srv.body
+
+def test_offline_without_cache_raises(installer, server):
+    srv, url = server
+    srv.shutdown()
+    srv.server_close()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        installer.download_archive(url)
+
+def test_416_on_every_attempt_raises(installer, server):
+    srv, url = server
+    srv.always_416 = True
+    with pytest.raises(requests.exceptions.HTTPError):
+        installer.download_archive(url)
+    assert len(srv.requests) == installer.DOWNLOAD_RETRIES
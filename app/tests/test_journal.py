@@ -0,0 +1,114 @@
+import json
+import os
+
+import pytest
+
+from src import journal
+from src.connection import set_db_path, transaction
+from src.database import UPSERT_ATTENDANCE, add_attendance
+
+# Journal local des saisies (src/journal.py)
+
+def rows(path):
+    with transaction(path) as conn:
+        return conn.execute('SELECT date, heure, sixieme, total FROM attendance ORDER BY date, heure').fetchall()
+
+def test_entries_of_a_slot_are_added(make_base):
+    base = make_base()
+    set_db_path(base)
+    add_attendance('08:00', 2, 0, 0, 0, 2, '2025-03-10')
+    add_attendance('08:00', 3, 0, 0, 0, 3, '2025-03-10')
+    assert rows(base) == [('2025-03-10', '08:00', 5, 5)]
+
+def test_merge_sums_entries_per_slot():
+    entry = dict(heure='08:00', sixieme=1, cinquieme=None, quatrieme=0, troisieme=0, total=1, date='2025-03-10')
+    merged = journal._merge([dict(entry), dict(entry, cinquieme=2, total=3), dict(entry, heure='09:00')])
+    assert [(row['heure'], row['sixieme'], row['cinquieme'], row['total']) for row in merged] == [
+        ('08:00', 2, 2, 4), ('09:00', 1, None, 1),
+    ]
+
+def test_upsert_adds_to_existing_slot(make_base):
+    base = make_base()
+    with transaction(base) as conn:
+        conn.execute(UPSERT_ATTENDANCE, ('08:00', None, 0, 0, 0, 4, '2025-03-10', 0))
+        conn.execute(UPSERT_ATTENDANCE, ('08:00', 1, 0, 0, 0, 1, '2025-03-10', 0))
+    assert rows(base) == [('2025-03-10', '08:00', 1, 5)]
+
+def test_batch_replayed_after_commit_is_not_counted_twice(make_base):
+    # Arrêt entre la validation en base et la suppression du .flushing
+    base = make_base()
+    set_db_path(base)
+    add_attendance('08:00', 2, 0, 0, 0, 2, '2025-03-10')
+    assert not os.path.exists(journal._flushing_path())
+    with transaction(base) as conn:
+        entry_id = conn.execute('SELECT id FROM journal_applique').fetchone()[0]
+    entry = dict(heure='08:00', sixieme=2, cinquieme=0, quatrieme=0, troisieme=0, total=2,
+                 date='2025-03-10', base=base, ts=0, id=entry_id)
+    with open(journal._flushing_path(), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+    journal.flush()
+    assert not os.path.exists(journal._flushing_path())
+    assert rows(base) == [('2025-03-10', '08:00', 2, 2)]
+
+def entry(base, heure='08:00', count=1, day='2025-03-10', **extra):
+    return dict(heure=heure, sixieme=count, cinquieme=0, quatrieme=0, troisieme=0, total=count,
+                date=day, base=base, ts=0, **extra)
+
+def write_lines(path, entries):
+    with open(path, 'a', encoding='utf-8') as f:
+        for e in entries:
+            f.write(json.dumps(e) + '\n')
+
+def test_append_then_flush_upserts(make_base):
+    base = make_base()
+    set_db_path(base)
+    journal.start_flusher(interval=60)
+    try:
+        add_attendance('08:00', 1, 1, 0, 0, 2, '2025-03-10')
+        add_attendance('09:00', 0, 0, 3, 0, 3, '2025-03-10')
+    finally:
+        journal.stop_flusher()  # dernière application à l'arrêt
+    assert rows(base) == [('2025-03-10', '08:00', 1, 2), ('2025-03-10', '09:00', 0, 3)]
+    assert journal.pending() == 0
+
+def test_leftover_files_are_replayed(make_base):
+    # Arrêt brutal : un lot en cours (.flushing) et de nouvelles saisies,
+    # plus une dernière ligne tronquée
+    base = make_base()
+    write_lines(journal._flushing_path(), [entry(base, '08:00', 2, id='a')])
+    write_lines(journal.journal_path(), [entry(base, '08:00', 1, id='b'), entry(base, '09:00', 4, id='c')])
+    with open(journal.journal_path(), 'a', encoding='utf-8') as f:
+        f.write('{"heure": "10:0')
+    assert journal.pending() == 3
+    assert journal.replay() == 3
+    assert rows(base) == [('2025-03-10', '08:00', 3, 3), ('2025-03-10', '09:00', 4, 4)]
+    assert journal.pending() == 0
+
+def test_failed_apply_keeps_batch_on_disk(make_base, monkeypatch):
+    base = make_base()
+    set_db_path(base)
+    real_apply = journal._apply
+
+    def locked(entries):
+        raise journal.sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(journal, '_apply', locked)
+    with pytest.raises(journal.sqlite3.OperationalError):
+        add_attendance('08:00', 2, 0, 0, 0, 2, '2025-03-10')
+    assert journal.pending() == 1
+    assert rows(base) == []
+
+    monkeypatch.setattr(journal, '_apply', real_apply)
+    assert journal.flush() == 1
+    assert rows(base) == [('2025-03-10', '08:00', 2, 2)]
+
+def test_unusable_base_is_set_aside(make_base, tmp_path):
+    # Une base sans schéma ne bloque pas les entrées des autres bases
+    base, broken = make_base(), str(tmp_path / 'vide.db')
+    open(broken, 'w').close()
+    write_lines(journal._flushing_path(), [entry(broken, id='a'), entry(base, id='b'), entry(broken, '09:00', id='c')])
+    assert journal.flush() == 3
+    assert not os.path.exists(journal._flushing_path())
+    assert rows(base) == [('2025-03-10', '08:00', 1, 1)]
+    assert journal.set_aside() == 2
+    assert [e['id'] for e in journal._read(journal.set_aside_path())] == ['a', 'c']
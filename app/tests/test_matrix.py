@@ -0,0 +1,53 @@
+from datetime import date, datetime
+
+import pytest
+
+from src import matrix, statistics
+from src.cache import stats_cache
+from src.connection import set_db_path, transaction
+from src.database import UPSERT_ATTENDANCE
+
+from .test_columnar import RANGES, random_rows
+
+# Les tranches de la matrice jour × créneau donnent les mêmes résultats que
+# les requêtes SQL de src/statistics.py
+
+@pytest.fixture
+def base(make_base):
+    path = make_base()
+    with transaction(path) as conn:
+        conn.executemany(UPSERT_ATTENDANCE, random_rows(3))
+        # Classe non renseignée (NULL), permise par le schéma
+        conn.execute(
+            "INSERT INTO attendance (heure, sixieme, cinquieme, quatrieme, troisieme, total, date, jour) "
+            "VALUES ('10:00', NULL, 2, 1, 0, 3, '2025-01-04', ?)", (date(2025, 1, 4).toordinal(),)
+        )
+    set_db_path(path)
+    return path
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_snapshot_and_daily_totals(base, start, end):
+    expected, actual = statistics.snapshot(start, end), matrix.snapshot(start, end)
+    assert actual.total == expected.total
+    assert actual.hourly_totals == expected.hourly_totals
+    assert actual.hourly_counts == expected.hourly_counts
+    assert actual.repartition == expected.repartition
+    assert matrix.daily_totals(start, end) == statistics.daily_totals(start, end)
+
+def test_heatmap_covers_every_day_and_slot(base):
+    days, rows = matrix.heatmap(*matrix.month_bounds(datetime(2025, 1, 15)))
+    assert days[0] == date(2025, 1, 1) and days[-1] == date(2025, 1, 31)
+    assert all(len(row) == len(statistics.HOURS) for row in rows)
+    # Les heures hors créneaux ne figurent que dans les totaux
+    in_slots = sum(map(sum, rows))
+    snap = matrix.snapshot(*matrix.month_bounds(datetime(2025, 1, 15)))
+    assert in_slots == sum(v for h, v in snap.hourly_totals.items() if h in statistics.HOURS)
+
+def test_write_invalidates_the_year(base):
+    # Samedi : pas de saisie dans la base aléatoire
+    saturday = date(2025, 1, 11)
+    assert matrix.snapshot('2025-01-11', '2025-01-11').total == 0
+    with transaction() as conn:
+        conn.execute(UPSERT_ATTENDANCE, ('16:00', 10, 0, 0, 0, 10, saturday.isoformat(), saturday.toordinal()))
+    stats_cache.invalidate(saturday.toordinal())
+    assert matrix.snapshot('2025-01-11', '2025-01-11').total == 10
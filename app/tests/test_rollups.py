@@ -0,0 +1,44 @@
+from src.cli import _rollup_mismatches
+from src.connection import transaction
+from src.database import UPSERT_ATTENDANCE
+from src.migrations import SCHEMA_VERSION, migrate
+
+# Agrégats tenus par triggers (src/rollups.py)
+
+def tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def write_some(path):
+    with transaction(path) as conn:
+        conn.execute(UPSERT_ATTENDANCE, ('08:00', 1, 0, 0, 0, 1, '2025-03-10', 0))
+        conn.execute(UPSERT_ATTENDANCE, ('08:00', 2, 0, 0, 0, 2, '2025-03-10', 0))
+        conn.execute(UPSERT_ATTENDANCE, ('09:00', 0, 3, 0, 0, 3, '2025-03-11', 0))
+        conn.execute("DELETE FROM attendance WHERE heure = '09:00'")
+
+def test_rollups_follow_writes(make_base):
+    path = make_base()
+    write_some(path)
+    with transaction(path) as conn:
+        assert 'rollup_mois' not in tables(conn)
+        assert _rollup_mismatches(conn) == 0
+        assert conn.execute('SELECT mois, heure, nb, total FROM rollup_heure').fetchall() == [('2025-03', '08:00', 1, 3)]
+
+def test_upgrade_drops_rollup_mois(make_base):
+    # Base de la version 6 : rollup_mois et un trigger qui l'alimente
+    path = make_base()
+    with transaction(path) as conn:
+        conn.execute('CREATE TABLE rollup_mois (mois TEXT PRIMARY KEY, nb INTEGER NOT NULL DEFAULT 0)')
+        conn.execute('DROP TRIGGER trg_attendance_rollup_insert')
+        conn.execute('''
+            CREATE TRIGGER trg_attendance_rollup_insert AFTER INSERT ON attendance
+            BEGIN
+                INSERT INTO rollup_mois (mois, nb) VALUES (substr(NEW.date, 1, 7), 1)
+                ON CONFLICT (mois) DO UPDATE SET nb = nb + 1;
+            END
+        ''')
+        conn.execute('PRAGMA user_version = 6')
+    assert migrate(path) == SCHEMA_VERSION
+    write_some(path)
+    with transaction(path) as conn:
+        assert 'rollup_mois' not in tables(conn)
+        assert _rollup_mismatches(conn) == 0
@@ -0,0 +1,41 @@
+from datetime import date
+
+import pytest
+
+from src import matrix, statistics
+from src.connection import set_db_path, transaction
+from src.database import UPSERT_ATTENDANCE
+
+# Requêtes SQL de src/statistics.py
+
+@pytest.fixture
+def base(make_base):
+    path = make_base()
+    with transaction(path) as conn:
+        conn.execute(UPSERT_ATTENDANCE, ('08:00', 1, 2, 0, 0, 3, '2025-01-06', date(2025, 1, 6).toordinal()))
+        # Créneau saisi sans aucune valeur (NULL partout), seul à son heure
+        conn.execute(
+            "INSERT INTO attendance (heure, sixieme, cinquieme, quatrieme, troisieme, total, date, jour) "
+            "VALUES ('10:00', NULL, NULL, NULL, NULL, NULL, '2025-01-07', ?)", (date(2025, 1, 7).toordinal(),)
+        )
+    set_db_path(path)
+    return path
+
+def test_null_slot_counts_as_zero(base):
+    start, end = '2025-01-04', '2025-01-09'
+    snap = statistics.snapshot(start, end)
+    assert snap.total == 3
+    assert snap.hourly_totals == {'08:00': 3, '10:00': 0}
+    assert snap.repartition == {'6': 1, '5': 2, '4': 0, '3': 0}
+    assert statistics.average_per_hour(start, end) == {'08:00': 3, '10:00': 0}
+    assert statistics.peak_hours(start, end) == ['08:00']
+    assert statistics.daily_totals(start, end) == {'2025-01-06': 3, '2025-01-07': 0}
+
+    expected = matrix.snapshot(start, end)
+    assert (snap.total, snap.hourly_totals, snap.hourly_counts) == \
+        (expected.total, expected.hourly_totals, expected.hourly_counts)
+
+def test_null_slot_in_room_statistics(base):
+    snap = statistics.room_snapshot('2025-01-04', '2025-01-09')
+    assert (snap.total, snap.hourly_totals['10:00']) == (3, 0)
+    assert statistics.room_daily_totals('2025-01-04', '2025-01-09') == {'2025-01-06': 3, '2025-01-07': 0}
@@ -0,0 +1,206 @@
+import http.client
+import sqlite3
+from datetime import date
+
+import pytest
+
+from src import statistics, sync
+from src.connection import set_db_path, transaction
+from src.database import UPSERT_ATTENDANCE
+from src.sync_server import start_server
+
+# Synchronisation contre un serveur d'agrégation lancé dans le processus
+
+@pytest.fixture
+def server(tmp_path):
+    srv, url = start_server(str(tmp_path / 'central.db'))
+    yield srv, url
+    srv.shutdown()
+    srv.server_close()
+
+def put(path, heure, count, day='2025-03-10'):
+    with transaction(path) as conn:
+        conn.execute(UPSERT_ATTENDANCE, (heure, count, 0, 0, 0, count, day, date.fromisoformat(day).toordinal()))
+
+def server_rows(srv):
+    conn = sqlite3.connect(srv.aggregator.path)
+    try:
+        return conn.execute('SELECT terminal, date, heure, total FROM terminal_rows ORDER BY date, heure').fetchall()
+    finally:
+        conn.close()
+
+def pending(path):
+    with transaction(path) as conn:
+        return conn.execute('SELECT COUNT(*) FROM sync_pending').fetchone()[0]
+
+class LossyClient(sync.SyncClient):
+    # La réponse au premier envoi est perdue après application par le serveur
+    lost = False
+
+    def request(self, method, path, data=None, params=None):
+        result = super().request(method, path, data, params)
+        if method == 'POST' and not self.lost:
+            self.lost = True
+            raise ConnectionResetError("réponse perdue")
+        return result
+
+def test_new_base_of_same_terminal_is_not_taken_for_a_resend(server, make_base):
+    srv, url = server
+    base_2025, base_2026 = make_base('Base-2025.db'), make_base('Base-2026.db')
+    put(base_2025, '08:00', 3, '2025-03-10')
+    put(base_2026, '09:00', 4, '2026-03-09')
+    client = sync.SyncClient(url, 'posteA')
+    assert sync.push(client, base_2025) == 1
+    assert sync.push(client, base_2026) == 1
+    client.close()
+    assert server_rows(srv) == [
+        ('posteA', '2025-03-10', '08:00', 3),
+        ('posteA', '2026-03-09', '09:00', 4),
+    ]
+
+def test_resend_of_inflight_batch_is_applied_once(server, make_base):
+    srv, url = server
+    base = make_base()
+    put(base, '08:00', 3)
+    put(base, '09:00', 2)
+    client = LossyClient(url, 'posteA')
+    with pytest.raises(ConnectionResetError):
+        sync.push(client, base)
+    assert pending(base) == 2  # pas d'acquittement reçu
+    version = srv.aggregator.version()
+
+    assert sync.push(client, base) == 2
+    client.close()
+    assert srv.aggregator.version() == version  # renvoi reconnu, pas rejoué
+    assert pending(base) == 0
+    assert [row[3] for row in server_rows(srv)] == [3, 2]
+
+def test_sequence_behind_server_is_renumbered(server, make_base):
+    # Base restaurée d'une sauvegarde : son seq repart en arrière
+    srv, url = server
+    base = make_base()
+    put(base, '08:00', 3)
+    client = sync.SyncClient(url, 'posteA')
+    sync.push(client, base)
+    with transaction(base) as conn:
+        conn.execute("UPDATE sync_state SET value = 0 WHERE key = 'push_seq'")
+    put(base, '09:00', 5)
+    assert sync.push(client, base) == 1
+    client.close()
+    assert [row[2:] for row in server_rows(srv)] == [('08:00', 3), ('09:00', 5)]
+
+def test_delete_reaches_other_terminal(server, make_base):
+    srv, url = server
+    base_a, base_b = make_base('a.db'), make_base('b.db')
+    put(base_a, '08:00', 3)
+    put(base_a, '09:00', 2)
+    put(base_b, '08:00', 5)
+    client_a, client_b = sync.SyncClient(url, 'A'), sync.SyncClient(url, 'B')
+    sync.sync_once(client_a, base_a)
+    sync.sync_once(client_b, base_b)
+    set_db_path(base_b)
+    assert statistics.room_snapshot_week(date(2025, 3, 10)).total == 10
+
+    with transaction(base_a) as conn:
+        conn.execute("DELETE FROM attendance WHERE heure = '09:00'")
+    sync.sync_once(client_a, base_a)
+    sync.sync_once(client_b, base_b)
+    client_a.close()
+    client_b.close()
+    with transaction(base_b) as conn:
+        remote = conn.execute('SELECT heure, total FROM sync_remote').fetchall()
+    assert remote == [('08:00', 3)]
+    assert statistics.room_snapshot_week(date(2025, 3, 10)).total == 8
+
+def test_bodies_are_gzipped(server, make_base):
+    srv, url = server
+    body, headers = sync.encode_body({'rows': [{'date': '2025-03-10', 'heure': '08:00'}] * 100})
+    assert headers.get('Content-Encoding') == 'gzip'
+    assert sync.decode_body(body, 'gzip')['rows'][0]['heure'] == '08:00'
+    small, headers = sync.encode_body({'rows': []})
+    assert 'Content-Encoding' not in headers
+
+    # Un lot compressé est accepté, et la réponse est compressée sur demande
+    base = make_base()
+    for day in range(1, 29):
+        for heure in statistics.HOURS:
+            put(base, heure, 1, f'2025-02-{day:02d}')
+    client = sync.SyncClient(url, 'A')
+    assert sync.push(client, base) == 28 * len(statistics.HOURS)
+    client.close()
+    host, port = srv.server_address
+    conn = http.client.HTTPConnection(host, port)
+    conn.request('GET', '/rollups?since=0', headers={'Accept-Encoding': 'gzip'})
+    resp = conn.getresponse()
+    payload = resp.read()
+    conn.close()
+    assert resp.getheader('Content-Encoding') == 'gzip'
+    assert len(sync.decode_body(payload, 'gzip')['rows']) == 28 * len(statistics.HOURS)
+
+def test_pull_resets_when_server_base_was_replaced(tmp_path, make_base):
+    base_a, base_b = make_base('a.db'), make_base('b.db')
+    put(base_b, '08:00', 5)
+    put(base_b, '09:00', 1)
+    srv, url = start_server(str(tmp_path / 'old.db'))
+    client_a, client_b = sync.SyncClient(url, 'A'), sync.SyncClient(url, 'B')
+    sync.push(client_b, base_b)
+    sync.pull(client_a, base_a)
+    srv.shutdown()
+    srv.server_close()
+
+    # Nouveau serveur, vide : la version vue par A est en avance
+    srv, url = start_server(str(tmp_path / 'new.db'))
+    client_a, client_b = sync.SyncClient(url, 'A'), sync.SyncClient(url, 'B')
+    put(base_b, '10:00', 7)
+    sync.push(client_b, base_b)
+    sync.pull(client_a, base_a)
+    with transaction(base_a) as conn:
+        remote = conn.execute('SELECT heure, total FROM sync_remote').fetchall()
+    assert remote == [('10:00', 7)]
+    srv.shutdown()
+    srv.server_close()
+
+def test_changes_are_recorded_only_once_sync_is_enabled(server, make_base):
+    srv, url = server
+    base = make_base()
+    put(base, '08:00', 3)
+    assert pending(base) == 0  # aucun serveur : rien n'est noté
+    client = sync.SyncClient(url, 'posteA')
+    assert sync.push(client, base) == 1  # lignes existantes notées à l'activation
+    put(base, '09:00', 2)
+    assert pending(base) == 1
+
+    # Serveur retiré de la configuration
+    sync.disable(base)
+    put(base, '10:00', 1)
+    assert pending(base) == 0
+    assert sync.push(client, base) == 3  # tout est renvoyé à la reprise
+    client.close()
+    assert [row[2:] for row in server_rows(srv)] == [('08:00', 3), ('09:00', 2), ('10:00', 1)]
+
+class FailingClient(sync.SyncClient):
+    # Première requête en erreur inattendue (autre qu'une erreur réseau)
+    failed = False
+
+    def request(self, method, path, data=None, params=None):
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError("erreur inattendue")
+        return super().request(method, path, data, params)
+
+def test_sync_thread_survives_unexpected_errors(server, make_base):
+    srv, url = server
+    base = make_base()
+    set_db_path(base)
+    put(base, '08:00', 3)
+    thread = sync.SyncThread(FailingClient(url, 'posteA'), interval=0.01)
+    thread.start()
+    try:
+        for _ in range(500):
+            if server_rows(srv):
+                break
+            thread.join(0.01)
+        assert thread.is_alive()
+        assert [row[2:] for row in server_rows(srv)] == [('08:00', 3)]
+    finally:
+        thread.stop()
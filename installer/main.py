@@ -7,8 +7,11 @@ from tkinter import messagebox, ttk
 import threading
 import requests
 import zipfile
-import io
+import hashlib
+import json
+import time
 import webbrowser
+import zlib
 
 GITHUB_REPO = "https://github.com/ilylbgg/cdi-logger/archive/refs/heads/main.zip"
 INSTALL_DIR = os.path.expanduser(r"~/Documents/IlyLogiciels/cdiGraph/app")
@@ -17,6 +20,19 @@ SHORTCUT_PATH = os.path.join(DESKTOP, "CDIGraph.lnk")
 MAIN_PY_PATH = os.path.join(INSTALL_DIR, "main.py")
 REQ_PATH = os.path.join(INSTALL_DIR, "requirements.txt")
 PYTHON_URL = "https://www.python.org/downloads/"
+# Downloaded archives are kept next to the install dir (not inside it, so a
+# reinstall does not wipe them) and reused when the server says they are
+# still current; interrupted downloads resume from the .part file.
+CACHE_DIR = os.path.join(os.path.dirname(INSTALL_DIR), "cache")
+CHUNK_SIZE = 64 * 1024
+DOWNLOAD_RETRIES = 5
+# Manifest of installed files (size, mtime, CRC-32 as in the zip directory)
+# used to extract only what changed on update.
+MANIFEST_PATH = os.path.join(INSTALL_DIR, ".manifest.json")
+# User data: created on first install, never overwritten or removed
+PRESERVED_DIRS = ("data/", "logs/", "journal/")
+# Kept as is when the user edited it since the last install
+CONFIG_FILE = "config.cfg"
 
 def python_installed():
     # Try the current interpreter first
@@ -39,35 +55,169 @@ def python_installed():
 
     return False
 
-def download_and_extract():
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode()).hexdigest()[:16]
+    archive = os.path.join(CACHE_DIR, f"{key}.zip")
+    return archive, archive + '.part', archive + '.json'
+
+def _cached_archive(archive, meta_path):
+    # Cached archive metadata, only if the file still matches its recorded hash
+    meta = _read_json(meta_path)
+    if not meta or not os.path.exists(archive):
+        return None
+    if os.path.getsize(archive) != meta.get('size') or _sha256_file(archive) != meta.get('sha256'):
+        return None
+    return meta
+
+def download_archive(url=GITHUB_REPO, progress=None):
+    """Stream url into the local cache and return the archive path.
+
+    progress(done, total) is called as bytes arrive (total is None when the
+    server does not send a length). A cached copy is revalidated with its
+    ETag / Last-Modified; an interrupted download resumes with a Range
+    request when the server supports it.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    archive, part, meta_path = _cache_paths(url)
+    cached = _cached_archive(archive, meta_path)
+    part_meta_path = part + '.json'
+
+    for attempt in range(DOWNLOAD_RETRIES):
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        part_meta = _read_json(part_meta_path)
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset and part_meta.get('validator'):
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = part_meta['validator']
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=30, verify=False) as resp:
+                if resp.status_code == 304 and cached:
+                    if progress:
+                        progress(cached['size'], cached['size'])
+                    return archive
+                if resp.status_code == 416:
+                    # Stale partial file: start over, unless retries are exhausted
+                    if os.path.exists(part):
+                        os.remove(part)
+                    if attempt == DOWNLOAD_RETRIES - 1:
+                        resp.raise_for_status()
+                    continue
+                resp.raise_for_status()
+                validator = resp.headers.get('ETag') or resp.headers.get('Last-Modified')
+                if resp.status_code != 206:
+                    offset = 0  # full response: start over
+                length = resp.headers.get('Content-Length')
+                total = offset + int(length) if length and 'gzip' not in resp.headers.get('Content-Encoding', '') else None
+                _write_json(part_meta_path, {'validator': validator})
+                done = offset
+                with open(part, 'ab' if offset else 'wb') as f:
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        done += len(chunk)
+                        if progress:
+                            progress(done, total)
+                if total is not None and done != total:
+                    raise requests.exceptions.ChunkedEncodingError(f"téléchargement incomplet ({done}/{total} octets)")
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout) as e:
+            if attempt == DOWNLOAD_RETRIES - 1:
+                if cached:
+                    return archive  # offline: reuse the last verified archive
+                raise
+            time.sleep(min(2 ** attempt, 10))
+            continue
+
+        if not zipfile.is_zipfile(part):
+            os.remove(part)
+            raise Exception("Archive téléchargée invalide")
+        os.replace(part, archive)
+        os.remove(part_meta_path)
+        _write_json(meta_path, {
+            'url': url,
+            'etag': resp.headers.get('ETag'),
+            'last_modified': resp.headers.get('Last-Modified'),
+            'size': os.path.getsize(archive),
+            'sha256': _sha256_file(archive),
+        })
+        return archive
+
+def _crc32_file(path):
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+def _installed_crc(dest, recorded):
+    # CRC of an installed file, trusting the manifest while size and mtime match
     try:
-        resp = requests.get(GITHUB_REPO, verify=False)
-        resp.raise_for_status()
-        z = zipfile.ZipFile(io.BytesIO(resp.content))
-        names = z.namelist()
-
-        # Find the path inside the zip that corresponds to the 'app/' folder.
-        app_folder = None
-        for name in names:
-            if '/app/' in name:
-                # keep the prefix up to and including 'app/'
-                app_folder = name.split('/app/')[0] + '/app/'
-                break
-            if name.endswith('app/'):
-                app_folder = name
-                break
-
-        if not app_folder:
-            raise Exception("Dossier 'app' introuvable dans le dépôt")
-
-        # Remove existing install dir then recreate it
-        if os.path.exists(INSTALL_DIR):
-            shutil.rmtree(INSTALL_DIR)
-
-        os.makedirs(INSTALL_DIR, exist_ok=True)
-
-        # Extract only files under the discovered app_folder, protecting against zip-slip
-        for name in names:
+        st = os.stat(dest)
+    except FileNotFoundError:
+        return None
+    if recorded and recorded['size'] == st.st_size and recorded['mtime_ns'] == st.st_mtime_ns:
+        return recorded['crc']
+    return _crc32_file(dest)
+
+def _file_record(dest, crc):
+    st = os.stat(dest)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'crc': crc}
+
+def _find_app_folder(names):
+    # Find the path inside the zip that corresponds to the 'app/' folder.
+    for name in names:
+        if '/app/' in name:
+            # keep the prefix up to and including 'app/'
+            return name.split('/app/')[0] + '/app/'
+        if name.endswith('app/'):
+            return name
+    raise Exception("Dossier 'app' introuvable dans le dépôt")
+
+def extract_app(archive):
+    """Install or update INSTALL_DIR from archive, extracting only changed files.
+
+    Files under PRESERVED_DIRS are only seeded when that directory does not
+    exist yet (first install): on update, user data such as data/users.csv,
+    renamed away once migrated, must not come back. A locally edited
+    config.cfg is kept, and files removed from the repository are
+    deleted. Returns (written, unchanged, removed) counts.
+    """
+    manifest = _read_json(MANIFEST_PATH)
+    old_files = manifest.get('files', {})
+    new_files = {}
+    written = unchanged = removed = 0
+    install_root = os.path.normpath(INSTALL_DIR)
+    os.makedirs(INSTALL_DIR, exist_ok=True)
+    existing_dirs = tuple(d for d in PRESERVED_DIRS if os.path.isdir(os.path.join(INSTALL_DIR, d)))
+
+    with zipfile.ZipFile(archive) as z:
+        app_folder = _find_app_folder(z.namelist())
+        for info in z.infolist():
+            name = info.filename
             if not name.startswith(app_folder):
                 continue
             rel = name[len(app_folder):]
@@ -76,22 +226,75 @@ def download_and_extract():
 
             # Normalize destination path and ensure it stays inside INSTALL_DIR
             dest = os.path.normpath(os.path.join(INSTALL_DIR, rel))
-            if not dest.startswith(os.path.normpath(INSTALL_DIR)):
+            if not dest.startswith(install_root + os.sep):
                 # suspicious path, skip
                 continue
 
-            if name.endswith('/'):
+            if info.is_dir():
                 os.makedirs(dest, exist_ok=True)
-            else:
-                os.makedirs(os.path.dirname(dest), exist_ok=True)
-                with z.open(name) as src, open(dest, 'wb') as dst:
-                    dst.write(src.read())
+                continue
+
+            if existing_dirs and rel.startswith(existing_dirs):
+                continue  # user data, seeded on first install only
+            current = _installed_crc(dest, old_files.get(rel))
+            if rel.startswith(PRESERVED_DIRS) and current is not None:
+                continue
+            if rel == CONFIG_FILE and current is not None and current != info.CRC \
+                    and (rel not in old_files or current != old_files[rel]['crc']):
+                # Edited locally (or installed before manifests existed): keep
+                # it, and keep the record of the version we last installed
+                if rel in old_files:
+                    new_files[rel] = old_files[rel]
+                unchanged += 1
+                continue
+            if current == info.CRC and os.path.getsize(dest) == info.file_size:
+                new_files[rel] = _file_record(dest, current)
+                unchanged += 1
+                continue
+
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            # Bounded-buffer copy to a temporary file, then swapped in, so an
+            # interrupted update never leaves a half-written file
+            tmp = dest + '.tmp'
+            with z.open(info) as src, open(tmp, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(tmp, dest)
+            if not rel.startswith(PRESERVED_DIRS):
+                new_files[rel] = _file_record(dest, info.CRC)
+            written += 1
+
+    # Files that disappeared from the repository
+    for rel in old_files:
+        if rel in new_files or rel.startswith(PRESERVED_DIRS):
+            continue
+        dest = os.path.join(INSTALL_DIR, rel)
+        if os.path.exists(dest):
+            os.remove(dest)
+            removed += 1
+
+    manifest['files'] = new_files
+    _write_json(MANIFEST_PATH, manifest)
+    return written, unchanged, removed
+
+def download_and_extract(progress=None):
+    try:
+        return extract_app(download_archive(GITHUB_REPO, progress))
     except Exception as e:
         raise Exception(f"Erreur lors du téléchargement ou de l'extraction : {str(e)}")
 
 def install_requirements():
-    if os.path.exists(REQ_PATH):
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", REQ_PATH])
+    # pip is skipped when requirements.txt has not changed since the last
+    # successful install
+    if not os.path.exists(REQ_PATH):
+        return False
+    digest = _sha256_file(REQ_PATH)
+    manifest = _read_json(MANIFEST_PATH)
+    if manifest.get('requirements_sha256') == digest:
+        return False
+    subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", REQ_PATH])
+    manifest['requirements_sha256'] = digest
+    _write_json(MANIFEST_PATH, manifest)
+    return True
 
 def create_shortcut():
     try:
@@ -107,7 +310,7 @@ def create_shortcut():
     except Exception as e:
         raise Exception(f"Erreur lors de la création du raccourci : {str(e)}")
 
-def run_install(progress_callback):
+def run_install(progress_callback, download_progress=None):
     try:
         progress_callback("Vérification de Python...")
         if not python_installed():
@@ -120,7 +323,7 @@ def run_install(progress_callback):
             return False, "Python n'est pas installé. Veuillez l'installer avant de continuer."
 
         progress_callback("Téléchargement du code source...")
-        download_and_extract()
+        written, unchanged, removed = download_and_extract(download_progress)
 
         progress_callback("Installation des dépendances...")
         install_requirements()
@@ -129,7 +332,10 @@ def run_install(progress_callback):
         create_shortcut()
 
         progress_callback("Installation terminée !")
-        return True, "Installation réussie ! Vous pouvez maintenant lancer CDIGraph depuis le raccourci sur votre bureau."
+        return True, (
+            "Installation réussie ! Vous pouvez maintenant lancer CDIGraph depuis le raccourci sur votre bureau.\n"
+            f"{written} fichier(s) mis à jour, {unchanged} inchangé(s), {removed} supprimé(s)."
+        )
     except Exception as e:
         return False, f"Erreur lors de l'installation : {str(e)}"
 
@@ -187,7 +393,24 @@ class InstallerApp(tk.Tk):
                 self.progress["value"] = (idx+1)*100//len(steps)
                 self.update_status(msg)
 
-            ok, msg = run_install(progress_callback)
+            last_update = [0.0]
+
+            def download_progress(done, total):
+                # Download fills the bar between its step and the next one;
+                # throttled so the UI is not flooded with updates
+                now = time.monotonic()
+                if now - last_update[0] < 0.1 and done != total:
+                    return
+                last_update[0] = now
+                step = 100 / len(steps)
+                if total:
+                    self.progress["value"] = step + step * done / total
+                    text = f"Téléchargement du code source... {done / 1e6:.1f} / {total / 1e6:.1f} Mo"
+                else:
+                    text = f"Téléchargement du code source... {done / 1e6:.1f} Mo"
+                self.update_status(text)
+
+            ok, msg = run_install(progress_callback, download_progress)
             self.progress["value"] = 100
             self.update_status(msg)
 